@@ -0,0 +1,91 @@
+"""Heurísticas do DPI adaptativo: quando uma página renderizada em baixa resolução precisa ser refeita."""
+import re
+from typing import Optional
+from PIL import Image
+
+from config import config
+from image_preprocessor import model_input_size
+from page_analysis import INK_THRESHOLD
+
+
+# Linha separadora de tabela em markdown (ex: |---|:---:|)
+TABLE_SEPARATOR = re.compile(r'^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)+\|?\s*$', re.MULTILINE)
+# Delimitadores de equações em LaTeX
+EQUATION_MARKER = re.compile(r'\$\$|\\\[|\\\(')
+# Linhas detectadas necessárias para estimar a altura do texto
+MIN_TEXT_LINES = 5
+
+
+def text_line_height(image: Image.Image) -> Optional[float]:
+    """
+    Estima a altura das linhas de texto, na resolução em que o modelo verá a página.
+    
+    Usa a projeção horizontal da tinta: faixas contínuas de linhas com tinta
+    são linhas de texto; faixas muito altas (figuras, colunas desalinhadas)
+    são ignoradas.
+    
+    Args:
+        image: Imagem da página renderizada
+    
+    Returns:
+        Mediana da altura das linhas em pixels, ou None se houver poucas linhas
+    """
+    gray = image.convert("L")
+    model_size = model_input_size(gray.size, config.target_longest_edge)
+    if model_size != gray.size:
+        gray = gray.resize(model_size, Image.Resampling.BOX)
+    
+    ink = gray.point(lambda v: 255 if v < INK_THRESHOLD else 0)
+    rows = ink.resize((1, ink.height), Image.Resampling.BOX).getdata()
+    
+    heights = []
+    run = 0
+    for value in list(rows) + [0]:
+        if value > 1:
+            run += 1
+        elif run:
+            heights.append(run)
+            run = 0
+    
+    max_height = ink.height * 0.05
+    heights = sorted(h for h in heights if 3 <= h <= max_height)
+    if len(heights) < MIN_TEXT_LINES:
+        return None
+    return float(heights[len(heights) // 2])
+
+
+def image_escalation_reason(image: Image.Image) -> Optional[str]:
+    """
+    Indica, antes do OCR, se a página em baixa resolução tem texto pequeno demais.
+    
+    Args:
+        image: Página renderizada no DPI base
+    
+    Returns:
+        "small_text" ou None
+    """
+    height = text_line_height(image)
+    if height is not None and height < config.adaptive_min_line_height:
+        return "small_text"
+    return None
+
+
+def text_escalation_reason(text: str, ink_ratio: Optional[float]) -> Optional[str]:
+    """
+    Indica, depois do OCR em baixa resolução, se a página deve ser refeita no DPI completo.
+    
+    Args:
+        text: Texto reconhecido no DPI base
+        ink_ratio: Fração da página coberta por tinta (None = desconhecida)
+    
+    Returns:
+        "short_text" (pouco texto para a tinta da página), "tables", "equations" ou None
+    """
+    if ink_ratio is not None and "![" not in text:
+        if len(text.strip()) < ink_ratio * config.adaptive_min_chars_per_ink:
+            return "short_text"
+    if config.adaptive_escalate_tables and ("<table" in text or TABLE_SEPARATOR.search(text)):
+        return "tables"
+    if len(EQUATION_MARKER.findall(text)) >= config.adaptive_min_equations:
+        return "equations"
+    return None
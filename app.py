@@ -4,16 +4,21 @@ olmOCR Dashboard - Aplicação Streamlit para OCR de documentos PDF.
 Esta aplicação processa arquivos PDF usando OCR (Optical Character Recognition),
 convertendo equações para LaTeX e tabelas para HTML.
 """
+import threading
 import streamlit as st
 from pathlib import Path
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 from config import config
 from styles import apply_custom_styles
 from session_state import SessionState
 from ui_components import UIComponents
-from file_utils import get_pdf_files, create_output_directories
-from ocr_service import OCRService
-from document_processor import DocumentProcessor
+from file_utils import mirrored_output_directories
+from folder_scanner import collect_pdf_files, index_destination
+from job_manifest import JobManifest
+from markdown_writer import MarkdownWriter
+from metrics import MetricsRecorder
+from service_registry import ServiceRegistry
 
 
 def process_next_step(
@@ -25,15 +30,18 @@ def process_next_step(
     status_bar
 ) -> None:
     """
-    Executa um passo do processamento (uma página).
+    Executa um passo do processamento (uma janela de páginas processadas em paralelo).
     """
     state_info = SessionState.get_processing_state()
     queue = state_info['queue']
     file_idx = state_info['file_index']
     page_idx = state_info['page_index']
+    manifest = SessionState.get_job_manifest()
     
     # Se terminou a fila
     if file_idx >= len(queue):
+        if manifest:
+            manifest.mark_completed()
         SessionState.stop_processing()
         status_bar.update(label="✅ Processamento concluído!", state="complete", expanded=False)
         st.success("Todos os documentos foram processados!")
@@ -41,9 +49,8 @@ def process_next_step(
 
     current_file = queue[file_idx]
     
-    # Inicializa serviços (poderia ser cacheado, mas é rápido)
-    ocr_service = OCRService(base_url=api_url)
-    processor = DocumentProcessor(ocr_service, dpi=dpi, poppler_path=poppler_path)
+    # Reutiliza serviços (cliente HTTP e conexões keep-alive) entre reruns e arquivos
+    processor = ServiceRegistry.get_processor(api_url, dpi=dpi, poppler_path=poppler_path)
     
     # Se for a primeira página do arquivo, inicializa contadores
     total_pages = state_info['total_pages']
@@ -60,59 +67,120 @@ def process_next_step(
         if SessionState.OUTPUT_FOLDER_NAME in st.session_state:
              st.session_state[SessionState.OUTPUT_FOLDER_NAME] = output_folder_name
     
-    if page_idx == 1 and total_pages == 0:
+    # Início (ou retomada) de um arquivo
+    if total_pages == 0:
         total_pages = processor.get_pdf_page_count(current_file)
         SessionState.update_processing_state(file_idx, page_idx, total_pages)
         
-        # Cria diretórios apenas uma vez por arquivo
-        create_output_directories(
-            current_file.parent,
-            output_folder_name,
-            config.images_folder_name
+        if manifest:
+            manifest.record_file_start(file_idx, total_pages)
+        
+        # Modo incremental: o índice registra o arquivo como estava antes da conversão
+        _, incremental = SessionState.get_scan_options()
+        SessionState.set_file_snapshot(
+            ServiceRegistry.get_file_index().snapshot(current_file) if incremental else None
         )
     
+    # Janela de páginas processadas concorrentemente neste passo
+    last_page = max(page_idx, min(total_pages, page_idx + processor.max_workers - 1))
+    
     # Atualiza status visual
-    status_bar.write(f"📄 Processando: **{current_file.name}** - Página {page_idx}/{total_pages}...")
+    if last_page > page_idx:
+        status_bar.write(f"📄 Processando: **{current_file.name}** - Páginas {page_idx}-{last_page}/{total_pages}...")
+    else:
+        status_bar.write(f"📄 Processando: **{current_file.name}** - Página {page_idx}/{total_pages}...")
     
     try:
-        # Define diretório de imagens
-        _, images_dir = create_output_directories(
-            current_file.parent,
-            output_folder_name,
-            config.images_folder_name
-        )
-        
-        # Processa página única
-        image, text = processor.process_single_page(
+        # Define diretórios de saída (subpastas da origem são reproduzidas na saída)
+        if manifest:
+            output_root, source_root = manifest.output_dir, manifest.source_root
+        else:
+            output_root, source_root = Path(current_file.parent) / output_folder_name, None
+        markdown_dir, images_dir = mirrored_output_directories(
             current_file,
-            page_idx,
-            images_dir
-        )
-        
-        # Adiciona ao histórico e estado (isso permite navegação imediata para esta página)
-        SessionState.add_page(image, text, page_idx, current_file.name)
-        
-        # Atualiza display APENAS se for a primeira página (para dar feedback inicial)
-        # Nas próximas, deixamos o usuário onde ele está
-        if SessionState.get_current_page_index() == 0 and len(SessionState.get_pages()) == 1:
-             img_placeholder.image(image, caption=f"{current_file.name} - Pág {page_idx}", width="stretch")
-             UIComponents.render_text_box(txt_placeholder, text)
-        
-        # Salva o markdown (append)
-        markdown_dir, _ = create_output_directories(
-            current_file.parent,
-            output_folder_name,
+            source_root,
+            output_root,
             config.images_folder_name
         )
         output_md_path = markdown_dir / f"{current_file.stem}.md"
         
-        # Lê existente ou cria novo
-        existing_md = output_md_path.read_text(encoding="utf-8") if output_md_path.exists() and page_idx > 1 else ""
-        new_md_chunk = f"## Página {page_idx}\n\n{text}\n\n---\n\n"
-        output_md_path.write_text(existing_md + new_md_chunk, encoding="utf-8")
+        # Ao retomar, descarta do parcial o que foi gravado após o último checkpoint
+        resume_offset = manifest.files[file_idx]["md_offset"] if manifest else None
+        recorder = MetricsRecorder(output_root / MetricsRecorder.FILENAME)
+        
+        # Enquanto não há nenhuma página pronta, mostra o texto da primeira sendo transcrito
+        # (depois disso a tela fica na página que o usuário escolheu)
+        show_chunk = None
+        if not SessionState.has_pages():
+            script_ctx = get_script_run_ctx()
+            first_page = page_idx
+            
+            def show_chunk(chunk_page: int, text: str) -> None:
+                if chunk_page != first_page:
+                    return
+                # Chamado das threads de OCR: precisam do contexto do script para desenhar
+                add_script_run_ctx(threading.current_thread(), script_ctx)
+                UIComponents.render_text_box(txt_placeholder, text)
+        
+        # Processa a janela de páginas (OCR concorrente, resultados em ordem)
+        # O markdown é apenas acrescentado (sem reler o arquivo a cada página)
+        with MarkdownWriter(output_md_path, resume=page_idx > 1, resume_offset=resume_offset) as writer:
+            # Retomada após a última página (interrompida antes de publicar): nada a processar
+            results = () if page_idx > total_pages > 0 else processor.iter_results(
+                current_file,
+                images_dir,
+                first_page=page_idx,
+                last_page=last_page,
+                on_chunk=show_chunk,
+                page_count=total_pages,
+                adaptive_dpi=SessionState.get_adaptive_dpi(),
+                duplicates=SessionState.get_duplicate_index()
+            )
+            for result in results:
+                done_page, image, text = result.page_num, result.image, result.text
+                
+                # Salva o markdown (append + fsync)
+                with result.metrics.stage("write"):
+                    text_offset, text_length = writer.write_page(done_page, text)
+                recorder.record(result.metrics)
+                
+                # Adiciona ao histórico e estado (isso permite navegação imediata para esta página)
+                # O histórico guarda só a miniatura e a posição do texto no markdown
+                SessionState.add_page(
+                    image,
+                    text,
+                    done_page,
+                    current_file.name,
+                    text_ref=(str(output_md_path), text_offset, text_length)
+                )
+                
+                # Atualiza display APENAS se for a primeira página (para dar feedback inicial)
+                # Nas próximas, deixamos o usuário onde ele está
+                if SessionState.get_current_page_index() == 0 and len(SessionState.get_pages()) == 1:
+                     img_placeholder.image(image, caption=f"{current_file.name} - Pág {done_page}", width="stretch")
+                     UIComponents.render_text_box(txt_placeholder, text)
+                
+                # Registra progresso página a página (um erro no meio da janela não perde o que já foi salvo)
+                page_idx = done_page + 1
+                SessionState.update_processing_state(file_idx, page_idx, total_pages)
+                if manifest:
+                    manifest.record_page(file_idx, done_page, writer.tell(), result.metrics.failed)
+            
+            # Última página do arquivo: publica o markdown final
+            if page_idx > total_pages:
+                writer.finalize()
+                if manifest:
+                    manifest.record_file_done(file_idx)
+                snapshot = SessionState.get_file_snapshot()
+                if snapshot:
+                    ServiceRegistry.get_file_index().mark_processed(
+                        current_file,
+                        index_destination(None, source_root or current_file.parent),
+                        snapshot
+                    )
         
         # Avança contadores
-        next_page = page_idx + 1
+        next_page = page_idx
         next_file = file_idx
         next_total = total_pages
         
@@ -123,11 +191,14 @@ def process_next_step(
         
         SessionState.update_processing_state(next_file, next_page, next_total)
         
-        # Força rerun para processar próximo chunk
+        # Força rerun para processar próxima janela
         st.rerun()
         
     except Exception as e:
         status_bar.error(f"❌ Erro ao processar {current_file.name} pág {page_idx}: {e}")
+        # O manifesto guarda o progresso: o lote pode ser retomado depois
+        if manifest:
+            manifest.record_error(file_idx, str(e))
         SessionState.stop_processing()
 
 
@@ -149,18 +220,57 @@ def main() -> None:
     
     # Sidebar com configurações
     api_url, poppler_path, dpi = UIComponents.render_sidebar()
+    cache = ServiceRegistry.get_cache()
+    UIComponents.render_cache_stats(cache.stats() if cache else None)
+    try:
+        ocr_service = ServiceRegistry.get_ocr_service(api_url)
+    except ValueError as e:
+        # URL ou peso inválido na lista de servidores
+        st.error(f"❌ API URL: {e}")
+        st.stop()
+    UIComponents.render_endpoint_stats(ocr_service.pool.stats())
+    
+    # Métricas do lote atual (do metrics.jsonl da pasta de saída, lendo só as linhas novas a cada rerun)
+    manifest = SessionState.get_job_manifest()
+    if manifest:
+        summaries = ServiceRegistry.get_metrics_summaries()
+        UIComponents.render_metrics_summary(summaries.summary(manifest.output_dir / MetricsRecorder.FILENAME))
     
     # Seletor de pasta e botão iniciar
     folder_to_process = UIComponents.render_folder_selector()
     
     # Se o usuário clicou em iniciar (folder_to_process retornou path), iniciamos o estado
     if folder_to_process and not SessionState.is_processing():
-         pdf_files = get_pdf_files(folder_to_process)
+         recursive, incremental = SessionState.get_scan_options()
+         pdf_files = collect_pdf_files(
+             Path(folder_to_process),
+             recursive,
+             incremental,
+             index=ServiceRegistry.get_file_index()
+         )
          if pdf_files:
              SessionState.start_processing(pdf_files)
+             
+             # Manifesto em disco permite retomar o lote após falhas ou reinícios
+             output_dir = Path(folder_to_process) / SessionState.get_output_folder_name()
+             SessionState.set_job_manifest(
+                 JobManifest.create(
+                     output_dir,
+                     pdf_files,
+                     {"api_url": api_url, "dpi": dpi, "source_root": folder_to_process}
+                 )
+             )
              st.rerun()
          else:
-             st.warning("Nenhum PDF encontrado.")
+             st.warning("Nenhum PDF novo ou alterado." if incremental else "Nenhum PDF encontrado.")
+    
+    # Oferece retomar um lote inacabado da pasta selecionada
+    folder_path = SessionState.get_folder_path()
+    if folder_path and not SessionState.is_processing():
+        resumable = JobManifest.find_resumable(folder_path)
+        if resumable and UIComponents.render_resume_option(resumable):
+            SessionState.resume_processing(resumable)
+            st.rerun()
 
     st.divider()
     
@@ -178,8 +288,8 @@ def main() -> None:
     if SessionState.has_pages():
         current_page = SessionState.get_current_page()
         if current_page:
-            img_placeholder.image(current_page["image"], width="stretch")
-            UIComponents.render_text_box(txt_placeholder, current_page["text"])
+            img_placeholder.image(SessionState.get_page_image(current_page), width="stretch")
+            UIComponents.render_text_box(txt_placeholder, SessionState.get_page_text(current_page))
     
     # Lógica de Loop de Processamento
     if SessionState.is_processing():
@@ -0,0 +1,457 @@
+"""
+Inferência em lote offline: exporta as páginas em JSONL no formato batch da
+API OpenAI e importa os resultados como markdown e imagens.
+
+O pacote de exportação é uma pasta com `bundle.json` (PDFs, páginas e o que
+cada página espera do lote) e um ou mais `requests_NNNN.jsonl`. Os arquivos
+de requisição podem ser enviados à API de batch da OpenAI ou rodados
+localmente (ex: `vllm run-batch`); os JSONL de resultado voltam pela
+importação, que grava a mesma saída de `process_document`.
+"""
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from config import config
+from document_processor import DocumentProcessor, PreparedPage
+from figure_extractor import FigureWriter
+from folder_scanner import file_hash
+from file_utils import mirrored_output_directories
+from generation_guard import periodic_start, token_limit
+from markdown_writer import MarkdownWriter
+from metrics import MetricsRecorder, PageMetrics
+from ocr_service import OCRService
+
+
+# Endpoint das requisições (o mesmo em todas as linhas de um arquivo de batch)
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+
+class BatchRequestWriter:
+    """Grava as requisições em arquivos JSONL, abrindo um novo ao atingir os limites da API de batch."""
+    
+    FILENAME = "requests_{:04d}.jsonl"
+    
+    def __init__(self, bundle_dir: Path):
+        """
+        Args:
+            bundle_dir: Pasta do pacote de exportação
+        """
+        self.bundle_dir = Path(bundle_dir)
+        self.paths: list[Path] = []
+        self.requests = 0
+        self._file = None
+        self._lines = 0
+        self._bytes = 0
+    
+    def write(self, custom_id: str, prepared: PreparedPage) -> None:
+        """
+        Grava a requisição de uma página.
+        
+        Args:
+            custom_id: Identificador da página nos resultados
+            prepared: Página codificada
+        """
+        body = {
+            "model": config.model_name,
+            "messages": OCRService.build_messages(prepared.encoded)
+        }
+        if prepared.max_chars:
+            # Sem streaming não há como abortar um loop: o teto de tokens limita o custo
+            body["max_tokens"] = token_limit(prepared.max_chars)
+        
+        line = json.dumps(
+            {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+            ensure_ascii=False
+        ).encode("utf-8") + b"\n"
+        
+        if self._file is None or (
+            self._lines >= config.batch_max_requests
+            or self._bytes + len(line) > config.batch_max_file_mb * 1024 * 1024
+        ):
+            self._open_next()
+        self._file.write(line)
+        self._lines += 1
+        self._bytes += len(line)
+        self.requests += 1
+    
+    def _open_next(self) -> None:
+        """Fecha o arquivo atual e abre o próximo."""
+        self.close()
+        path = self.bundle_dir / self.FILENAME.format(len(self.paths) + 1)
+        self._file = open(path, "wb")
+        self._lines = 0
+        self._bytes = 0
+        self.paths.append(path)
+    
+    def close(self) -> None:
+        """Fecha o arquivo atual."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def __enter__(self) -> "BatchRequestWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class BatchBundle:
+    """
+    Descrição em disco de um lote exportado: PDFs, configurações da exportação
+    e, para cada página, de onde virá o texto.
+    
+    Cada página guarda uma das formas:
+    - {"custom_id", "cache_key"}: texto virá do resultado do lote
+    - {"text", "skipped"}: texto já conhecido (camada de texto, em branco, cache)
+    - {"same_as"}: repete o texto de outra página do mesmo PDF
+    """
+    
+    FILENAME = "bundle.json"
+    
+    def __init__(self, path: Path, data: dict):
+        """
+        Args:
+            path: Caminho do `bundle.json`
+            data: Conteúdo do pacote
+        """
+        self.path = Path(path)
+        self.data = data
+    
+    @classmethod
+    def load(cls, bundle_dir: Path) -> Optional["BatchBundle"]:
+        """
+        Carrega o pacote de uma pasta.
+        
+        Args:
+            bundle_dir: Pasta do pacote
+        
+        Returns:
+            Pacote ou None se não existir/estiver ilegível
+        """
+        path = Path(bundle_dir) / cls.FILENAME
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return cls(path, data)
+    
+    @property
+    def bundle_dir(self) -> Path:
+        """Pasta do pacote."""
+        return self.path.parent
+    
+    @property
+    def settings(self) -> dict:
+        """Configurações usadas na exportação (DPI, modelo...)."""
+        return self.data["settings"]
+    
+    @property
+    def source_root(self) -> Optional[Path]:
+        """Pasta de origem dos PDFs (as subpastas são espelhadas na saída)."""
+        root = self.settings.get("source_root")
+        return Path(root) if root else None
+    
+    @property
+    def index_destination(self) -> Optional[Path]:
+        """Destino dos PDFs no índice do modo incremental (None se exportado sem --incremental)."""
+        destination = self.settings.get("index_destination")
+        return Path(destination) if destination else None
+    
+    @property
+    def files(self) -> list[dict]:
+        """Entradas de arquivo do pacote."""
+        return self.data["files"]
+    
+    @property
+    def request_files(self) -> list[Path]:
+        """Arquivos JSONL de requisições."""
+        return [self.bundle_dir / name for name in self.data["request_files"]]
+    
+    @staticmethod
+    def snapshot(entry: dict) -> Optional[tuple[int, int, str]]:
+        """
+        Estado do PDF na exportação, para `FileIndex.mark_processed`.
+        
+        Returns:
+            Tupla (size, mtime_ns, sha256), ou None se o pacote não foi
+            exportado no modo incremental
+        """
+        if not entry.get("sha256"):
+            return None
+        return entry["size"], entry["mtime_ns"], entry["sha256"]
+    
+    def save(self) -> None:
+        """Grava o pacote de forma atômica (arquivo temporário + rename)."""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def export_batch(
+    processor: DocumentProcessor,
+    pdf_files: Iterable[Path],
+    bundle_dir: Path,
+    source_root: Optional[Path] = None,
+    on_file: Optional[Callable[[Path, int], None]] = None,
+    index_destination: Optional[Path] = None
+) -> BatchBundle:
+    """
+    Renderiza e codifica as páginas dos PDFs e grava as requisições do lote.
+    
+    Páginas que dispensam o modelo (camada de texto, em branco, cache,
+    repetidas) não geram requisição. Um PDF que falha na renderização é
+    registrado com o erro e não interrompe a exportação.
+    
+    Args:
+        processor: Processador (DPI, Poppler, cache e análise de páginas)
+        pdf_files: PDFs a exportar
+        bundle_dir: Pasta do pacote (criada se não existir)
+        source_root: Pasta de origem dos PDFs
+        on_file: Callback após exportar cada PDF (caminho, requisições geradas)
+        index_destination: Modo incremental: destino do lote no índice de arquivos
+            convertidos; guarda também o hash de cada PDF antes da renderização,
+            para a importação registrá-lo
+    
+    Returns:
+        Pacote gravado
+    """
+    bundle_dir = Path(bundle_dir)
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    files = []
+    
+    with BatchRequestWriter(bundle_dir) as requests:
+        for file_idx, pdf_path in enumerate(pdf_files):
+            pdf_path = Path(pdf_path).resolve()
+            stat = os.stat(pdf_path)
+            entry = {
+                "path": str(pdf_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": file_hash(pdf_path) if index_destination else None,
+                "total_pages": 0,
+                "pages": [],
+                "error": None
+            }
+            files.append(entry)
+            
+            first_request = requests.requests
+            try:
+                for page_num, item, metrics in processor.iter_prepared(pdf_path):
+                    if isinstance(item, PreparedPage):
+                        custom_id = f"f{file_idx:05d}-p{page_num:05d}"
+                        requests.write(custom_id, item)
+                        entry["pages"].append({"custom_id": custom_id, "cache_key": item.cache_key})
+                    elif isinstance(item, int):
+                        entry["pages"].append({"same_as": item})
+                    else:
+                        skipped = metrics.skipped or ("cache" if metrics.cache_hit else None)
+                        entry["pages"].append({"text": item, "skipped": skipped})
+                entry["total_pages"] = len(entry["pages"])
+            except Exception as e:
+                entry["error"] = str(e)
+            
+            if on_file:
+                on_file(pdf_path, requests.requests - first_request)
+    
+    bundle = BatchBundle(bundle_dir / BatchBundle.FILENAME, {
+        "version": 1,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": {
+            "dpi": processor.dpi,
+            "model": config.model_name,
+            "source_root": str(source_root) if source_root else None,
+            "index_destination": str(index_destination) if index_destination else None
+        },
+        "request_files": [path.name for path in requests.paths],
+        "requests": requests.requests,
+        "files": files
+    })
+    bundle.save()
+    return bundle
+
+
+def load_results(paths: Iterable[Path]) -> dict[str, dict]:
+    """
+    Lê arquivos de resultado no formato batch da API OpenAI.
+    
+    Args:
+        paths: Arquivos JSONL de resultado
+    
+    Returns:
+        Dicionário custom_id → {"text", "finish_reason", "usage", "error"}
+    """
+    results = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                
+                error = record.get("error")
+                if error is None and response.get("status_code", 200) != 200:
+                    error = body.get("error") or f"HTTP {response.get('status_code')}"
+                if error is None and not body.get("choices"):
+                    error = "resposta sem choices"
+                if error is not None:
+                    message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+                    results[record["custom_id"]] = {"error": message}
+                    continue
+                
+                choice = body["choices"][0]
+                results[record["custom_id"]] = {
+                    "text": choice["message"].get("content") or "",
+                    "finish_reason": choice.get("finish_reason"),
+                    "usage": body.get("usage") or {},
+                    "error": None
+                }
+    return results
+
+
+def _page_texts(entry: dict, results: dict[str, dict]) -> tuple[list[tuple[str, PageMetrics]], list[str]]:
+    """
+    Reúne o texto de cada página de um PDF a partir do pacote e dos resultados.
+    
+    Returns:
+        Tupla (lista de (texto, métricas) na ordem das páginas, erros das páginas sem resultado)
+    """
+    file_label = Path(entry["path"]).name
+    pages: list[tuple[str, PageMetrics]] = []
+    errors = []
+    
+    for page_num, page in enumerate(entry["pages"], start=1):
+        metrics = PageMetrics(file=file_label, page=page_num)
+        if "same_as" in page:
+            text = pages[page["same_as"] - 1][0]
+            metrics.skipped = "duplicate"
+        elif "custom_id" in page:
+            result = results.get(page["custom_id"])
+            if result is None or result["error"] is not None:
+                errors.append(f"página {page_num}: {result['error'] if result else 'sem resultado'}")
+                text = ""
+            else:
+                text = result["text"]
+                metrics.attempts = 1
+                metrics.prompt_tokens = result["usage"].get("prompt_tokens")
+                metrics.completion_tokens = result["usage"].get("completion_tokens")
+                
+                # Loops não podem ser abortados no lote: o texto é cortado onde o loop começa
+                loop_start = periodic_start(text, config.guard_repeat_window, config.guard_min_repeats)
+                if loop_start is not None:
+                    text, metrics.degenerate = text[:loop_start], "repetition"
+                elif result["finish_reason"] == "length":
+                    metrics.degenerate = "length"
+        else:
+            text = page["text"]
+            if page.get("skipped") == "cache":
+                metrics.cache_hit = True
+            else:
+                metrics.skipped = page.get("skipped")
+        pages.append((text, metrics))
+    
+    return pages, errors
+
+
+def import_batch(
+    processor: DocumentProcessor,
+    bundle: BatchBundle,
+    result_paths: Iterable[Path],
+    output_dir: Path,
+    metrics_recorder: Optional[MetricsRecorder] = None,
+    on_file: Optional[Callable[[Path, Optional[Path], Optional[str]], None]] = None
+) -> dict[str, str]:
+    """
+    Grava o markdown e as figuras de cada PDF do pacote a partir dos resultados do lote.
+    
+    A saída é a mesma de `process_document`: um markdown por PDF (espelhando
+    as subpastas de origem) e os recortes das figuras, para os quais as
+    páginas com referências de imagem são renderizadas de novo no DPI da
+    exportação. Os textos recebidos entram no cache de OCR.
+    
+    Args:
+        processor: Processador (Poppler, cache)
+        bundle: Pacote exportado
+        result_paths: Arquivos JSONL de resultado
+        output_dir: Pasta de saída
+        metrics_recorder: Onde gravar as métricas de cada página (opcional)
+        on_file: Callback por PDF (caminho, markdown gravado ou None, erro ou None)
+    
+    Returns:
+        Dicionário caminho do PDF → erro, para os PDFs não gravados
+    """
+    results = load_results(result_paths)
+    failures = {}
+    
+    for entry in bundle.files:
+        pdf_path = Path(entry["path"])
+        try:
+            output_md_path = _import_file(processor, bundle, entry, results, Path(output_dir), metrics_recorder)
+            error = None
+        except Exception as e:
+            output_md_path, error = None, str(e)
+            failures[str(pdf_path)] = error
+        if on_file:
+            on_file(pdf_path, output_md_path, error)
+    
+    return failures
+
+
+def _import_file(
+    processor: DocumentProcessor,
+    bundle: BatchBundle,
+    entry: dict,
+    results: dict[str, dict],
+    output_dir: Path,
+    metrics_recorder: Optional[MetricsRecorder]
+) -> Path:
+    """Grava a saída de um PDF do pacote; levanta ValueError se faltar algum resultado."""
+    pdf_path = Path(entry["path"])
+    if entry["error"]:
+        raise ValueError(f"falhou na exportação: {entry['error']}")
+    
+    stat = os.stat(pdf_path)
+    if (stat.st_size, stat.st_mtime_ns) != (entry["size"], entry["mtime_ns"]):
+        # As figuras seriam recortadas de páginas diferentes das enviadas ao modelo
+        raise ValueError("PDF alterado desde a exportação")
+    
+    pages, errors = _page_texts(entry, results)
+    if errors:
+        raise ValueError(f"{len(errors)} páginas sem resultado ({errors[0]})")
+    
+    if processor.cache is not None:
+        for page, (text, metrics) in zip(entry["pages"], pages):
+            if page.get("cache_key") and metrics.degenerate is None:
+                processor.cache.put(page["cache_key"], text)
+    
+    markdown_dir, images_dir = mirrored_output_directories(
+        pdf_path, bundle.source_root, output_dir, config.images_folder_name
+    )
+    renderer = processor.get_renderer(pdf_path, entry["total_pages"], bundle.settings["dpi"])
+    
+    with MarkdownWriter(markdown_dir / f"{pdf_path.stem}.md") as writer:
+        with FigureWriter(images_dir) as figures:
+            for page_num, (page_text, metrics) in enumerate(pages, start=1):
+                if "![" in page_text:
+                    # As coordenadas das figuras se referem à imagem enviada na exportação
+                    with metrics.stage("render"):
+                        page_image = renderer.render_page(page_num)
+                    with metrics.stage("save"):
+                        page_text = processor.save_page_image(
+                            pdf_path, page_num, page_image, page_text, images_dir, figures
+                        )
+                
+                with metrics.stage("write"):
+                    writer.write_page(page_num, page_text)
+                if metrics_recorder:
+                    metrics_recorder.record(metrics)
+        
+        return writer.finalize()
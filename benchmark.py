@@ -0,0 +1,296 @@
+"""
+Benchmark offline do pipeline de OCR contra o servidor simulado.
+
+Gera PDFs sintéticos, sobe um servidor compatível com a API OpenAI com latência
+e falhas configuráveis e mede páginas/s, latência por página e pico de memória
+de `process_document` (PDF completo) e do caminho por página (`ocr_pages`).
+
+Uso:
+    python benchmark.py --pages 1,10,50 --ttft 0.2 --tokens-per-second 200
+    python benchmark.py --json resultado.json --baseline base.json --max-regression 10
+"""
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional
+from PIL import Image, ImageDraw
+from pdf2image.exceptions import PDFInfoNotInstalledError
+
+from config import config
+from document_processor import DocumentProcessor
+from metrics import MetricsRecorder, percentile
+from mock_ocr_server import LOREM_WORDS, MockOCRServer, MockServerSettings
+from ocr_service import OCRService
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def synthetic_page(page_num: int, dpi: int = 150) -> Image.Image:
+    """
+    Gera uma página A4 com texto corrido, no tamanho renderizado em `dpi`.
+    
+    O texto é sorteado com a semente `page_num`: páginas diferentes nunca
+    têm o mesmo conteúdo.
+    
+    Args:
+        page_num: Número da página (impresso no cabeçalho)
+        dpi: Resolução da página
+    
+    Returns:
+        Imagem PIL da página
+    """
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    
+    margin = dpi // 2
+    line_height = max(12, dpi // 8)
+    draw.text((margin, margin), f"Página {page_num}", fill="black")
+    
+    words_per_line = 12
+    rng = random.Random(page_num)
+    y = margin + 2 * line_height
+    while y < height - margin:
+        words = rng.choices(LOREM_WORDS, k=words_per_line)
+        draw.text((margin, y), " ".join(words), fill="black")
+        y += line_height
+    return image
+
+
+def create_synthetic_pdf(path: Path, page_count: int, dpi: int = 150) -> Path:
+    """Cria um PDF com `page_count` páginas sintéticas."""
+    pages = [synthetic_page(n, dpi) for n in range(1, page_count + 1)]
+    pages[0].save(str(path), format="PDF", resolution=dpi, save_all=True, append_images=pages[1:])
+    return path
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de memória residente do processo em MB (None se indisponível)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(name: str, pages: int, run: Callable[[], list[float]], trace_memory: bool = False) -> dict:
+    """
+    Executa um cenário e mede tempo, latências e memória.
+    
+    Args:
+        name: Nome do cenário
+        pages: Número de páginas processadas
+        run: Função que processa as páginas e retorna a latência de cada uma
+             (segundos desde o início do cenário até a página ficar pronta)
+        trace_memory: Mede o pico de alocações Python com tracemalloc
+                      (deixa o processamento bem mais lento; não comparar páginas/s)
+    
+    Returns:
+        Dicionário com os resultados do cenário
+    """
+    traced_peak = None
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        latencies = run()
+    finally:
+        elapsed = time.perf_counter() - start
+        if trace_memory:
+            traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+    
+    return {
+        "scenario": name,
+        "pages": pages,
+        "elapsed": elapsed,
+        "pages_per_second": pages / elapsed if elapsed else 0.0,
+        "first_page_latency": latencies[0] if latencies else None,
+        "latency_p50": percentile(latencies, 50) if latencies else None,
+        "latency_p95": percentile(latencies, 95) if latencies else None,
+        "python_peak_mb": traced_peak,
+        "rss_peak_mb": peak_rss_mb()
+    }
+
+
+def bench_pages(processor: DocumentProcessor, page_count: int, dpi: int, trace_memory: bool = False) -> dict:
+    """Caminho por página: OCR concorrente de imagens já renderizadas."""
+    images = [(n, synthetic_page(n, dpi)) for n in range(1, page_count + 1)]
+    
+    def run() -> list[float]:
+        start = time.perf_counter()
+        return [time.perf_counter() - start for _ in processor.ocr_pages(images)]
+    
+    return measure(f"ocr_pages[{page_count}]", page_count, run, trace_memory)
+
+
+def bench_document(
+    processor: DocumentProcessor,
+    pdf_path: Path,
+    page_count: int,
+    work_dir: Path,
+    trace_memory: bool = False
+) -> dict:
+    """PDF completo: renderização, OCR, imagens e markdown com `convert_document`."""
+    output_dir = work_dir / f"out_{page_count}"
+    images_dir = output_dir / config.images_folder_name
+    images_dir.mkdir(parents=True, exist_ok=True)
+    recorder = MetricsRecorder(output_dir / MetricsRecorder.FILENAME)
+    
+    def run() -> list[float]:
+        start = time.perf_counter()
+        latencies = []
+        processor.convert_document(
+            pdf_path,
+            output_dir / f"{pdf_path.stem}.md",
+            images_dir,
+            on_page_saved=lambda page, offset, failed: latencies.append(time.perf_counter() - start),
+            metrics_recorder=recorder
+        )
+        return latencies
+    
+    result = measure(f"process_document[{page_count}]", page_count, run, trace_memory)
+    summary = MetricsRecorder.summarize(MetricsRecorder.load(recorder.path))
+    result["stages"] = summary.get("stages", {})
+    result["image_bytes"] = summary.get("image_bytes", 0)
+    result["escalated"] = summary.get("escalated", {})
+    return result
+
+
+def compare(results: list[dict], baseline: list[dict], max_regression: float) -> list[str]:
+    """
+    Compara páginas/s com um resultado anterior.
+    
+    Returns:
+        Lista de cenários que ficaram mais lentos que o limite (em %)
+    """
+    previous = {r["scenario"]: r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result["scenario"])
+        if not before or not before["pages_per_second"]:
+            continue
+        change = (result["pages_per_second"] / before["pages_per_second"] - 1) * 100
+        if change < -max_regression:
+            regressions.append(f"{result['scenario']}: {change:+.1f}% páginas/s")
+    return regressions
+
+
+def _fmt(value: Optional[float], suffix: str = "") -> str:
+    """Formata um número da tabela ("-" se ausente)."""
+    return f"{value:.2f}{suffix}" if value is not None else "-"
+
+
+def print_results(results: list[dict]) -> None:
+    """Imprime a tabela de resultados."""
+    print(f"{'cenário':<24}{'págs/s':>9}{'1ª pág':>9}{'p50':>9}{'p95':>9}{'py MB':>9}{'RSS MB':>9}")
+    for r in results:
+        print(
+            f"{r['scenario']:<24}{_fmt(r['pages_per_second']):>9}{_fmt(r['first_page_latency'], 's'):>9}"
+            f"{_fmt(r['latency_p50'], 's'):>9}{_fmt(r['latency_p95'], 's'):>9}"
+            f"{_fmt(r['python_peak_mb']):>9}{_fmt(r['rss_peak_mb']):>9}"
+        )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Monta o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(description="Benchmark offline do olmOCR com servidor simulado.")
+    parser.add_argument("--pages", default="1,10,50", help="Tamanhos dos PDFs sintéticos (separados por vírgula)")
+    parser.add_argument("--dpi", type=int, default=config.default_dpi)
+    parser.add_argument("--base-dpi", type=int, help="Liga o DPI adaptativo com este DPI base")
+    parser.add_argument("--concurrency", type=int, default=config.max_concurrent_requests)
+    parser.add_argument("--ttft", type=float, default=0.2, help="Segundos até o primeiro token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--tokens-per-page", type=int, default=400)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fração de respostas 503")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Fração de streams truncados")
+    parser.add_argument("--loop-rate", type=float, default=0.0, help="Fração de gerações em loop de repetição")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--poppler-path", default=config.poppler_default_path)
+    parser.add_argument("--trace-memory", action="store_true", help="Mede o pico de alocações Python (mais lento)")
+    parser.add_argument("--skip-document", action="store_true", help="Mede só o caminho por página")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo JSON")
+    parser.add_argument("--baseline", help="Resultados anteriores (JSON) para comparação")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Queda máxima de páginas/s em %%")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Executa o benchmark. Retorna 1 se houver regressão em relação ao baseline."""
+    args = build_parser().parse_args(argv)
+    page_counts = [int(n) for n in args.pages.split(",") if n.strip()]
+    
+    # Falhas simuladas não devem dominar o tempo medido com esperas longas
+    config.retry_backoff_base = 0.05
+    config.retry_backoff_max = 0.5
+    # Loops simulados que persistirem não derrubam a medição
+    config.guard_on_failure = "truncate"
+    # Toda página deve chegar ao modelo: os cenários só são comparáveis assim
+    config.skip_duplicate_pages = False
+    if args.base_dpi:
+        config.adaptive_dpi = True
+        config.adaptive_base_dpi = args.base_dpi
+    
+    settings = MockServerSettings(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        tokens_per_page=args.tokens_per_page,
+        failure_rate=args.failure_rate,
+        truncate_rate=args.truncate_rate,
+        loop_rate=args.loop_rate,
+        seed=args.seed
+    )
+    work_dir = Path(tempfile.mkdtemp(prefix="olmocr_bench_"))
+    results = []
+    
+    with MockOCRServer(settings) as server:
+        ocr_service = OCRService(base_url=server.base_url, api_key="mock")
+        processor = DocumentProcessor(
+            ocr_service,
+            dpi=args.dpi,
+            poppler_path=args.poppler_path,
+            max_workers=args.concurrency,
+            cache=None
+        )
+        try:
+            for page_count in page_counts:
+                results.append(bench_pages(processor, page_count, args.dpi, args.trace_memory))
+                if args.skip_document:
+                    continue
+                pdf_path = create_synthetic_pdf(work_dir / f"synthetic_{page_count}.pdf", page_count, args.dpi)
+                try:
+                    results.append(bench_document(processor, pdf_path, page_count, work_dir, args.trace_memory))
+                except PDFInfoNotInstalledError:
+                    print("Poppler não encontrado: cenários process_document ignorados.", file=sys.stderr)
+                    args.skip_document = True
+        finally:
+            ocr_service.close()
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        print_results(results)
+        print(f"Servidor simulado: {server.requests} requisições, {server.failures} falhas injetadas")
+    
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"⚠️  Regressão: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
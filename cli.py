@@ -0,0 +1,542 @@
+"""
+olmOCR CLI - Processamento em lote de PDFs sem interface.
+
+Uso:
+    python cli.py run <pasta> [--dpi 150] [--concurrency 8] [--output <pasta>] [--api-url <url>]
+    python cli.py run <pasta> --recursive --incremental --exclude "arquivo/*"
+    python cli.py watch <pasta> [--recursive] [--files 2]
+    python cli.py batch-export <pasta> [--bundle <pasta>] [--recursive]
+    python cli.py batch-import <pacote> <resultados.jsonl>... [--output <pasta>]
+    python cli.py serve [--port 8765] [--workers 2] [--token <token>]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from batch_bundle import BatchBundle, export_batch, import_batch
+from config import config
+from document_processor import DocumentProcessor
+from endpoint_pool import EndpointPool
+from file_utils import create_output_directories, mirrored_output_directories
+from folder_scanner import collect_pdf_files, index_destination
+from folder_watcher import FolderWatcher, WatchQueue
+from http_api import JobAPIServer
+from job_manifest import JobManifest
+from job_service import JobService
+from job_store import JobStore
+from metrics import MetricsRecorder
+from ocr_service import OCRService
+from service_registry import ServiceRegistry
+
+
+def api_urls(value: str) -> str:
+    """Valida a lista de servidores de `--api-url` (URLs e pesos) ao ler os argumentos."""
+    try:
+        endpoints = EndpointPool.parse_urls(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+    if not endpoints:
+        raise argparse.ArgumentTypeError("Nenhuma URL de API informada")
+    return value
+
+
+def build_processor(args: argparse.Namespace) -> DocumentProcessor:
+    """Cria o processador de documentos a partir dos argumentos da linha de comando."""
+    if args.base_dpi:
+        config.adaptive_dpi = True
+        config.adaptive_base_dpi = args.base_dpi
+    ocr_service = OCRService(base_url=args.api_url, api_key=args.api_key)
+    return DocumentProcessor(
+        ocr_service,
+        dpi=args.dpi,
+        poppler_path=args.poppler_path,
+        max_workers=args.concurrency,
+        cache=None if args.no_cache else ServiceRegistry.get_cache()
+    )
+
+
+def open_manifest(args: argparse.Namespace, folder: Path) -> Optional[JobManifest]:
+    """
+    Abre o manifesto do lote: retoma um existente ou cria um novo.
+    
+    Args:
+        args: Argumentos da linha de comando
+        folder: Pasta com os PDFs
+    
+    Returns:
+        Manifesto do lote ou None se não houver PDFs
+    """
+    if args.resume:
+        manifest = JobManifest.load(args.output) if args.output else JobManifest.find_resumable(str(folder))
+        if manifest and not manifest.is_completed:
+            print(f"♻️  Retomando lote em {manifest.output_dir}")
+            return manifest
+        print("Nenhum lote inacabado encontrado; iniciando um novo.")
+    
+    pdf_files = collect_pdf_files(
+        folder,
+        recursive=args.recursive,
+        incremental=args.incremental,
+        index=ServiceRegistry.get_file_index(),
+        include=args.include,
+        exclude=args.exclude,
+        destination=index_destination(args.output, folder)
+    )
+    if not pdf_files:
+        return None
+    
+    if args.output:
+        output_dir = Path(args.output)
+    else:
+        timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        output_dir = folder / f"{config.output_folder_name}_{timestamp}"
+    
+    settings = {
+        "api_url": args.api_url,
+        "dpi": args.dpi,
+        "concurrency": args.concurrency,
+        "source_root": str(folder)
+    }
+    return JobManifest.create(output_dir, pdf_files, settings)
+
+
+def run(args: argparse.Namespace) -> int:
+    """Processa todos os PDFs de uma pasta. Retorna o código de saída."""
+    folder = Path(args.folder)
+    if not folder.is_dir():
+        print(f"Pasta não encontrada: {folder}", file=sys.stderr)
+        return 2
+    
+    manifest = open_manifest(args, folder)
+    if manifest is None:
+        print("Nenhum PDF novo ou alterado." if args.incremental else "Nenhum PDF encontrado.", file=sys.stderr)
+        return 0 if args.incremental else 1
+    
+    config.text_layer_policy = args.text_layer
+    processor = build_processor(args)
+    output_root, _ = create_output_directories(
+        str(manifest.output_dir.parent),
+        manifest.output_dir.name,
+        config.images_folder_name
+    )
+    
+    file_index = ServiceRegistry.get_file_index()
+    destination = index_destination(args.output, folder)
+    recorder = MetricsRecorder(output_root / MetricsRecorder.FILENAME)
+    # Páginas repetidas (ex: a mesma capa em todos os arquivos) valem para o lote inteiro
+    duplicates = processor.new_duplicate_index()
+    failures = 0
+    start_file, _ = manifest.next_position()
+    batch_start = time.perf_counter()
+    pages_done = 0
+    
+    for file_idx in range(start_file, len(manifest.files)):
+        entry = manifest.files[file_idx]
+        if entry["status"] == JobManifest.STATUS_DONE:
+            continue
+        
+        pdf_path = Path(entry["path"])
+        # Subpastas da origem são reproduzidas na saída (evita colisão de nomes)
+        markdown_dir, images_dir = mirrored_output_directories(
+            pdf_path,
+            manifest.source_root,
+            output_root,
+            config.images_folder_name
+        )
+        first_page = entry["completed_pages"] + 1
+        total_pages = processor.get_pdf_page_count(pdf_path)
+        manifest.record_file_start(file_idx, total_pages)
+        print(f"📄 [{file_idx + 1}/{len(manifest.files)}] {pdf_path.name} ({total_pages} páginas)")
+        
+        def on_page_saved(page_num: int, md_offset: int, failed: Optional[str]) -> None:
+            nonlocal pages_done
+            pages_done += 1
+            manifest.record_page(file_idx, page_num, md_offset, failed)
+            elapsed = time.perf_counter() - batch_start
+            print(f"   página {page_num}/{total_pages} · {pages_done / elapsed * 60:.1f} págs/min", flush=True)
+            if failed:
+                print(f"   ⚠️  página {page_num} sem texto (geração abortada: {failed})", file=sys.stderr, flush=True)
+        
+        try:
+            # Modo incremental: o índice registra o arquivo como estava antes da conversão
+            snapshot = file_index.snapshot(pdf_path) if args.incremental else None
+            processor.convert_document(
+                pdf_path,
+                markdown_dir / f"{pdf_path.stem}.md",
+                images_dir,
+                first_page=first_page,
+                resume_offset=entry["md_offset"] if first_page > 1 else None,
+                on_page_saved=on_page_saved,
+                metrics_recorder=recorder,
+                duplicates=duplicates
+            )
+            manifest.record_file_done(file_idx)
+            if snapshot:
+                file_index.mark_processed(pdf_path, destination, snapshot)
+        except KeyboardInterrupt:
+            manifest.record_error(file_idx, "Interrompido pelo usuário")
+            print("\nInterrompido. Use --resume para continuar.", file=sys.stderr)
+            return 130
+        except Exception as e:
+            failures += 1
+            manifest.record_error(file_idx, str(e))
+            print(f"❌ Erro ao processar {pdf_path.name}: {e}", file=sys.stderr)
+    
+    if failures == 0:
+        manifest.mark_completed()
+    
+    elapsed = time.perf_counter() - batch_start
+    print(f"✅ Concluído: {pages_done} páginas em {elapsed:.1f}s · saída em {manifest.output_dir}")
+    print_metrics_summary(MetricsRecorder.summarize(MetricsRecorder.load(recorder.path)))
+    return 1 if failures else 0
+
+
+def watch(args: argparse.Namespace) -> int:
+    """Observa uma pasta e converte os PDFs novos ou alterados até Ctrl+C. Retorna o código de saída."""
+    folder = Path(args.folder)
+    if not folder.is_dir():
+        print(f"Pasta não encontrada: {folder}", file=sys.stderr)
+        return 2
+    
+    config.text_layer_policy = args.text_layer
+    config.watch_poll_interval = args.poll_interval
+    config.watch_settle_seconds = args.settle
+    output_dir = Path(args.output) if args.output else folder / f"{config.output_folder_name}_watch"
+    queue = WatchQueue(output_dir / WatchQueue.FILENAME)
+    
+    def on_file_done(pdf_path: Path, error: Optional[str]) -> None:
+        if error:
+            print(f"❌ {pdf_path.name}: {error}", file=sys.stderr, flush=True)
+        else:
+            print(f"✅ {pdf_path.name}", flush=True)
+    
+    watcher = FolderWatcher(
+        folder,
+        output_dir,
+        build_processor(args),
+        queue,
+        ServiceRegistry.get_file_index(),
+        recursive=args.recursive,
+        include=args.include,
+        exclude=args.exclude,
+        concurrent_files=args.files,
+        on_file_start=lambda pdf_path: print(f"📄 {pdf_path}", flush=True),
+        on_file_done=on_file_done
+    )
+    mode = "eventos do sistema de arquivos" if watcher.uses_events else f"varredura a cada {args.poll_interval:g}s"
+    print(f"👀 Observando {folder} ({mode}) · saída em {output_dir} · Ctrl+C para sair")
+    
+    watcher.run_forever()
+    counts = queue.counts()
+    queue.close()
+    print(
+        f"Encerrado: {counts.get(WatchQueue.STATUS_DONE, 0)} convertidos, "
+        f"{counts.get(WatchQueue.STATUS_PENDING, 0)} na fila, {counts.get(WatchQueue.STATUS_FAILED, 0)} com falha"
+    )
+    return 0
+
+
+def batch_export(args: argparse.Namespace) -> int:
+    """Exporta as páginas dos PDFs de uma pasta para inferência em lote offline. Retorna o código de saída."""
+    folder = Path(args.folder)
+    if not folder.is_dir():
+        print(f"Pasta não encontrada: {folder}", file=sys.stderr)
+        return 2
+    
+    destination = index_destination(args.bundle, folder)
+    pdf_files = collect_pdf_files(
+        folder,
+        recursive=args.recursive,
+        incremental=args.incremental,
+        index=ServiceRegistry.get_file_index(),
+        include=args.include,
+        exclude=args.exclude,
+        destination=destination
+    )
+    if not pdf_files:
+        print("Nenhum PDF novo ou alterado." if args.incremental else "Nenhum PDF encontrado.", file=sys.stderr)
+        return 0 if args.incremental else 1
+    
+    config.text_layer_policy = args.text_layer
+    bundle_dir = Path(args.bundle) if args.bundle else folder / f"{config.output_folder_name}_batch"
+    bundle = export_batch(
+        build_processor(args),
+        pdf_files,
+        bundle_dir,
+        source_root=folder,
+        on_file=lambda pdf_path, count: print(f"📄 {pdf_path.name}: {count} requisições", flush=True),
+        index_destination=destination if args.incremental else None
+    )
+    
+    failures = [entry for entry in bundle.files if entry["error"]]
+    for entry in failures:
+        print(f"❌ {Path(entry['path']).name}: {entry['error']}", file=sys.stderr)
+    print(f"✅ {bundle.data['requests']} requisições em {len(bundle.request_files)} arquivo(s) · pacote em {bundle_dir}")
+    for path in bundle.request_files:
+        print(f"   {path}")
+    return 1 if failures else 0
+
+
+def batch_import(args: argparse.Namespace) -> int:
+    """Grava o markdown dos PDFs de um pacote a partir dos resultados do lote. Retorna o código de saída."""
+    bundle = BatchBundle.load(Path(args.bundle))
+    if bundle is None:
+        print(f"Pacote não encontrado: {args.bundle}", file=sys.stderr)
+        return 2
+    
+    missing = [path for path in args.results if not Path(path).is_file()]
+    if missing:
+        print(f"Arquivo de resultados não encontrado: {missing[0]}", file=sys.stderr)
+        return 2
+    
+    output_dir = Path(args.output) if args.output else bundle.bundle_dir
+    recorder = MetricsRecorder(output_dir / MetricsRecorder.FILENAME)
+    file_index = ServiceRegistry.get_file_index()
+    # Estado de cada PDF na exportação (só em pacotes exportados com --incremental)
+    snapshots = {entry["path"]: BatchBundle.snapshot(entry) for entry in bundle.files}
+    destination = Path(args.output) if args.output else bundle.index_destination
+    
+    def on_file(pdf_path: Path, markdown_path: Optional[Path], error: Optional[str]) -> None:
+        if error:
+            print(f"❌ {pdf_path.name}: {error}", file=sys.stderr, flush=True)
+        else:
+            snapshot = snapshots.get(str(pdf_path))
+            if snapshot and destination:
+                file_index.mark_processed(pdf_path, destination, snapshot)
+            print(f"✅ {pdf_path.name} → {markdown_path}", flush=True)
+    
+    output_dir.mkdir(parents=True, exist_ok=True)
+    failures = import_batch(
+        build_processor(args),
+        bundle,
+        [Path(path) for path in args.results],
+        output_dir,
+        metrics_recorder=recorder,
+        on_file=on_file
+    )
+    print(f"Concluído: {len(bundle.files) - len(failures)} de {len(bundle.files)} PDFs · saída em {output_dir}")
+    print_metrics_summary(MetricsRecorder.summarize(MetricsRecorder.load(recorder.path)))
+    return 1 if failures else 0
+
+
+def serve(args: argparse.Namespace) -> int:
+    """Executa o serviço HTTP de jobs até Ctrl+C. Retorna o código de saída."""
+    config.text_layer_policy = args.text_layer
+    config.max_concurrent_requests = args.concurrency
+    config.cache_enabled = not args.no_cache
+    if args.base_dpi:
+        config.adaptive_dpi = True
+        config.adaptive_base_dpi = args.base_dpi
+    if args.token:
+        config.service_token = args.token
+    if args.allowed_root:
+        config.service_allowed_roots = tuple(args.allowed_root)
+    
+    data_dir = Path(args.data_dir).expanduser()
+    store = JobStore(data_dir / JobStore.FILENAME)
+    service = JobService(
+        store,
+        data_dir,
+        workers=args.workers,
+        processor_factory=lambda settings: ServiceRegistry.get_processor(
+            args.api_url,
+            args.api_key,
+            settings.get("dpi") or args.dpi,
+            args.poppler_path
+        )
+    )
+    server = JobAPIServer(service, args.host, args.port)
+    
+    service.start()
+    print(f"🌐 API de jobs em {server.base_url} · {service.workers} arquivos simultâneos · dados em {data_dir}")
+    print("   Ctrl+C para sair (os arquivos em andamento terminam antes)")
+    try:
+        server.run_forever()
+    finally:
+        service.stop()
+        store.close()
+        ServiceRegistry.clear()
+    return 0
+
+
+def print_metrics_summary(summary: dict) -> None:
+    """Imprime o resumo das métricas de desempenho do lote."""
+    if not summary.get("pages"):
+        return
+    
+    tokens_rate = summary["tokens_per_second"]
+    print(
+        f"📊 {summary['pages_per_minute']:.1f} págs/min"
+        + (f" · {tokens_rate:.0f} tokens/s" if tokens_rate else "")
+        + f" · {summary['completion_tokens']} tokens gerados · {summary['cache_hits']} páginas do cache"
+    )
+    for stage, values in summary["stages"].items():
+        print(f"   {stage:<7} p50 {values['p50']:.2f}s · p95 {values['p95']:.2f}s")
+    for reason, count in summary["skipped"].items():
+        print(f"   {count} páginas sem chamar o modelo ({reason})")
+    for reason, count in summary.get("degenerate", {}).items():
+        print(f"   {count} gerações abortadas ({reason})")
+    for reason, count in summary.get("escalated", {}).items():
+        print(f"   {count} páginas refeitas no DPI completo ({reason})")
+    for reason, count in summary.get("failed", {}).items():
+        print(f"   ⚠️  {count} páginas sem texto ({reason})")
+
+
+def add_processing_arguments(parser: argparse.ArgumentParser) -> None:
+    """Opções de OCR comuns aos subcomandos."""
+    parser.add_argument("--dpi", type=int, default=config.default_dpi, help="DPI da renderização")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=config.max_concurrent_requests,
+        help="Páginas enviadas simultaneamente ao servidor de OCR"
+    )
+    parser.add_argument(
+        "--api-url",
+        type=api_urls,
+        default=config.default_api_url,
+        help="URL base da API de OCR (vários servidores: separadas por vírgula, com peso opcional, ex: URL*2)"
+    )
+    parser.add_argument("--api-key", default=config.api_key, help="Chave da API de OCR")
+    parser.add_argument("--poppler-path", default=config.poppler_default_path, help="Pasta do Poppler")
+    parser.add_argument("--no-cache", action="store_true", help="Não usa o cache de OCR")
+    parser.add_argument(
+        "--text-layer",
+        choices=("off", "auto"),
+        default=config.text_layer_policy,
+        help="auto: usa o texto embutido de PDFs digitais em vez do modelo quando confiável"
+    )
+    parser.add_argument(
+        "--base-dpi",
+        type=int,
+        default=config.adaptive_base_dpi if config.adaptive_dpi else None,
+        help="DPI adaptativo: renderiza as páginas neste DPI e usa --dpi só nas páginas difíceis"
+    )
+
+
+def add_scan_arguments(parser: argparse.ArgumentParser) -> None:
+    """Opções de varredura da pasta comuns aos subcomandos."""
+    parser.add_argument(
+        "--recursive",
+        action="store_true",
+        default=config.scan_recursive,
+        help="Inclui os PDFs das subpastas (a estrutura é reproduzida na saída)"
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="GLOB",
+        help="Padrão dos arquivos aceitos, relativo à pasta ou ao nome (repetível; padrão: *.pdf)"
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="GLOB",
+        help="Padrão de arquivos ou subpastas ignorados (repetível)"
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Monta o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(description="olmOCR: conversão de PDFs em markdown sem interface.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    run_parser = subparsers.add_parser("run", help="Processa todos os PDFs de uma pasta")
+    run_parser.add_argument("folder", help="Pasta com os arquivos PDF")
+    run_parser.add_argument("--output", help="Pasta de saída (padrão: <pasta>/Markdown_Outputs_<data>)")
+    add_processing_arguments(run_parser)
+    add_scan_arguments(run_parser)
+    run_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=config.scan_incremental,
+        help="Processa só os PDFs novos ou alterados desde a última conversão"
+    )
+    run_parser.add_argument("--resume", action="store_true", help="Retoma o último lote inacabado")
+    run_parser.set_defaults(func=run)
+    
+    watch_parser = subparsers.add_parser("watch", help="Converte continuamente os PDFs que chegam a uma pasta")
+    watch_parser.add_argument("folder", help="Pasta observada")
+    watch_parser.add_argument("--output", help="Pasta de saída (padrão: <pasta>/Markdown_Outputs_watch)")
+    add_processing_arguments(watch_parser)
+    add_scan_arguments(watch_parser)
+    watch_parser.add_argument(
+        "--files",
+        type=int,
+        default=config.watch_concurrent_files,
+        help="Arquivos processados ao mesmo tempo (cada um com até --concurrency páginas)"
+    )
+    watch_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=config.watch_poll_interval,
+        help="Segundos entre varreduras da pasta quando o watchdog não está instalado"
+    )
+    watch_parser.add_argument(
+        "--settle",
+        type=float,
+        default=config.watch_settle_seconds,
+        help="Segundos sem mudanças antes de considerar um arquivo completo"
+    )
+    watch_parser.set_defaults(func=watch)
+    
+    export_parser = subparsers.add_parser(
+        "batch-export",
+        help="Exporta as páginas para inferência em lote offline (JSONL no formato batch da OpenAI)"
+    )
+    export_parser.add_argument("folder", help="Pasta com os arquivos PDF")
+    export_parser.add_argument("--bundle", help="Pasta do pacote (padrão: <pasta>/Markdown_Outputs_batch)")
+    add_processing_arguments(export_parser)
+    add_scan_arguments(export_parser)
+    export_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=config.scan_incremental,
+        help="Exporta só os PDFs novos ou alterados desde a última conversão"
+    )
+    export_parser.set_defaults(func=batch_export)
+    
+    import_parser = subparsers.add_parser("batch-import", help="Grava o markdown a partir dos resultados do lote")
+    import_parser.add_argument("bundle", help="Pasta do pacote criado pelo batch-export")
+    import_parser.add_argument("results", nargs="+", help="Arquivos JSONL de resultado")
+    import_parser.add_argument("--output", help="Pasta de saída (padrão: a pasta do pacote)")
+    add_processing_arguments(import_parser)
+    import_parser.set_defaults(func=batch_import)
+    
+    serve_parser = subparsers.add_parser("serve", help="API HTTP para submeter jobs e acompanhar os resultados")
+    serve_parser.add_argument("--host", default=config.service_host, help="Interface de escuta")
+    serve_parser.add_argument("--port", type=int, default=config.service_port)
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        default=config.service_workers,
+        help="Arquivos convertidos ao mesmo tempo (cada um com até --concurrency páginas)"
+    )
+    serve_parser.add_argument(
+        "--data-dir",
+        default=config.service_data_dir,
+        help="Pasta do banco de jobs, dos uploads e das saídas"
+    )
+    serve_parser.add_argument("--token", default=config.service_token, help="Exige Authorization: Bearer <token>")
+    serve_parser.add_argument(
+        "--allowed-root",
+        action="append",
+        help="Pasta do servidor aceita em jobs por caminho (repetível; sem ela, só uploads)"
+    )
+    add_processing_arguments(serve_parser)
+    serve_parser.set_defaults(func=serve)
+    
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Ponto de entrada da linha de comando."""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
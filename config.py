@@ -12,7 +12,50 @@ class AppConfig:
     model_name: str = "olmocr-2-7b-1025"
     default_api_url: str = "http://localhost:1234/v1"
     api_key: str = "lm-studio"
-    api_timeout: float = 600.0
+    api_timeout: float = 600.0              # Tempo total máximo por página
+    api_connect_timeout: float = 10.0
+    api_first_token_timeout: float = 180.0  # Também o silêncio máximo entre tokens
+    
+    # Novas tentativas em falhas transitórias (backoff exponencial com jitter)
+    api_max_retries: int = 3
+    retry_backoff_base: float = 2.0
+    retry_backoff_max: float = 30.0
+    
+    # Proteção contra saídas degeneradas: loops de repetição, texto longo demais para
+    # a página ou geração travada abortam a requisição (liberando o servidor)
+    guard_enabled: bool = True
+    guard_repeat_window: int = 1000         # Caracteres finais analisados em busca de loops
+    guard_min_repeats: int = 4              # Cópias seguidas de um trecho que caracterizam um loop
+    guard_max_chars: int = 40000            # Limite absoluto do texto de uma página
+    guard_chars_per_ink: float = 500000.0   # Limite proporcional à tinta da página
+    guard_min_chars: int = 6000             # Limite mínimo (páginas com pouca tinta)
+    guard_min_tokens_per_second: float = 2.0
+    guard_stall_window: float = 30.0        # Segundos avaliados na taxa de tokens
+    guard_max_retries: int = 1              # Novas tentativas com temperatura e max_tokens ajustados
+    guard_retry_temperature: float = 0.4
+    guard_on_failure: str = "fail"          # "fail" grava a página como falha e segue; "truncate" mantém o texto até o problema
+    
+    # Concorrência (páginas enviadas simultaneamente ao servidor de OCR)
+    max_concurrent_requests: int = 8
+    
+    # Atualizações do texto em streaming repassadas aos callbacks (por segundo)
+    stream_updates_per_second: float = 4.0
+    
+    # Pipeline: páginas renderizadas/codificadas enquanto o servidor processa as anteriores
+    encode_workers: int = 2
+    pipeline_prefetch_pages: int = 4   # Páginas à frente do OCR (limita a memória)
+    
+    # Vários servidores: "default_api_url" (ou o campo da barra lateral) aceita URLs
+    # separadas por vírgula, com peso opcional: "http://gpu1:8000/v1*2, http://gpu2:8000/v1"
+    endpoint_eject_after_failures: int = 3   # Falhas seguidas até ejetar um servidor
+    endpoint_eject_seconds: float = 30.0
+    endpoint_health_interval: float = 10.0
+    
+    # Pool de conexões HTTP (compartilhado entre páginas e arquivos)
+    http_max_connections: int = 32
+    http_max_keepalive_connections: int = 16
+    http_keepalive_expiry: float = 120.0
+    ocr_service_cache_size: int = 4   # URLs/chaves com cliente aberto (o menos usado é fechado)
     
     # Poppler Configuration
     poppler_default_path: Optional[str] = None
@@ -23,6 +66,82 @@ class AppConfig:
     max_dpi: int = 300
     image_quality: int = 85
     
+    # DPI adaptativo: renderiza em `adaptive_base_dpi` e só volta ao DPI escolhido nas
+    # páginas difíceis (texto miúdo, resultado curto demais, tabelas ou equações)
+    adaptive_dpi: bool = False
+    adaptive_base_dpi: int = 96
+    adaptive_min_line_height: float = 9.0         # Pixels por linha de texto na imagem enviada
+    adaptive_min_chars_per_ink: float = 10000.0   # Caracteres esperados × fração de tinta
+    adaptive_escalate_tables: bool = True
+    adaptive_min_equations: int = 3
+    
+    # Inferência em lote offline (cli.py batch-export / batch-import)
+    batch_max_requests: int = 50000   # Requisições por arquivo JSONL (limite da API de batch)
+    batch_max_file_mb: int = 190      # Tamanho máximo de cada arquivo JSONL
+    
+    # Pré-processamento antes do envio ao modelo
+    target_longest_edge: int = 1288   # Resolução de entrada do olmOCR (0 = sem limite)
+    image_grayscale: bool = False
+    image_format: str = "JPEG"        # JPEG, PNG, WEBP ou AUTO (escolhe o menor)
+    
+    # Figuras: cada referência de imagem no markdown vira um recorte da região
+    # indicada pelo modelo (ou detectada na página) em vez da página inteira
+    figure_format: str = "WEBP"      # WEBP, JPEG ou PNG
+    figure_quality: int = 85
+    figure_detection: bool = True    # Procura as regiões quando o modelo não informa coordenadas
+    figure_min_area: float = 0.02    # Fração mínima da página para uma região detectada
+    figure_write_workers: int = 2
+    
+    # Histórico de páginas (miniaturas em disco + cache LRU em memória)
+    preview_max_edge: int = 1600
+    preview_quality: int = 80
+    preview_cache_size: int = 16
+    
+    # Camada de texto de PDFs digitais: "off" sempre usa o modelo; "auto" usa o
+    # texto embutido nas páginas em que ele é confiável e há poucas imagens
+    text_layer_policy: str = "off"
+    text_layer_min_chars: int = 100
+    text_layer_min_printable_ratio: float = 0.95
+    text_layer_max_image_coverage: float = 0.3   # Fração da página coberta por imagens
+    
+    # Páginas em branco (não geram texto) e repetidas no lote (reaproveitam o texto)
+    skip_blank_pages: bool = True
+    blank_max_ink_ratio: float = 0.0002        # Fração máxima de pixels escuros
+    skip_duplicate_pages: bool = False
+    duplicate_max_hash_distance: int = 24      # Bits diferentes no dHash (de 256), filtro antes da comparação
+    duplicate_max_ink_mismatch: float = 0.12   # Maior densidade local de tinta sem par, com as páginas alinhadas
+    duplicate_index_size: int = 64             # Máscaras de 800 px de largura (~110 KB cada)
+    
+    # Cache de OCR (resultados reaproveitados entre execuções)
+    cache_enabled: bool = True
+    cache_path: str = str(Path.home() / ".olmocr" / "ocr_cache.sqlite3")
+    cache_max_size_mb: int = 512
+    
+    # Varredura de pastas: subpastas, filtros glob e modo incremental (só PDFs novos
+    # ou alterados desde a última conversão, conforme o índice de arquivos)
+    scan_recursive: bool = False
+    scan_include: tuple[str, ...] = ("*.pdf",)
+    scan_exclude: tuple[str, ...] = ()
+    scan_incremental: bool = False
+    scan_index_path: str = str(Path.home() / ".olmocr" / "file_index.sqlite3")  # Registros por destino (pasta de saída)
+    
+    # Modo watch: ingestão contínua dos PDFs que chegam a uma pasta
+    watch_poll_interval: float = 5.0      # Segundos entre varreduras (sem o pacote watchdog)
+    watch_rescan_interval: float = 300.0  # Varredura completa de segurança com o watchdog
+    watch_settle_seconds: float = 3.0     # Tamanho e data estáveis por esse tempo = cópia concluída
+    watch_concurrent_files: int = 2       # Arquivos processados ao mesmo tempo
+    watch_max_attempts: int = 3           # Tentativas por arquivo antes de marcá-lo como falho
+    
+    # Serviço HTTP de jobs (cli.py serve)
+    service_host: str = "127.0.0.1"
+    service_port: int = 8765
+    service_workers: int = 2                # Arquivos convertidos ao mesmo tempo (todos os jobs)
+    service_data_dir: str = str(Path.home() / ".olmocr" / "service")   # Banco de jobs, uploads e saídas
+    service_token: Optional[str] = None     # Exige "Authorization: Bearer <token>"
+    service_allowed_roots: tuple[str, ...] = ()   # Pastas aceitas em "paths" (vazio = só uploads)
+    service_max_upload_mb: int = 512
+    service_heartbeat_seconds: float = 15.0       # Intervalo dos keep-alives nos streams
+    
     # Output Directories
     output_folder_name: str = "Markdown_Outputs"
     images_folder_name: str = "images"
@@ -1,18 +1,77 @@
 """Processador de documentos PDF para OCR."""
 import re
+import threading
+from concurrent.futures import Future
+from contextlib import nullcontext
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Iterable, Iterator, Optional, Union
 from PIL import Image
-from pdf2image import convert_from_path, pdfinfo_from_path
+from pdf2image import pdfinfo_from_path
 
-from ocr_service import OCRService
+from adaptive_dpi import image_escalation_reason, text_escalation_reason
+from figure_extractor import FigureWriter, extract_figures, save_figure
+from generation_guard import output_limit
+from image_preprocessor import EncodedImage, prepare_image, preprocessing_signature, resolve_image_format
+from markdown_writer import MarkdownWriter
+from metrics import MetricsRecorder, PageMetrics
+from ocr_cache import OCRCache
+from ocr_service import DegenerateOutputError, OCRService
+from page_analysis import DuplicateIndex, is_blank, page_signature
+from page_pipeline import PagePipeline, copy_result, page_callback
+from page_renderer import PageRenderer
+from text_layer import reliable_text_pages
+from text_stream import DocumentTextThrottle
 from config import config
 
 
+# Texto gravado no lugar de uma página cuja geração continuou degenerada (guard_on_failure = "fail")
+FAILED_PAGE_TEXT = "<!-- Página não reconhecida: geração abortada ({reason}) -->"
+
+
+class FailedPageError(Exception):
+    """A página original não foi reconhecida: as cópias não reaproveitam o texto (FAILED_PAGE_TEXT)."""
+    
+    def __init__(self, reason: str):
+        super().__init__(f"Página original não reconhecida ({reason})")
+        self.reason = reason
+
+
+@dataclass
+class PageResult:
+    """Resultado de uma página processada."""
+    
+    pdf_path: Path
+    page_num: int
+    total_pages: int
+    image: Image.Image
+    text: str
+    metrics: PageMetrics
+
+
+@dataclass
+class PreparedPage:
+    """Página codificada à espera do OCR."""
+    
+    cache_key: Optional[str]
+    encoded: EncodedImage
+    pending: Optional[Future]           # Preenchido com o texto (páginas repetidas esperam por ele)
+    max_chars: Optional[int]            # Tamanho máximo esperado do texto (proteção contra loops)
+    ink_ratio: Optional[float] = None
+    rerender: Optional[Callable[[], Image.Image]] = None   # DPI adaptativo: renderiza no DPI completo
+
+
 class DocumentProcessor:
     """Processa documentos PDF usando OCR."""
     
-    def __init__(self, ocr_service: OCRService, dpi: int = None, poppler_path: Optional[str] = None):
+    def __init__(
+        self,
+        ocr_service: OCRService,
+        dpi: int = None,
+        poppler_path: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        cache: Optional[OCRCache] = None
+    ):
         """
         Inicializa o processador de documentos.
         
@@ -20,31 +79,59 @@ class DocumentProcessor:
             ocr_service: Instância do serviço de OCR
             dpi: DPI para conversão de PDF (usa config se não especificado)
             poppler_path: Caminho do Poppler (usa config se não especificado)
+            max_workers: Máximo de páginas em OCR simultâneo (usa config se não especificado)
+            cache: Cache de resultados de OCR (opcional)
+        
+        Raises:
+            ValueError: `config.image_format` inválido
         """
+        # Valida o formato das imagens antes de converter qualquer página
+        resolve_image_format()
         self.ocr_service = ocr_service
         self.dpi = dpi or config.default_dpi
         self.poppler_path = poppler_path or config.poppler_default_path
+        self.max_workers = max(1, max_workers or config.max_concurrent_requests)
+        self.cache = cache
     
-    def convert_pdf_to_images(self, pdf_path: Path) -> list[Image.Image]:
+    def get_renderer(
+        self,
+        pdf_path: Path,
+        page_count: Optional[int] = None,
+        dpi: Optional[int] = None
+    ) -> PageRenderer:
         """
-        Converte um PDF em lista de imagens.
+        Cria um renderizador de páginas para o PDF.
         
         Args:
             pdf_path: Caminho do arquivo PDF
+            page_count: Número de páginas, se já conhecido
+            dpi: DPI da renderização (padrão: o DPI do processador)
             
         Returns:
-            Lista de imagens PIL
+            Renderizador configurado com o DPI e o Poppler do processador
         """
-        return convert_from_path(
-            str(pdf_path),
-            dpi=self.dpi,
-            poppler_path=self.poppler_path
-        )
+        return PageRenderer(pdf_path, dpi or self.dpi, self.poppler_path, page_count)
+    
+    def adaptive_base_dpi(self, enabled: Optional[bool] = None) -> Optional[int]:
+        """
+        DPI da primeira renderização no modo adaptativo.
+        
+        Args:
+            enabled: Liga o modo adaptativo (padrão: config.adaptive_dpi)
+        
+        Returns:
+            DPI base, ou None se o modo está desligado ou não reduz o DPI
+        """
+        enabled = config.adaptive_dpi if enabled is None else enabled
+        if enabled and config.adaptive_base_dpi < self.dpi:
+            return config.adaptive_base_dpi
+        return None
     
     def process_page(
         self,
         page_image: Image.Image,
-        on_chunk: Optional[Callable[[str], None]] = None
+        on_chunk: Optional[Callable[[str], None]] = None,
+        metrics: Optional[PageMetrics] = None
     ) -> str:
         """
         Processa uma única página usando OCR.
@@ -52,21 +139,390 @@ class DocumentProcessor:
         Args:
             page_image: Imagem da página
             on_chunk: Callback chamado para cada chunk de texto recebido
+            metrics: Métricas da página (opcional)
             
         Returns:
             Texto completo extraído da página
         """
-        stream = self.ocr_service.process_image(page_image)
-        page_text = ""
+        metrics = metrics or PageMetrics()
+        prepared = self._prepare_page(page_image, on_chunk, metrics, None)
+        if isinstance(prepared, str):
+            return prepared
+        if isinstance(prepared, Future):
+            return prepared.result()
+        return self._ocr_prepared(prepared, on_chunk, metrics)
+    
+    @staticmethod
+    def new_duplicate_index() -> Optional[DuplicateIndex]:
+        """Índice de páginas repetidas de um lote ou documento (None se a detecção está desativada)."""
+        return DuplicateIndex(config.duplicate_index_size) if config.skip_duplicate_pages else None
+    
+    @staticmethod
+    def _abandon_prepared(prepared: PreparedPage, error: BaseException) -> None:
+        """Página codificada que não chegou ao OCR: libera as páginas repetidas que esperam por ela."""
+        if prepared.pending and not prepared.pending.done():
+            prepared.pending.set_exception(error)
+    
+    def _prepare_page(
+        self,
+        page_image: Image.Image,
+        on_chunk: Optional[Callable[[str], None]],
+        metrics: PageMetrics,
+        known_text: Optional[str],
+        rerender: Optional[Callable[[], Image.Image]] = None,
+        duplicates: Optional[DuplicateIndex] = None
+    ) -> Union[str, Future, PreparedPage]:
+        """
+        Etapa de codificação: descarta páginas que não precisam do modelo e
+        prepara a imagem das demais.
         
-        for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                page_text += content
-                
+        Args:
+            known_text: Texto já disponível sem OCR (ex: camada de texto do PDF)
+            rerender: DPI adaptativo: renderiza a página no DPI completo, se a
+                imagem recebida (em baixa resolução) não bastar
+            duplicates: Páginas já vistas no lote (None = não procura repetidas)
+        
+        Returns:
+            Texto pronto (camada de texto, página em branco ou cache); Future com
+            o texto de uma página equivalente já vista no lote; ou a página
+            codificada à espera do OCR
+        """
+        if known_text is not None:
+            metrics.skipped = "text_layer"
+            if on_chunk:
+                on_chunk(known_text)
+            return known_text
+        
+        metrics.dpi = config.adaptive_base_dpi if rerender is not None else self.dpi
+        signature = None
+        if config.skip_blank_pages or duplicates is not None or rerender is not None:
+            with metrics.stage("analyze"):
+                signature = page_signature(page_image)
+            if config.skip_blank_pages and is_blank(signature):
+                metrics.skipped = "blank"
+                return ""
+        
+        # Página repetida no lote: reaproveita o texto (mesmo que ainda em OCR)
+        pending = None
+        if signature is not None and duplicates is not None:
+            pending = Future()
+            original = duplicates.find_or_add(signature, pending)
+            if original is not None:
+                metrics.skipped = "duplicate"
+                return self._reuse(original, metrics)
+        
+        ink_ratio = signature.ink_ratio if signature is not None else None
+        try:
+            # Texto miúdo demais para a resolução base: vai direto ao DPI completo
+            if rerender is not None:
+                with metrics.stage("analyze"):
+                    reason = image_escalation_reason(page_image)
+                if reason:
+                    page_image, rerender = self._escalate(rerender, metrics, reason), None
+            
+            prepared = self._lookup_and_encode(page_image, on_chunk, metrics)
+            
+            # Resultado do cache obtido na resolução base que pede o DPI completo
+            if isinstance(prepared, str) and rerender is not None:
+                reason = text_escalation_reason(prepared, ink_ratio)
+                if reason:
+                    prepared = self._lookup_and_encode(self._escalate(rerender, metrics, reason), on_chunk, metrics)
+                    rerender = None
+        except BaseException as e:
+            if pending:
+                pending.set_exception(e)
+            raise
+        
+        if isinstance(prepared, str):
+            if pending:
+                pending.set_result(prepared)
+            return prepared
+        
+        cache_key, encoded = prepared
+        return PreparedPage(
+            cache_key,
+            encoded,
+            pending,
+            # Limite do texto proporcional à tinta da página (proteção contra loops)
+            max_chars=output_limit(ink_ratio),
+            ink_ratio=ink_ratio,
+            rerender=rerender
+        )
+    
+    @staticmethod
+    def _reuse(original: Future, metrics: PageMetrics) -> Future:
+        """
+        Resultado de uma página repetida a partir do Future da original.
+        
+        Se a original não foi reconhecida, a cópia que já esperava por ela
+        também fica marcada em `metrics.failed` (as que chegam depois vão ao
+        OCR, pois o índice ignora originais com falha).
+        """
+        result = Future()
+        
+        def done(source: Future) -> None:
+            error = source.exception()
+            if isinstance(error, FailedPageError):
+                metrics.failed = error.reason
+                result.set_result(FAILED_PAGE_TEXT.format(reason=error.reason))
+            else:
+                copy_result(source, result)
+        
+        original.add_done_callback(done)
+        return result
+    
+    def _escalate(
+        self,
+        rerender: Callable[[], Image.Image],
+        metrics: PageMetrics,
+        reason: str
+    ) -> Image.Image:
+        """Renderiza a página de novo no DPI completo e registra o motivo nas métricas."""
+        with metrics.stage("render"):
+            page_image = rerender()
+        metrics.escalated = reason
+        metrics.dpi = self.dpi
+        return page_image
+    
+    def _lookup_and_encode(
+        self,
+        page_image: Image.Image,
+        on_chunk: Optional[Callable[[str], None]],
+        metrics: PageMetrics
+    ) -> Union[str, tuple[Optional[str], EncodedImage]]:
+        """Consulta o cache e, se não houver resultado, codifica a imagem para o modelo."""
+        cache_key = None
+        if self.cache is not None:
+            cache_key = OCRCache.make_key(
+                page_image,
+                config.model_name,
+                config.ocr_prompt,
+                preprocessing_signature(),
+                metrics.dpi or self.dpi
+            )
+            cached_text = self.cache.get(cache_key)
+            if cached_text is not None:
+                metrics.cache_hit = True
                 if on_chunk:
-                    on_chunk(page_text)
+                    on_chunk(cached_text)
+                return cached_text
         
+        with metrics.stage("encode"):
+            encoded = prepare_image(page_image)
+        metrics.image_bytes += len(encoded.data)
+        return cache_key, encoded
+    
+    def _ocr_prepared(
+        self,
+        prepared: PreparedPage,
+        on_chunk: Optional[Callable[[str], None]],
+        metrics: PageMetrics,
+        cancel: Optional[threading.Event] = None
+    ) -> str:
+        """Etapa de OCR: envia a imagem codificada e guarda o resultado no cache."""
+        try:
+            page_text = self._ocr_and_cache(
+                prepared.cache_key, prepared.encoded, on_chunk, metrics, prepared.max_chars, cancel
+            )
+            
+            # DPI adaptativo: resultado fraco na resolução base refaz a página no DPI completo
+            if prepared.rerender is not None:
+                reason = text_escalation_reason(page_text, prepared.ink_ratio)
+                if reason:
+                    page_image = self._escalate(prepared.rerender, metrics, reason)
+                    retry = self._lookup_and_encode(page_image, on_chunk, metrics)
+                    if isinstance(retry, str):
+                        page_text = retry
+                    else:
+                        page_text = self._ocr_and_cache(*retry, on_chunk, metrics, prepared.max_chars, cancel)
+        except BaseException as e:
+            if prepared.pending:
+                prepared.pending.set_exception(e)
+            raise
+        
+        if prepared.pending:
+            if metrics.failed:
+                prepared.pending.set_exception(FailedPageError(metrics.failed))
+            else:
+                prepared.pending.set_result(page_text)
+        return page_text
+    
+    def _ocr_and_cache(
+        self,
+        cache_key: Optional[str],
+        encoded: EncodedImage,
+        on_chunk: Optional[Callable[[str], None]],
+        metrics: PageMetrics,
+        max_chars: Optional[int],
+        cancel: Optional[threading.Event] = None
+    ) -> str:
+        """
+        Envia a imagem ao modelo e guarda o texto no cache.
+        
+        Uma geração que continua degenerada após as novas tentativas não
+        interrompe o documento: a página recebe FAILED_PAGE_TEXT e fica
+        marcada em `metrics.failed`.
+        """
+        metrics.failed = None
+        # OCR com novas tentativas em falhas transitórias (o texto recomeça a cada tentativa)
+        try:
+            with metrics.stage("ocr"):
+                result = self.ocr_service.ocr_encoded(
+                    encoded, on_chunk, metrics=metrics, max_chars=max_chars, cancel=cancel
+                )
+        except DegenerateOutputError as e:
+            metrics.failed = e.reason
+            text = FAILED_PAGE_TEXT.format(reason=e.reason)
+            if on_chunk:
+                on_chunk(text)
+            return text
+        
+        # Textos truncados pela proteção contra loops não vão para o cache
+        if cache_key is not None and result.degenerate is None:
+            self.cache.put(cache_key, result.text)
+        return result.text
+    
+    def ocr_pages(
+        self,
+        pages: Iterable[tuple[int, Image.Image]],
+        on_chunk: Optional[Callable[[int, str], None]] = None,
+        file_label: str = "",
+        known_texts: Optional[dict[int, str]] = None,
+        rerender: Optional[Callable[[int], Image.Image]] = None,
+        duplicates: Optional[DuplicateIndex] = None
+    ) -> Iterator[tuple[int, Image.Image, str, PageMetrics]]:
+        """
+        Executa o OCR de várias páginas em paralelo, preservando a ordem.
+        
+        Renderização, codificação e OCR rodam como etapas sobrepostas (ver
+        PagePipeline): enquanto o servidor processa até `max_workers` páginas,
+        as próximas já são renderizadas e codificadas. A quantidade de imagens
+        em memória fica limitada a `max_workers + pipeline_prefetch_pages`.
+        
+        Args:
+            pages: Iterável de tuplas (page_num, imagem), consumido em outra thread
+            on_chunk: Callback de chunks (page_num, texto acumulado da página), chamado
+                das threads de trabalho; as páginas em voo chegam intercaladas
+            file_label: Nome do arquivo registrado nas métricas
+            known_texts: Textos de páginas que dispensam o OCR (página → texto)
+            rerender: DPI adaptativo: renderiza uma página no DPI completo (page_num → imagem);
+                as páginas recebidas estão em `adaptive_base_dpi`
+            duplicates: Páginas já vistas no lote, compartilhadas entre os documentos
+                de um job (padrão: um índice só para estas páginas, se a detecção
+                de repetidas estiver ligada)
+            
+        Returns:
+            Iterator de tuplas (page_num, imagem, texto, métricas) na ordem de entrada
+        """
+        known_texts = known_texts or {}
+        if duplicates is None:
+            duplicates = self.new_duplicate_index()
+        
+        def page_rerender(page_num: int) -> Optional[Callable[[], Image.Image]]:
+            return (lambda: rerender(page_num)) if rerender is not None else None
+        
+        # Encerrar o pipeline antes do fim (erro ou consumidor que parou) fecha os streams em andamento
+        cancel = threading.Event()
+        
+        pipeline = PagePipeline(
+            encode=lambda image, metrics: self._prepare_page(
+                image,
+                page_callback(on_chunk, metrics.page),
+                metrics,
+                known_texts.get(metrics.page),
+                page_rerender(metrics.page),
+                duplicates
+            ),
+            ocr=lambda prepared, on_chunk, metrics: self._ocr_prepared(prepared, on_chunk, metrics, cancel),
+            abandon=self._abandon_prepared,
+            ocr_workers=self.max_workers,
+            encode_workers=config.encode_workers,
+            prefetch=config.pipeline_prefetch_pages,
+            cancel=cancel
+        )
+        return pipeline.run(pages, on_chunk, file_label)
+    
+    def iter_prepared(
+        self,
+        pdf_path: Path,
+        page_count: Optional[int] = None
+    ) -> Iterator[tuple[int, Union[str, int, PreparedPage], PageMetrics]]:
+        """
+        Renderiza e codifica as páginas de um PDF sem chamar o modelo (exportação para inferência em lote).
+        
+        As mesmas etapas de `iter_results` descartam o que não precisa do
+        modelo (camada de texto, páginas em branco, cache e páginas repetidas).
+        O DPI adaptativo não se aplica: as páginas são renderizadas no DPI do
+        processador, já que não há resultado para decidir quais refazer.
+        
+        Args:
+            pdf_path: Caminho do PDF
+            page_count: Número de páginas do PDF, se já conhecido
+            
+        Returns:
+            Iterator de tuplas (page_num, item, métricas), em ordem, em que o item é
+            o texto já conhecido, o número da página equivalente já vista no documento
+            ou a página codificada à espera do OCR
+        """
+        renderer = self.get_renderer(pdf_path, page_count)
+        known_texts = self.text_layer_pages(renderer, 1, renderer.page_count)
+        duplicates = self.new_duplicate_index()
+        
+        def deferred(prepared: PreparedPage, on_chunk, metrics: PageMetrics) -> PreparedPage:
+            # As páginas repetidas apontam para esta, cujo texto virá do lote
+            if prepared.pending:
+                prepared.pending.set_result(metrics.page)
+            return prepared
+        
+        pipeline = PagePipeline(
+            encode=lambda image, metrics: self._prepare_page(
+                image, None, metrics, known_texts.get(metrics.page), duplicates=duplicates
+            ),
+            ocr=deferred,
+            abandon=self._abandon_prepared,
+            ocr_workers=1,
+            encode_workers=config.encode_workers,
+            prefetch=config.pipeline_prefetch_pages
+        )
+        for page_num, _, item, metrics in pipeline.run(renderer.iter_pages(), file_label=pdf_path.name):
+            yield page_num, item, metrics
+    
+    def save_page_image(
+        self,
+        pdf_path: Path,
+        page_num: int,
+        page_image: Image.Image,
+        page_text: str,
+        output_images_dir: Path,
+        writer: Optional[FigureWriter] = None
+    ) -> str:
+        """
+        Recorta as figuras referenciadas no texto e corrige os links.
+        
+        Cada referência aponta para o seu próprio recorte (ver `extract_figures`);
+        a página inteira só é gravada para referências sem região conhecida.
+        
+        Args:
+            pdf_path: Caminho do PDF
+            page_num: Número da página (1-based)
+            page_image: Imagem da página
+            page_text: Texto extraído
+            output_images_dir: Diretório para salvar imagens
+            writer: Grava as figuras em segundo plano (None = grava antes de retornar)
+            
+        Returns:
+            Texto com referências de imagem atualizadas
+        """
+        if "![" not in page_text:
+            return page_text
+        
+        base_name = f"{self.sanitize_filename(pdf_path.stem)}_p{page_num}"
+        page_text, figures = extract_figures(page_image, page_text, base_name, config.images_folder_name)
+        for filename, box in figures:
+            if writer is not None:
+                writer.submit(page_image, box, filename)
+            else:
+                save_figure(page_image, box, output_images_dir / filename)
         return page_text
     
     @staticmethod
@@ -74,6 +530,9 @@ class DocumentProcessor:
         """
         Substitui referências de imagens no markdown com caminhos locais.
         
+        Mantido por compatibilidade: aponta todas as referências para a mesma
+        imagem; `save_page_image` recorta cada figura separadamente.
+        
         Args:
             markdown_text: Texto markdown original
             image_filename: Nome do arquivo de imagem
@@ -97,66 +556,266 @@ class DocumentProcessor:
         s = re.sub(r'[^\w\-\.]', '', s)
         return s
 
-    def process_document(
+    def text_layer_pages(self, renderer: PageRenderer, first_page: int, last_page: int) -> dict[int, str]:
+        """
+        Páginas do intervalo cujo texto embutido substitui o OCR (conforme `text_layer_policy`).
+        
+        Args:
+            renderer: Renderizador do documento (fornece o caminho e o pdfinfo)
+            first_page: Primeira página (1-based)
+            last_page: Última página (inclusiva)
+            
+        Returns:
+            Dicionário página → texto
+        """
+        if config.text_layer_policy != "auto":
+            return {}
+        return reliable_text_pages(renderer.pdf_path, first_page, last_page, renderer.info, self.poppler_path)
+    
+    def iter_pages(
+        self,
+        pdf_path: Path,
+        first_page: int = 1,
+        last_page: Optional[int] = None
+    ) -> Iterator[tuple[int, Image.Image]]:
+        """
+        Renderiza as páginas de um PDF sob demanda (um único pdftoppm em fluxo).
+        
+        Só a página corrente fica em memória; parar a iteração encerra o pdftoppm.
+        
+        Args:
+            pdf_path: Caminho do PDF
+            first_page: Primeira página (1-based)
+            last_page: Última página (inclusiva; padrão: a última do PDF)
+            
+        Returns:
+            Iterator de tuplas (page_num, imagem)
+        """
+        return self.get_renderer(pdf_path).iter_pages(first_page, last_page)
+    
+    def convert_pdf_to_images(self, pdf_path: Path) -> list[Image.Image]:
+        """
+        Converte um PDF em lista de imagens.
+        
+        Mantido por compatibilidade: todas as páginas ficam em memória ao mesmo
+        tempo; prefira `iter_pages`.
+        
+        Args:
+            pdf_path: Caminho do arquivo PDF
+            
+        Returns:
+            Lista de imagens PIL
+        """
+        return [page_image for _, page_image in self.iter_pages(pdf_path)]
+    
+    def iter_results(
+        self,
+        pdf_path: Path,
+        output_images_dir: Optional[Path] = None,
+        first_page: int = 1,
+        last_page: Optional[int] = None,
+        on_chunk: Optional[Callable[[int, str], None]] = None,
+        on_page_start: Optional[Callable[[int, int, Image.Image], None]] = None,
+        page_count: Optional[int] = None,
+        adaptive_dpi: Optional[bool] = None,
+        duplicates: Optional[DuplicateIndex] = None
+    ) -> Iterator[PageResult]:
+        """
+        Processa um PDF e entrega cada página assim que fica pronta, em ordem.
+        
+        Nada é acumulado: a memória fica limitada às páginas em voo no pipeline
+        e a latência da primeira página não depende do tamanho do documento.
+        Com `text_layer_policy = "auto"`, páginas com texto embutido confiável
+        usam esse texto em vez do modelo. Com `adaptive_dpi`, as páginas são
+        renderizadas em `adaptive_base_dpi` e só as difíceis voltam ao DPI do
+        processador (ver adaptive_dpi.py); a imagem entregue é a usada no OCR.
+        
+        Args:
+            pdf_path: Caminho do PDF
+            output_images_dir: Diretório para salvar as imagens das páginas (None = não salva)
+            first_page: Primeira página (1-based)
+            last_page: Última página (inclusiva; padrão: a última do PDF)
+            on_chunk: Callback ao receber chunk de texto (page_num, texto acumulado da
+                página), no máximo `stream_updates_per_second` vezes por segundo no
+                documento e sempre para a página mais antiga em andamento (ver
+                DocumentTextThrottle); chamado das threads de OCR, uma de cada vez
+            on_page_start: Callback ao renderizar página (page_num, total_pages, image),
+                chamado da thread de renderização
+            page_count: Número de páginas do PDF, se já conhecido (evita chamar o pdfinfo)
+            adaptive_dpi: Liga o DPI adaptativo neste documento (padrão: config.adaptive_dpi)
+            duplicates: Páginas repetidas já vistas no job (ver `ocr_pages`)
+            
+        Returns:
+            Iterator de PageResult
+        """
+        base_dpi = self.adaptive_base_dpi(adaptive_dpi)
+        renderer = self.get_renderer(pdf_path, page_count, base_dpi)
+        total_pages = renderer.page_count
+        rendered = renderer.iter_pages(first_page, last_page)
+        known_texts = self.text_layer_pages(renderer, first_page, last_page or total_pages)
+        
+        # DPI adaptativo: páginas refeitas no DPI completo, até serem entregues
+        escalated: dict[int, Image.Image] = {}
+        rerender = None
+        if base_dpi is not None:
+            full_renderer = self.get_renderer(pdf_path, total_pages)
+            
+            def rerender(page_num: int) -> Image.Image:
+                escalated[page_num] = full_renderer.render_page(page_num)
+                return escalated[page_num]
+        
+        def announced_pages():
+            for page_num, page_image in rendered:
+                # Notifica início da página com a imagem para exibição imediata
+                on_page_start(page_num, total_pages, page_image)
+                yield page_num, page_image
+        
+        pages = announced_pages() if on_page_start else rendered
+        
+        # As páginas em voo dividem a mesma taxa de atualizações
+        throttle = None
+        if on_chunk is not None:
+            throttle = DocumentTextThrottle(on_chunk, config.stream_updates_per_second)
+        
+        results = self.ocr_pages(
+            pages,
+            throttle.update if throttle else None,
+            file_label=pdf_path.name,
+            known_texts=known_texts,
+            rerender=rerender,
+            duplicates=duplicates
+        )
+        # As figuras são gravadas em segundo plano; a saída do bloco espera as pendentes
+        with FigureWriter(output_images_dir) if output_images_dir is not None else nullcontext() as writer:
+            for page_num, page_image, page_text, metrics in results:
+                if throttle:
+                    throttle.finish(page_num)
+                
+                # As coordenadas das figuras se referem à imagem que o modelo viu
+                page_image = escalated.pop(page_num, page_image)
+                if writer is not None:
+                    # Recorta as figuras e atualiza referências, se houver
+                    with metrics.stage("save"):
+                        page_text = self.save_page_image(
+                            pdf_path, page_num, page_image, page_text, output_images_dir, writer
+                        )
+                
+                yield PageResult(
+                    pdf_path=pdf_path,
+                    page_num=page_num,
+                    total_pages=total_pages,
+                    image=page_image,
+                    text=page_text,
+                    metrics=metrics
+                )
+    
+    def convert_document(
         self,
         pdf_path: Path,
         output_md_path: Path,
         output_images_dir: Path,
         on_page_start: Optional[Callable[[int, int, Image.Image], None]] = None,
-        on_chunk: Optional[Callable[[str], None]] = None,
-        on_page_complete: Optional[Callable[[int, Image.Image, str], None]] = None
-    ) -> str:
+        on_chunk: Optional[Callable[[int, str], None]] = None,
+        on_page_complete: Optional[Callable[[int, Image.Image, str], None]] = None,
+        first_page: int = 1,
+        resume_offset: Optional[int] = None,
+        on_page_saved: Optional[Callable[[int, int, Optional[str]], None]] = None,
+        metrics_recorder: Optional[MetricsRecorder] = None,
+        duplicates: Optional[DuplicateIndex] = None
+    ) -> Path:
         """
-        Processa um documento PDF completo.
+        Converte um documento PDF completo, gravando o markdown página a página.
+        
+        Nenhum texto fica acumulado em memória: cada página vai para o disco
+        assim que fica pronta, e o markdown é publicado no fim.
         
         Args:
             pdf_path: Caminho do PDF
             output_md_path: Caminho para salvar o markdown
             output_images_dir: Diretório para salvar imagens
-            on_page_start: Callback ao iniciar página (page_num, total_pages, image)
-            on_chunk: Callback ao receber chunk de texto
+            on_page_start: Callback ao renderizar página (page_num, total_pages, image), chamado da thread de renderização
+            on_chunk: Callback ao receber chunk de texto (page_num, texto acumulado da
+                página), limitado como em `iter_results`
             on_page_complete: Callback ao completar página (page_num, image, text)
+            first_page: Página inicial; acima de 1 continua um markdown parcial existente
+            resume_offset: Tamanho do markdown parcial no último checkpoint (ao retomar)
+            on_page_saved: Callback após gravar a página no disco (page_num, md_offset,
+                motivo da falha da página ou None)
+            metrics_recorder: Onde gravar as métricas de cada página (opcional)
+            duplicates: Páginas repetidas já vistas no job, para reaproveitar o texto
+                entre documentos (padrão: só dentro deste documento)
             
         Returns:
-            Markdown completo do documento
+            Caminho do markdown publicado
         """
-        pages = self.convert_pdf_to_images(pdf_path)
-        full_markdown = ""
-        
-        for page_idx, page_image in enumerate(pages, start=1):
-            # Notifica início da página com a imagem para exibição imediata
-            if on_page_start:
-                on_page_start(page_idx, len(pages), page_image)
-            
-            # Processa OCR da página
-            page_text = self.process_page(page_image, on_chunk)
-            
-            # Salva imagem se houver referências
-            if "![" in page_text:
-                safe_stem = self.sanitize_filename(pdf_path.stem)
-                image_filename = f"{safe_stem}_p{page_idx}.png"
-                image_path = output_images_dir / image_filename
-                page_image.save(str(image_path))
+        with MarkdownWriter(output_md_path, resume=first_page > 1, resume_offset=resume_offset) as writer:
+            results = self.iter_results(
+                pdf_path,
+                output_images_dir,
+                first_page=first_page,
+                on_chunk=on_chunk,
+                on_page_start=on_page_start,
+                duplicates=duplicates
+            )
+            for result in results:
+                # Notifica conclusão da página com o texto final
+                if on_page_complete:
+                    on_page_complete(result.page_num, result.image, result.text)
                 
-                # Atualiza referências
-                page_text = self.fix_image_references(
-                    page_text,
-                    image_filename,
-                    config.images_folder_name
-                )
-            
-            # Notifica conclusão da página com o texto final
-            if on_page_complete:
-                on_page_complete(page_idx, page_image, page_text)
+                # Grava a página no markdown assim que fica pronta
+                with result.metrics.stage("write"):
+                    writer.write_page(result.page_num, result.text)
+                
+                if metrics_recorder:
+                    metrics_recorder.record(result.metrics)
+                
+                if on_page_saved:
+                    on_page_saved(result.page_num, writer.tell(), result.metrics.failed)
             
-            # Adiciona ao markdown completo
-            full_markdown += f"## Página {page_idx}\n\n{page_text}\n\n---\n\n"
+            # Publica o arquivo markdown completo
+            writer.finalize()
         
-        # Salva arquivo markdown
-        output_md_path.write_text(full_markdown, encoding="utf-8")
+        return Path(output_md_path)
+    
+    def process_document(
+        self,
+        pdf_path: Path,
+        output_md_path: Path,
+        output_images_dir: Path,
+        on_page_start: Optional[Callable[[int, int, Image.Image], None]] = None,
+        on_chunk: Optional[Callable[[int, str], None]] = None,
+        on_page_complete: Optional[Callable[[int, Image.Image, str], None]] = None,
+        first_page: int = 1,
+        resume_offset: Optional[int] = None,
+        on_page_saved: Optional[Callable[[int, int, Optional[str]], None]] = None,
+        metrics_recorder: Optional[MetricsRecorder] = None,
+        duplicates: Optional[DuplicateIndex] = None
+    ) -> str:
+        """
+        Processa um documento PDF completo e retorna o markdown gerado.
         
-        return full_markdown
-
+        Mesmos argumentos de `convert_document`, que grava o markdown sem
+        mantê-lo em memória e retorna o caminho do arquivo; este método lê o
+        arquivo publicado de volta.
+        
+        Returns:
+            Conteúdo markdown completo do documento
+        """
+        output_path = self.convert_document(
+            pdf_path,
+            output_md_path,
+            output_images_dir,
+            on_page_start=on_page_start,
+            on_chunk=on_chunk,
+            on_page_complete=on_page_complete,
+            first_page=first_page,
+            resume_offset=resume_offset,
+            on_page_saved=on_page_saved,
+            metrics_recorder=metrics_recorder,
+            duplicates=duplicates
+        )
+        return output_path.read_text(encoding="utf-8")
+    
     def get_pdf_page_count(self, pdf_path: Path) -> int:
         """Retorna o número total de páginas do PDF."""
         try:
@@ -164,7 +823,7 @@ class DocumentProcessor:
             return info["Pages"]
         except Exception:
             return 0
-
+    
     def process_single_page(
         self,
         pdf_path: Path,
@@ -174,6 +833,9 @@ class DocumentProcessor:
         """
         Processa uma única página de um PDF.
         
+        Mantido por compatibilidade: para várias páginas, `iter_results`
+        sobrepõe renderização e OCR e processa as páginas em paralelo.
+        
         Args:
             pdf_path: Caminho do PDF
             page_num: Número da página (1-based)
@@ -182,34 +844,7 @@ class DocumentProcessor:
         Returns:
             Tupla (imagem, texto)
         """
-        # Converte APENAS a página solicitada
-        images = convert_from_path(
-            str(pdf_path),
-            dpi=self.dpi,
-            poppler_path=self.poppler_path,
-            first_page=page_num,
-            last_page=page_num
-        )
-        
-        if not images:
-            raise ValueError(f"Não foi possível converter a página {page_num}")
-            
-        page_image = images[0]
-        
-        # Processa OCR
+        page_image = self.get_renderer(pdf_path).render_page(page_num)
         page_text = self.process_page(page_image)
-        
-        # Salva imagem e corrige referências se necessário
-        if "![" in page_text:
-            safe_stem = self.sanitize_filename(pdf_path.stem)
-            image_filename = f"{safe_stem}_p{page_num}.png"
-            image_path = output_images_dir / image_filename
-            page_image.save(str(image_path))
-            
-            page_text = self.fix_image_references(
-                page_text,
-                image_filename,
-                config.images_folder_name
-            )
-            
+        page_text = self.save_page_image(pdf_path, page_num, page_image, page_text, output_images_dir)
         return page_image, page_text
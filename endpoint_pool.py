@@ -0,0 +1,232 @@
+"""Balanceamento de carga entre vários servidores de OCR compatíveis com a API OpenAI."""
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+import httpx
+from openai import DefaultHttpxClient, OpenAI
+
+from config import config
+
+
+@dataclass
+class Endpoint:
+    """Um servidor de OCR do pool, com seu cliente e métricas."""
+    
+    url: str
+    weight: float
+    client: OpenAI
+    in_flight: int = 0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    total_latency: float = 0.0
+    healthy: bool = True
+    ejected_at: float = 0.0
+    last_error: Optional[str] = field(default=None)
+    
+    def load(self) -> tuple[float, float]:
+        """Carga relativa ao peso: requisições em andamento (desempate pelo total já enviado)."""
+        return self.in_flight / self.weight, self.requests / self.weight
+
+
+class EndpointPool:
+    """
+    Distribui requisições entre endpoints pelo critério de menos requisições
+    em andamento (ponderado pelo peso de cada servidor).
+    
+    Um endpoint com `endpoint_eject_after_failures` falhas seguidas é ejetado;
+    após `endpoint_eject_seconds`, uma thread de health check passa a consultar
+    `/models` dele e o devolve ao pool assim que responder.
+    """
+    
+    def __init__(self, endpoints: list[tuple[str, float]], api_key: str):
+        """
+        Cria os clientes de cada endpoint.
+        
+        Args:
+            endpoints: Lista de tuplas (url, peso)
+            api_key: Chave da API (a mesma para todos os endpoints)
+        """
+        if not endpoints:
+            raise ValueError("Nenhuma URL de API informada")
+        for url, weight in endpoints:
+            # Peso zero ou negativo quebraria o cálculo de carga (divisão pelo peso)
+            if not (math.isfinite(weight) and weight > 0):
+                raise ValueError(f"Peso inválido para {url}: {weight} (deve ser maior que zero)")
+        
+        self._lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self.endpoints = [
+            Endpoint(url=url, weight=weight, client=self._create_client(url, api_key))
+            for url, weight in endpoints
+        ]
+    
+    @staticmethod
+    def parse_urls(spec: str) -> list[tuple[str, float]]:
+        """
+        Interpreta uma lista de URLs separadas por vírgula, com peso opcional.
+        
+        Ex: "http://gpu1:8000/v1*2, http://gpu2:8000/v1" → gpu1 recebe o dobro de páginas.
+        
+        Args:
+            spec: Texto com as URLs
+        
+        Returns:
+            Lista de tuplas (url, peso)
+        
+        Raises:
+            ValueError: URL vazia ou peso que não é um número positivo
+        """
+        endpoints = []
+        for item in spec.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            url, _, weight = item.partition("*")
+            url, weight = url.strip(), weight.strip()
+            if not url:
+                raise ValueError(f"URL de API vazia em '{item}'")
+            try:
+                value = float(weight) if weight else 1.0
+            except ValueError:
+                value = math.nan
+            if not (math.isfinite(value) and value > 0):
+                raise ValueError(f"Peso inválido em '{item}': use um número maior que zero (ex: {url}*2)")
+            endpoints.append((url, value))
+        return endpoints
+    
+    @staticmethod
+    def _create_client(url: str, api_key: str) -> OpenAI:
+        """Cria o cliente OpenAI (com pool de conexões próprio) de um endpoint."""
+        http_client = DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=config.http_max_connections,
+                max_keepalive_connections=config.http_max_keepalive_connections,
+                keepalive_expiry=config.http_keepalive_expiry
+            )
+        )
+        # Timeouts separados: conexão, primeiro token (e silêncio entre tokens) e total
+        # As novas tentativas ficam a cargo do OCRService (o SDK não repete sozinho)
+        return OpenAI(
+            base_url=url,
+            api_key=api_key,
+            timeout=httpx.Timeout(
+                config.api_timeout,
+                connect=config.api_connect_timeout,
+                read=config.api_first_token_timeout
+            ),
+            max_retries=0,
+            http_client=http_client
+        )
+    
+    def _choose(self, exclude: Optional[Endpoint] = None) -> Endpoint:
+        """Escolhe o endpoint disponível menos carregado (chamar com o lock)."""
+        available = [e for e in self.endpoints if e.healthy]
+        if exclude is not None and len(available) > 1:
+            available = [e for e in available if e is not exclude]
+        
+        if not available:
+            # Todos ejetados: tenta o mais antigo em vez de falhar de imediato
+            return min(self.endpoints, key=lambda e: e.ejected_at)
+        return min(available, key=Endpoint.load)
+    
+    def select(self) -> Endpoint:
+        """Escolhe um endpoint sem registrar a requisição (ex: streams brutos)."""
+        with self._lock:
+            return self._choose()
+    
+    def acquire(self, exclude: Optional[Endpoint] = None) -> Endpoint:
+        """
+        Reserva o endpoint que deve atender a próxima requisição.
+        
+        Args:
+            exclude: Endpoint a evitar se houver alternativa (ex: o que acabou de falhar)
+        
+        Returns:
+            Endpoint escolhido (liberar com `release`)
+        """
+        with self._lock:
+            endpoint = self._choose(exclude)
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return endpoint
+    
+    def release(self, endpoint: Endpoint, success: bool, latency: float, error: Optional[str] = None) -> None:
+        """
+        Libera um endpoint após a requisição, atualizando métricas e saúde.
+        
+        Args:
+            endpoint: Endpoint obtido em `acquire`
+            success: Se a requisição terminou sem falha do servidor
+            latency: Duração da requisição em segundos
+            error: Descrição do erro, em caso de falha
+        """
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.total_latency += latency
+            
+            if success:
+                endpoint.consecutive_failures = 0
+                return
+            
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            endpoint.last_error = error
+            if endpoint.healthy and endpoint.consecutive_failures >= config.endpoint_eject_after_failures:
+                endpoint.healthy = False
+                endpoint.ejected_at = time.monotonic()
+                self._ensure_health_checks()
+    
+    def _ensure_health_checks(self) -> None:
+        """Inicia a thread de health check, se ainda não estiver rodando (chamar com o lock)."""
+        if self._health_thread and self._health_thread.is_alive():
+            return
+        self._health_thread = threading.Thread(target=self._health_loop, name="endpoint-health", daemon=True)
+        self._health_thread.start()
+    
+    def _health_loop(self) -> None:
+        """Consulta periodicamente os endpoints ejetados até todos voltarem."""
+        while not self._closed.wait(config.endpoint_health_interval):
+            with self._lock:
+                ejected = [e for e in self.endpoints if not e.healthy]
+                if not ejected:
+                    self._health_thread = None
+                    return
+            
+            now = time.monotonic()
+            for endpoint in ejected:
+                if now - endpoint.ejected_at < config.endpoint_eject_seconds:
+                    continue
+                try:
+                    endpoint.client.models.list(timeout=config.api_connect_timeout)
+                except Exception:
+                    continue
+                with self._lock:
+                    endpoint.healthy = True
+                    endpoint.consecutive_failures = 0
+    
+    def stats(self) -> list[dict]:
+        """Retorna as métricas de cada endpoint."""
+        with self._lock:
+            return [
+                {
+                    "url": e.url,
+                    "weight": e.weight,
+                    "healthy": e.healthy,
+                    "in_flight": e.in_flight,
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "avg_latency": e.total_latency / max(1, e.requests - e.in_flight),
+                    "last_error": e.last_error
+                }
+                for e in self.endpoints
+            ]
+    
+    def close(self) -> None:
+        """Encerra o health check e fecha os clientes HTTP."""
+        self._closed.set()
+        for endpoint in self.endpoints:
+            endpoint.client.close()
@@ -0,0 +1,275 @@
+"""Recorte das figuras referenciadas no markdown e gravação fora do caminho crítico."""
+import math
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from PIL import Image, ImageFilter, features
+
+from config import config
+from image_preprocessor import model_input_size
+
+
+# Referência de imagem no markdown: ![descrição](destino)
+FIGURE_REFERENCE = re.compile(r'!\[(.*?)\]\((.*?)\)')
+# Coordenadas no destino, como o olmOCR as informa (ex: page_120_340_980_760.png)
+_BOX_COORDINATES = re.compile(
+    r'(\d+(?:\.\d+)?)[_,\s]+(\d+(?:\.\d+)?)[_,\s]+(\d+(?:\.\d+)?)[_,\s]+(\d+(?:\.\d+)?)'
+)
+
+# Largura da grade usada na detecção de regiões (cada célula ~ uma linha de texto)
+GRID_WIDTH = 96
+# Pixels mais escuros que isso (0-255) não são fundo
+BACKGROUND_THRESHOLD = 230
+# Fração de pixels não-fundo a partir da qual uma célula pertence a uma figura
+MIN_CELL_FILL = 0.5
+# Lado mínimo de um recorte, em pixels
+MIN_FIGURE_SIZE = 8
+
+FILE_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg", "PNG": "png"}
+
+Box = tuple[int, int, int, int]
+
+
+def figure_format() -> str:
+    """Formato de gravação das figuras (WEBP cai para PNG se o Pillow não tiver suporte)."""
+    fmt = config.figure_format.upper()
+    if fmt not in FILE_EXTENSIONS or (fmt == "WEBP" and not features.check("webp")):
+        return "PNG"
+    return fmt
+
+
+def reference_box(target: str, page_size: tuple[int, int]) -> Optional[Box]:
+    """
+    Converte as coordenadas informadas pelo modelo no destino da referência em uma caixa na página.
+    
+    O modelo vê a página reduzida para `target_longest_edge`, então as
+    coordenadas são reescaladas para a resolução renderizada. Valores até 1.0
+    são tratados como frações da página.
+    
+    Args:
+        target: Destino da referência (ex: "page_120_340_980_760.png")
+        page_size: Tamanho (largura, altura) da página renderizada
+    
+    Returns:
+        Caixa (x0, y0, x1, y1) em pixels da página, ou None se não houver coordenadas válidas
+    """
+    match = _BOX_COORDINATES.search(target)
+    if not match:
+        return None
+    
+    x0, y0, x1, y1 = (float(v) for v in match.groups())
+    width, height = page_size
+    if max(x0, y0, x1, y1) <= 1.0:
+        scale_x, scale_y = width, height
+    else:
+        model_width, model_height = model_input_size(page_size, config.target_longest_edge)
+        scale_x, scale_y = width / model_width, height / model_height
+    
+    left, right = sorted((x0 * scale_x, x1 * scale_x))
+    top, bottom = sorted((y0 * scale_y, y1 * scale_y))
+    box = (
+        max(0, math.floor(left)),
+        max(0, math.floor(top)),
+        min(width, math.ceil(right)),
+        min(height, math.ceil(bottom))
+    )
+    if box[2] - box[0] < MIN_FIGURE_SIZE or box[3] - box[1] < MIN_FIGURE_SIZE:
+        return None
+    return box
+
+
+def detect_figure_regions(image: Image.Image) -> list[Box]:
+    """
+    Encontra regiões densas (fotos, gráficos preenchidos) com uma passada de componentes conexos.
+    
+    A página é reduzida a uma grade em que cada célula guarda a fração de
+    pixels que não são fundo; células densas (texto raramente passa de metade)
+    são unidas a vizinhas e agrupadas. Grupos menores que `figure_min_area`
+    da página são descartados.
+    
+    Args:
+        image: Imagem da página renderizada
+    
+    Returns:
+        Caixas (x0, y0, x1, y1) em pixels da página, em ordem de leitura
+    """
+    gray = image.convert("L")
+    grid_height = max(1, round(gray.height * GRID_WIDTH / gray.width))
+    filled = gray.point(lambda v: 255 if v < BACKGROUND_THRESHOLD else 0).resize(
+        (GRID_WIDTH, grid_height), Image.Resampling.BOX
+    )
+    dense = filled.point(lambda v: 255 if v >= MIN_CELL_FILL * 255 else 0).filter(ImageFilter.MaxFilter(3))
+    
+    cells = dense.load()
+    seen = set()
+    min_cells = config.figure_min_area * GRID_WIDTH * grid_height
+    cell_width, cell_height = gray.width / GRID_WIDTH, gray.height / grid_height
+    
+    boxes = []
+    for start_y in range(grid_height):
+        for start_x in range(GRID_WIDTH):
+            if cells[start_x, start_y] == 0 or (start_x, start_y) in seen:
+                continue
+            
+            # Busca em largura pelo grupo de células densas
+            seen.add((start_x, start_y))
+            stack = [(start_x, start_y)]
+            x0, y0, x1, y1 = start_x, start_y, start_x, start_y
+            while stack:
+                x, y = stack.pop()
+                x0, y0, x1, y1 = min(x0, x), min(y0, y), max(x1, x), max(y1, y)
+                for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                    if 0 <= nx < GRID_WIDTH and 0 <= ny < grid_height and (nx, ny) not in seen and cells[nx, ny]:
+                        seen.add((nx, ny))
+                        stack.append((nx, ny))
+            
+            if (x1 - x0 + 1) * (y1 - y0 + 1) >= min_cells:
+                boxes.append((
+                    math.floor(x0 * cell_width),
+                    math.floor(y0 * cell_height),
+                    min(gray.width, math.ceil((x1 + 1) * cell_width)),
+                    min(gray.height, math.ceil((y1 + 1) * cell_height))
+                ))
+    
+    return sorted(boxes, key=lambda box: (box[1], box[0]))
+
+
+def _overlaps(a: Box, b: Box) -> bool:
+    """Indica se duas caixas se sobrepõem em mais da metade da menor."""
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return False
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return width * height > smaller / 2
+
+
+def extract_figures(
+    page_image: Image.Image,
+    page_text: str,
+    base_name: str,
+    images_folder: str
+) -> tuple[str, list[tuple[str, Optional[Box]]]]:
+    """
+    Associa cada referência de imagem do markdown a um recorte da página.
+    
+    A caixa vem das coordenadas informadas pelo modelo; sem elas, das regiões
+    detectadas na página (na ordem de leitura). Referências sem região
+    apontam para a página inteira, gravada uma única vez.
+    
+    Args:
+        page_image: Imagem da página renderizada
+        page_text: Markdown da página
+        base_name: Prefixo dos arquivos (ex: "relatorio_p3")
+        images_folder: Pasta das imagens, relativa ao markdown
+    
+    Returns:
+        Tupla (markdown com as referências atualizadas, lista de (arquivo, caixa ou None))
+    """
+    references = list(FIGURE_REFERENCE.finditer(page_text))
+    if not references:
+        return page_text, []
+    
+    boxes = [reference_box(match.group(2), page_image.size) for match in references]
+    missing = [i for i, box in enumerate(boxes) if box is None]
+    if missing and config.figure_detection:
+        reported = [box for box in boxes if box is not None]
+        detected = [
+            box for box in detect_figure_regions(page_image)
+            if not any(_overlaps(box, other) for other in reported)
+        ]
+        for i, box in zip(missing, detected):
+            boxes[i] = box
+    
+    extension = FILE_EXTENSIONS[figure_format()]
+    figures: list[tuple[str, Optional[Box]]] = []
+    filenames = []
+    full_page = None
+    for number, box in enumerate(boxes, start=1):
+        if box is None:
+            if full_page is None:
+                full_page = f"{base_name}.{extension}"
+                figures.append((full_page, None))
+            filenames.append(full_page)
+        else:
+            filename = f"{base_name}_fig{number}.{extension}"
+            figures.append((filename, box))
+            filenames.append(filename)
+    
+    names = iter(filenames)
+    
+    def replace(match: re.Match) -> str:
+        description = match.group(1).strip() or "Imagem"
+        return f"![{description}]({images_folder}/{next(names)})"
+    
+    return FIGURE_REFERENCE.sub(replace, page_text), figures
+
+
+def save_figure(page_image: Image.Image, box: Optional[Box], path: Path) -> None:
+    """
+    Recorta e grava uma figura no formato configurado.
+    
+    Args:
+        page_image: Imagem da página renderizada
+        box: Região a recortar (None = página inteira)
+        path: Arquivo de destino
+    """
+    image = page_image if box is None else page_image.crop(box)
+    fmt = figure_format()
+    if fmt != "PNG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    
+    if fmt == "PNG":
+        image.save(path, format="PNG", optimize=True)
+    elif fmt == "WEBP":
+        image.save(path, format="WEBP", quality=config.figure_quality, method=4)
+    else:
+        image.save(path, format="JPEG", quality=config.figure_quality, optimize=True)
+
+
+class FigureWriter:
+    """
+    Grava as figuras em threads próprias, sem segurar a entrega das páginas.
+    
+    `close` (ou a saída do bloco `with`) espera as gravações pendentes e
+    repassa o primeiro erro, para que o documento só seja dado como pronto
+    com todas as figuras no disco.
+    """
+    
+    def __init__(self, output_dir: Path, workers: Optional[int] = None):
+        """
+        Args:
+            output_dir: Pasta das imagens
+            workers: Gravações simultâneas (padrão: config.figure_write_workers)
+        """
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max(1, workers or config.figure_write_workers), thread_name_prefix="figures")
+        self._pending: list[Future] = []
+    
+    def submit(self, page_image: Image.Image, box: Optional[Box], filename: str) -> None:
+        """
+        Agenda a gravação de uma figura.
+        
+        Args:
+            page_image: Imagem da página renderizada
+            box: Região a recortar (None = página inteira)
+            filename: Nome do arquivo dentro da pasta de imagens
+        """
+        self._pending.append(self._pool.submit(save_figure, page_image, box, self.output_dir / filename))
+    
+    def close(self, raise_errors: bool = True) -> None:
+        """Espera as gravações pendentes e encerra as threads."""
+        self._pool.shutdown(wait=True)
+        pending, self._pending = self._pending, []
+        if raise_errors:
+            for future in pending:
+                future.result()
+    
+    def __enter__(self) -> "FigureWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # Com um erro em andamento, só espera as gravações (o erro original prevalece)
+        self.close(raise_errors=exc_type is None)
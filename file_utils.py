@@ -1,9 +1,8 @@
 """Utilitários para manipulação de arquivos."""
-import tkinter as tk
-from tkinter import filedialog
 from pathlib import Path
-from typing import Optional, List
-import streamlit as st
+from typing import Optional
+
+from folder_scanner import scan_pdf_files
 
 
 def select_folder() -> Optional[str]:
@@ -13,6 +12,11 @@ def select_folder() -> Optional[str]:
     Returns:
         Caminho da pasta selecionada ou None se cancelado
     """
+    # Importados aqui para que o módulo funcione sem interface (ex: CLI em servidores)
+    import tkinter as tk
+    from tkinter import filedialog
+    import streamlit as st
+    
     try:
         root = tk.Tk()
         root.withdraw()
@@ -25,10 +29,13 @@ def select_folder() -> Optional[str]:
         return None
 
 
-def get_pdf_files(folder_path: str) -> List[Path]:
+def get_pdf_files(folder_path: str) -> list[Path]:
     """
     Lista todos os arquivos PDF em uma pasta.
     
+    Mantido por compatibilidade: equivale a `folder_scanner.scan_pdf_files`
+    sem subpastas.
+    
     Args:
         folder_path: Caminho da pasta a ser verificada
         
@@ -39,7 +46,7 @@ def get_pdf_files(folder_path: str) -> List[Path]:
     if not folder.exists() or not folder.is_dir():
         return []
     
-    return [f for f in folder.iterdir() if f.suffix.lower() == '.pdf']
+    return scan_pdf_files(folder, recursive=False)
 
 
 def create_output_directories(base_path: str, markdown_folder: str, images_folder: str) -> tuple[Path, Path]:
@@ -62,3 +69,37 @@ def create_output_directories(base_path: str, markdown_folder: str, images_folde
     images_dir.mkdir(parents=True, exist_ok=True)
     
     return markdown_dir, images_dir
+
+
+def mirrored_output_directories(
+    pdf_path: Path,
+    source_root: Optional[Path],
+    output_dir: Path,
+    images_folder: str
+) -> tuple[Path, Path]:
+    """
+    Cria as pastas de saída de um PDF espelhando sua posição na pasta de origem.
+    
+    Ex: <origem>/2024/jan/a.pdf → <saída>/2024/jan/a.md e <saída>/2024/jan/images/
+    
+    Args:
+        pdf_path: Caminho do PDF
+        source_root: Pasta de origem do lote (None = sem subpastas)
+        output_dir: Pasta de saída do lote
+        images_folder: Nome da pasta de imagens
+        
+    Returns:
+        Tupla com (caminho_markdown, caminho_imagens)
+    """
+    relative_dir = Path()
+    if source_root is not None:
+        try:
+            relative_dir = Path(pdf_path).resolve().parent.relative_to(Path(source_root).resolve())
+        except ValueError:
+            pass
+    
+    markdown_dir = Path(output_dir) / relative_dir
+    images_dir = markdown_dir / images_folder
+    images_dir.mkdir(parents=True, exist_ok=True)
+    
+    return markdown_dir, images_dir
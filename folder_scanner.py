@@ -0,0 +1,315 @@
+"""Varredura recursiva de pastas de PDFs com detecção incremental de mudanças."""
+import fnmatch
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from config import config
+
+
+def _matches(relative_path: str, patterns: Iterable[str]) -> bool:
+    """Indica se o caminho relativo (com "/") casa com algum dos padrões glob."""
+    name = relative_path.rsplit("/", 1)[-1]
+    return any(
+        fnmatch.fnmatch(relative_path.lower(), pattern.lower()) or fnmatch.fnmatch(name.lower(), pattern.lower())
+        for pattern in patterns
+    )
+
+
+def scan_pdf_files(
+    root: Path,
+    recursive: bool = True,
+    include: Optional[Iterable[str]] = None,
+    exclude: Optional[Iterable[str]] = None
+) -> list[Path]:
+    """
+    Lista os PDFs de uma pasta, opcionalmente em todas as subpastas.
+    
+    Os padrões são globs aplicados ao caminho relativo à raiz ou ao nome do
+    arquivo (ex: "*.pdf", "arquivo/*", "rascunho_*"). Pastas que casam com
+    `exclude`, pastas ocultas e as pastas de saída (`Markdown_Outputs_*`)
+    não são visitadas.
+    
+    Args:
+        root: Pasta raiz
+        recursive: Visita as subpastas
+        include: Padrões dos arquivos aceitos (padrão: config.scan_include)
+        exclude: Padrões de arquivos e pastas ignorados (padrão: config.scan_exclude)
+    
+    Returns:
+        PDFs encontrados, ordenados pelo caminho
+    """
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    
+    include = list(include or config.scan_include)
+    exclude = list(config.scan_exclude if exclude is None else exclude)
+    output_pattern = f"{config.output_folder_name}_*"
+    
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        relative_dir = Path(dirpath).relative_to(root).as_posix()
+        prefix = "" if relative_dir == "." else f"{relative_dir}/"
+        
+        if recursive:
+            # Poda as subpastas ignoradas antes de descer nelas
+            dirnames[:] = sorted(
+                d for d in dirnames
+                if not d.startswith(".")
+                and not fnmatch.fnmatch(d, output_pattern)
+                and not _matches(prefix + d, exclude)
+            )
+        else:
+            dirnames[:] = []
+        
+        for filename in filenames:
+            relative_path = prefix + filename
+            if not filename.lower().endswith(".pdf"):
+                continue
+            if _matches(relative_path, include) and not _matches(relative_path, exclude):
+                files.append(Path(dirpath) / filename)
+    
+    return sorted(files)
+
+
+def is_scanned_file(
+    root: Path,
+    path: Path,
+    recursive: bool = True,
+    include: Optional[Iterable[str]] = None,
+    exclude: Optional[Iterable[str]] = None
+) -> bool:
+    """
+    Indica se um arquivo seria listado por `scan_pdf_files` (mesmos filtros e pastas ignoradas).
+    
+    Args:
+        root: Pasta raiz
+        path: Caminho do arquivo
+        recursive: Aceita arquivos em subpastas
+        include: Padrões dos arquivos aceitos (padrão: config.scan_include)
+        exclude: Padrões de arquivos e pastas ignorados (padrão: config.scan_exclude)
+    
+    Returns:
+        True se o arquivo pertence à varredura
+    """
+    try:
+        parts = Path(path).relative_to(root).parts
+    except ValueError:
+        return False
+    if not parts or not parts[-1].lower().endswith(".pdf"):
+        return False
+    if len(parts) > 1 and not recursive:
+        return False
+    
+    include = list(include or config.scan_include)
+    exclude = list(config.scan_exclude if exclude is None else exclude)
+    output_pattern = f"{config.output_folder_name}_*"
+    
+    for depth, dirname in enumerate(parts[:-1]):
+        if (
+            dirname.startswith(".")
+            or fnmatch.fnmatch(dirname, output_pattern)
+            or _matches("/".join(parts[:depth + 1]), exclude)
+        ):
+            return False
+    
+    relative_path = "/".join(parts)
+    return _matches(relative_path, include) and not _matches(relative_path, exclude)
+
+
+def file_hash(path: Path, block_size: int = 1024 * 1024) -> str:
+    """Hash SHA-256 do conteúdo de um arquivo, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileIndex:
+    """
+    Índice em SQLite dos PDFs já convertidos (tamanho, mtime e hash do conteúdo).
+    
+    Cada registro vale para um destino (a pasta de saída estável do lote): o
+    mesmo PDF convertido para outra saída continua pendente lá. Na próxima varredura, arquivos com o mesmo tamanho e mtime são ignorados
+    sem ler o conteúdo; se só o mtime mudou (ex: cópia), o hash decide. Assim
+    um lote noturno com dezenas de milhares de arquivos custa apenas o delta.
+    """
+    
+    def __init__(self, db_path: Path):
+        """
+        Abre (ou cria) o banco do índice.
+        
+        Args:
+            db_path: Caminho do arquivo SQLite
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(files)")]
+        if columns and "destination" not in columns:
+            # Índice antigo, sem o destino: os arquivos são convertidos de novo uma vez
+            self._conn.execute("DROP TABLE files")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT NOT NULL,"
+            " destination TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " processed_at REAL NOT NULL,"
+            " PRIMARY KEY (path, destination))"
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def _key(path: Path) -> str:
+        return str(Path(path).resolve())
+    
+    def is_unchanged(self, path: Path, destination: Path) -> bool:
+        """
+        Indica se o arquivo já foi convertido para o destino e não mudou desde então.
+        
+        Args:
+            path: Caminho do PDF
+            destination: Pasta de saída do lote (ver `index_destination`)
+        
+        Returns:
+            True se o arquivo pode ser pulado
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        
+        key, target = self._key(path), self._key(destination)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, sha256 FROM files WHERE path = ? AND destination = ?", (key, target)
+            ).fetchone()
+        if row is None:
+            return False
+        
+        size, mtime_ns, sha256 = row
+        if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+            return True
+        if stat.st_size != size:
+            return False
+        
+        # Mesmo tamanho com outro mtime: compara o conteúdo
+        if file_hash(Path(path)) != sha256:
+            return False
+        with self._lock:
+            self._conn.execute(
+                "UPDATE files SET mtime_ns = ? WHERE path = ? AND destination = ?",
+                (stat.st_mtime_ns, key, target)
+            )
+            self._conn.commit()
+        return True
+    
+    def changed_files(self, files: Iterable[Path], destination: Path) -> list[Path]:
+        """Filtra os arquivos novos ou alterados desde a última conversão para o destino."""
+        return [f for f in files if not self.is_unchanged(f, destination)]
+    
+    @staticmethod
+    def snapshot(path: Path) -> tuple[int, int, str]:
+        """
+        Tamanho, mtime e hash atuais de um arquivo, para `mark_processed`.
+        
+        Args:
+            path: Caminho do PDF
+        
+        Returns:
+            Tupla (size, mtime_ns, sha256)
+        """
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns, file_hash(Path(path))
+    
+    def mark_processed(
+        self,
+        path: Path,
+        destination: Path,
+        snapshot: Optional[tuple[int, int, str]] = None
+    ) -> None:
+        """
+        Registra um PDF convertido com sucesso para um destino.
+        
+        Args:
+            path: Caminho do PDF
+            destination: Pasta de saída do lote (ver `index_destination`)
+            snapshot: Estado do arquivo tirado antes da conversão (ver `snapshot`);
+                se o arquivo mudou durante o processamento, a versão nova continua
+                pendente na próxima varredura (padrão: estado atual)
+        """
+        size, mtime_ns, sha256 = snapshot or self.snapshot(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, destination, size, mtime_ns, sha256, processed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (self._key(path), self._key(destination), size, mtime_ns, sha256, time.time())
+            )
+            self._conn.commit()
+    
+    def close(self) -> None:
+        """Fecha a conexão com o banco."""
+        with self._lock:
+            self._conn.close()
+
+
+def index_destination(output_dir: Optional[Path], source_root: Path) -> Path:
+    """
+    Destino sob o qual o índice registra os PDFs convertidos de um lote.
+    
+    Uma pasta de saída informada é o próprio destino. Sem ela, cada lote cria
+    uma pasta nova com data dentro da pasta dos PDFs; o destino é então a
+    pasta dos PDFs, que reúne essas saídas (assim os lotes seguintes
+    reconhecem o que já foi convertido).
+    
+    Args:
+        output_dir: Pasta de saída informada pelo usuário (None = padrão com data)
+        source_root: Pasta dos PDFs
+    
+    Returns:
+        Destino do lote
+    """
+    return Path(output_dir) if output_dir else Path(source_root)
+
+
+def collect_pdf_files(
+    root: Path,
+    recursive: Optional[bool] = None,
+    incremental: Optional[bool] = None,
+    index: Optional[FileIndex] = None,
+    include: Optional[Iterable[str]] = None,
+    exclude: Optional[Iterable[str]] = None,
+    destination: Optional[Path] = None
+) -> list[Path]:
+    """
+    Varre a pasta conforme o config e, no modo incremental, mantém só os PDFs novos ou alterados.
+    
+    Args:
+        root: Pasta raiz
+        recursive: Visita as subpastas (padrão: config.scan_recursive)
+        incremental: Usa o índice para pular arquivos já convertidos (padrão: config.scan_incremental)
+        index: Índice de arquivos convertidos (obrigatório no modo incremental)
+        include: Padrões dos arquivos aceitos
+        exclude: Padrões ignorados
+        destination: Destino do lote no índice (padrão: `root`, ver `index_destination`)
+    
+    Returns:
+        PDFs a processar
+    """
+    recursive = config.scan_recursive if recursive is None else recursive
+    incremental = config.scan_incremental if incremental is None else incremental
+    
+    files = scan_pdf_files(root, recursive, include, exclude)
+    if incremental and index is not None:
+        files = index.changed_files(files, destination or root)
+    return files
@@ -0,0 +1,406 @@
+"""Modo watch: converte continuamente os PDFs que chegam a uma pasta."""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from config import config
+from document_processor import DocumentProcessor
+from file_utils import mirrored_output_directories
+from folder_scanner import FileIndex, is_scanned_file, scan_pdf_files
+from metrics import MetricsRecorder
+
+try:
+    from watchdog.observers import Observer
+except ImportError:  # watchdog é opcional: sem ele, a pasta é varrida periodicamente
+    Observer = None
+
+
+class WatchQueue:
+    """
+    Fila persistente (SQLite) dos arquivos a converter no modo watch.
+    
+    Sobrevive a reinícios: arquivos que estavam em processamento quando o
+    serviço parou voltam para a fila ao reabri-la.
+    """
+    
+    FILENAME = "watch_queue.sqlite3"
+    
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    
+    def __init__(self, db_path: Path):
+        """
+        Abre (ou cria) o banco da fila.
+        
+        Args:
+            db_path: Caminho do arquivo SQLite
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS queue ("
+            " path TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " attempts INTEGER NOT NULL,"
+            " error TEXT,"
+            " enqueued_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_status ON queue(status, enqueued_at)")
+        # Processamentos interrompidos recomeçam do início do arquivo
+        self._conn.execute(
+            "UPDATE queue SET status = ? WHERE status = ?",
+            (self.STATUS_PENDING, self.STATUS_RUNNING)
+        )
+        self._conn.commit()
+    
+    def enqueue(self, path: Path, size: int, mtime_ns: int) -> bool:
+        """
+        Coloca um arquivo na fila.
+        
+        Arquivos já pendentes ou em processamento são ignorados; arquivos
+        concluídos ou falhos só voltam à fila se mudaram desde então.
+        
+        Args:
+            path: Caminho do PDF
+            size: Tamanho do arquivo
+            mtime_ns: Data de modificação (ns)
+        
+        Returns:
+            True se o arquivo entrou na fila
+        """
+        key = str(Path(path).resolve())
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, size, mtime_ns FROM queue WHERE path = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                status, old_size, old_mtime_ns = row
+                if status in (self.STATUS_PENDING, self.STATUS_RUNNING):
+                    return False
+                if status == self.STATUS_FAILED and (old_size, old_mtime_ns) == (size, mtime_ns):
+                    return False
+            
+            self._conn.execute(
+                "INSERT OR REPLACE INTO queue"
+                " (path, status, size, mtime_ns, attempts, error, enqueued_at, updated_at)"
+                " VALUES (?, ?, ?, ?, 0, NULL, ?, ?)",
+                (key, self.STATUS_PENDING, size, mtime_ns, now, now)
+            )
+            self._conn.commit()
+        return True
+    
+    def claim(self) -> Optional[Path]:
+        """
+        Retira o arquivo mais antigo da fila e o marca como em processamento.
+        
+        Returns:
+            Caminho do PDF ou None se a fila estiver vazia
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path FROM queue WHERE status = ? ORDER BY enqueued_at LIMIT 1",
+                (self.STATUS_PENDING,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE queue SET status = ?, attempts = attempts + 1, updated_at = ? WHERE path = ?",
+                (self.STATUS_RUNNING, time.time(), row[0])
+            )
+            self._conn.commit()
+        return Path(row[0])
+    
+    def mark_done(self, path: Path) -> None:
+        """Registra a conversão concluída de um arquivo."""
+        self._set_status(path, self.STATUS_DONE, None)
+    
+    def mark_failed(self, path: Path, error: str, max_attempts: int) -> bool:
+        """
+        Registra uma falha; o arquivo volta para a fila enquanto houver tentativas.
+        
+        Args:
+            path: Caminho do PDF
+            error: Mensagem de erro
+            max_attempts: Tentativas permitidas por arquivo
+        
+        Returns:
+            True se o arquivo voltou para a fila
+        """
+        key = str(Path(path).resolve())
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM queue WHERE path = ?", (key,)).fetchone()
+        retry = row is not None and row[0] < max_attempts
+        self._set_status(path, self.STATUS_PENDING if retry else self.STATUS_FAILED, error)
+        return retry
+    
+    def _set_status(self, path: Path, status: str, error: Optional[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE queue SET status = ?, error = ?, updated_at = ? WHERE path = ?",
+                (status, error, time.time(), str(Path(path).resolve()))
+            )
+            self._conn.commit()
+    
+    def counts(self) -> dict[str, int]:
+        """Número de arquivos em cada estado."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM queue GROUP BY status").fetchall()
+        return dict(rows)
+    
+    def close(self) -> None:
+        """Fecha a conexão com o banco."""
+        with self._lock:
+            self._conn.close()
+
+
+class _EventHandler:
+    """Repassa ao FolderWatcher os arquivos criados, alterados ou movidos (eventos do watchdog)."""
+    
+    def __init__(self, watcher: "FolderWatcher"):
+        self.watcher = watcher
+    
+    def dispatch(self, event) -> None:
+        if event.is_directory:
+            return
+        path = getattr(event, "dest_path", "") or event.src_path
+        self.watcher.notify(Path(os.fsdecode(path)))
+
+
+class FolderWatcher:
+    """
+    Converte continuamente os PDFs novos ou alterados de uma pasta.
+    
+    - Detecção: eventos do sistema de arquivos (pacote `watchdog`, se
+      instalado) com uma varredura completa de segurança a cada
+      `watch_rescan_interval`; sem o watchdog, varredura a cada
+      `watch_poll_interval`. O índice de arquivos descarta o que já foi convertido.
+    - Debounce: um arquivo só entra na fila depois de ficar
+      `watch_settle_seconds` com tamanho e data de modificação estáveis
+      (cópias ainda em andamento são ignoradas).
+    - Processamento: `concurrent_files` threads consomem a fila persistente,
+      cada uma convertendo um arquivo com o DocumentProcessor.
+    """
+    
+    def __init__(
+        self,
+        root: Path,
+        output_dir: Path,
+        processor: DocumentProcessor,
+        queue: WatchQueue,
+        index: FileIndex,
+        recursive: Optional[bool] = None,
+        include: Optional[Iterable[str]] = None,
+        exclude: Optional[Iterable[str]] = None,
+        concurrent_files: Optional[int] = None,
+        on_file_start: Optional[Callable[[Path], None]] = None,
+        on_file_done: Optional[Callable[[Path, Optional[str]], None]] = None
+    ):
+        """
+        Args:
+            root: Pasta observada
+            output_dir: Pasta de saída (as subpastas da origem são reproduzidas)
+            processor: Processador de documentos
+            queue: Fila persistente dos arquivos
+            index: Índice dos PDFs já convertidos
+            recursive: Observa as subpastas (padrão: config.scan_recursive)
+            include: Padrões dos arquivos aceitos
+            exclude: Padrões ignorados
+            concurrent_files: Arquivos processados ao mesmo tempo (padrão: config.watch_concurrent_files)
+            on_file_start: Callback ao iniciar um arquivo
+            on_file_done: Callback ao terminar um arquivo (caminho, erro ou None)
+        """
+        self.root = Path(root).resolve()
+        self.output_dir = Path(output_dir)
+        self.processor = processor
+        self.queue = queue
+        self.index = index
+        self.recursive = config.scan_recursive if recursive is None else recursive
+        self.include = include
+        self.exclude = exclude
+        self.concurrent_files = max(1, concurrent_files or config.watch_concurrent_files)
+        self.on_file_start = on_file_start
+        self.on_file_done = on_file_done
+        
+        self.recorder = MetricsRecorder(self.output_dir / MetricsRecorder.FILENAME)
+        self._candidates: dict[Path, Optional[tuple[tuple[int, int], float]]] = {}
+        self._candidates_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._work = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._observer = None
+    
+    @property
+    def uses_events(self) -> bool:
+        """Indica se a detecção usa eventos do sistema de arquivos (watchdog)."""
+        return Observer is not None
+    
+    def notify(self, path: Path) -> None:
+        """
+        Informa que um arquivo foi criado ou alterado.
+        
+        Args:
+            path: Caminho do arquivo
+        """
+        if not is_scanned_file(self.root, path, self.recursive, self.include, self.exclude):
+            return
+        with self._candidates_lock:
+            self._candidates[path] = None
+        self._wake.set()
+    
+    def start(self) -> None:
+        """Inicia a detecção e as threads de processamento."""
+        self._stop.clear()
+        if Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), str(self.root), recursive=self.recursive)
+            self._observer.start()
+        
+        self._threads = [threading.Thread(target=self._scan_loop, name="watch-scan", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._worker, name=f"watch-worker-{i}", daemon=True)
+            for i in range(self.concurrent_files)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def stop(self) -> None:
+        """Para a detecção e espera os arquivos em processamento terminarem."""
+        self._stop.set()
+        self._wake.set()
+        with self._work:
+            self._work.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+    
+    def run_forever(self) -> None:
+        """Executa até Ctrl+C (ou até `stop` ser chamado de outra thread)."""
+        self.start()
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+    
+    def _scan_loop(self) -> None:
+        """Varre a pasta periodicamente e promove à fila os arquivos estáveis."""
+        full_scan_interval = config.watch_rescan_interval if self._observer else config.watch_poll_interval
+        next_full_scan = 0.0
+        
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_full_scan:
+                next_full_scan = now + full_scan_interval
+                files = self.index.changed_files(
+                    scan_pdf_files(self.root, self.recursive, self.include, self.exclude),
+                    self.output_dir
+                )
+                with self._candidates_lock:
+                    for path in files:
+                        self._candidates.setdefault(path, None)
+            
+            self._promote_settled()
+            
+            # Com candidatos à espera, confere de novo em breve; senão, até a próxima varredura
+            with self._candidates_lock:
+                waiting = bool(self._candidates)
+            timeout = next_full_scan - time.monotonic()
+            if waiting:
+                timeout = min(timeout, max(0.2, config.watch_settle_seconds / 2))
+            self._wake.wait(max(0.0, timeout))
+            self._wake.clear()
+    
+    def _promote_settled(self) -> None:
+        """Coloca na fila os candidatos com tamanho e data estáveis há `watch_settle_seconds`."""
+        now = time.monotonic()
+        with self._candidates_lock:
+            candidates = list(self._candidates.items())
+        
+        for path, seen in candidates:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removido ou renomeado antes de estabilizar
+                self._discard_candidate(path)
+                continue
+            
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if seen is None or seen[0] != signature:
+                with self._candidates_lock:
+                    self._candidates[path] = (signature, now)
+                continue
+            if stat.st_size == 0 or now - seen[1] < config.watch_settle_seconds:
+                continue
+            
+            self._discard_candidate(path)
+            if self.index.is_unchanged(path, self.output_dir):
+                continue
+            if self.queue.enqueue(path, *signature):
+                with self._work:
+                    self._work.notify()
+    
+    def _discard_candidate(self, path: Path) -> None:
+        with self._candidates_lock:
+            self._candidates.pop(path, None)
+    
+    def _worker(self) -> None:
+        """Consome a fila até o watcher ser parado."""
+        while not self._stop.is_set():
+            pdf_path = self.queue.claim()
+            if pdf_path is None:
+                with self._work:
+                    self._work.wait(timeout=1.0)
+                continue
+            
+            if self.on_file_start:
+                self.on_file_start(pdf_path)
+            try:
+                # Estado da versão convertida: alterações durante a conversão não são dadas como feitas
+                snapshot = self.index.snapshot(pdf_path)
+                self._process(pdf_path)
+            except Exception as e:
+                self.queue.mark_failed(pdf_path, str(e), config.watch_max_attempts)
+                if self.on_file_done:
+                    self.on_file_done(pdf_path, str(e))
+            else:
+                self.index.mark_processed(pdf_path, self.output_dir, snapshot)
+                self.queue.mark_done(pdf_path)
+                if self.on_file_done:
+                    self.on_file_done(pdf_path, None)
+                if not self.index.is_unchanged(pdf_path, self.output_dir):
+                    # O arquivo mudou durante a conversão (o evento foi ignorado enquanto estava na fila)
+                    self.notify(pdf_path)
+    
+    def _process(self, pdf_path: Path) -> Path:
+        """Converte um arquivo para a pasta de saída espelhada."""
+        markdown_dir, images_dir = mirrored_output_directories(
+            pdf_path,
+            self.root,
+            self.output_dir,
+            config.images_folder_name
+        )
+        return self.processor.convert_document(
+            pdf_path,
+            markdown_dir / f"{pdf_path.stem}.md",
+            images_dir,
+            metrics_recorder=self.recorder
+        )
@@ -0,0 +1,145 @@
+"""Detecção de saídas degeneradas do modelo (loops, texto longo demais, geração travada) durante o streaming."""
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from config import config
+from text_stream import TextAccumulator
+
+
+# Caracteres recebidos entre duas buscas por repetição
+REPEAT_CHECK_INTERVAL = 256
+
+
+@dataclass
+class DegenerateOutput:
+    """Motivo da interrupção de uma geração e quanto do texto ainda é aproveitável."""
+    
+    reason: str      # "repetition", "length" ou "stalled"
+    keep: int        # Caracteres do início do texto que precedem o problema
+
+
+def output_limit(ink_ratio: Optional[float]) -> int:
+    """
+    Tamanho máximo esperado do texto de uma página, proporcional à tinta.
+    
+    Args:
+        ink_ratio: Fração da página coberta por tinta (None = desconhecida)
+    
+    Returns:
+        Limite em caracteres, entre `guard_min_chars` e `guard_max_chars`
+    """
+    if ink_ratio is None:
+        return config.guard_max_chars
+    limit = int(ink_ratio * config.guard_chars_per_ink)
+    return min(config.guard_max_chars, max(config.guard_min_chars, limit))
+
+
+def token_limit(max_chars: int) -> int:
+    """Teto de tokens da geração correspondente a um limite de caracteres (~3 caracteres por token)."""
+    return max(256, max_chars // 3)
+
+
+def retry_options(max_chars: int) -> dict:
+    """Parâmetros da nova tentativa após uma geração degenerada (mais aleatoriedade e teto de tokens)."""
+    return {
+        "temperature": config.guard_retry_temperature,
+        # O servidor para sozinho perto do limite
+        "max_tokens": token_limit(max_chars),
+    }
+
+
+def periodic_start(text: str, window: int, min_repeats: int) -> Optional[int]:
+    """
+    Procura um trecho repetido em sequência no fim do texto.
+    
+    O fim do texto (`window` caracteres) é considerado um loop se for formado
+    por pelo menos `min_repeats` cópias seguidas de um mesmo trecho.
+    
+    Args:
+        text: Texto acumulado
+        window: Caracteres finais analisados
+        min_repeats: Repetições mínimas do trecho
+    
+    Returns:
+        Posição em que o loop começa (mantendo uma cópia do trecho), ou None
+    """
+    if len(text) < window:
+        return None
+    
+    tail = text[-window:]
+    for period in range(1, window // min_repeats + 1):
+        if tail[period:] != tail[:-period]:
+            continue
+        
+        # Estende o loop para trás até onde a repetição começou
+        start = len(text) - window
+        while start > 0 and text[start - 1] == text[start - 1 + period]:
+            start -= 1
+        return start + period
+    return None
+
+
+class GenerationGuard:
+    """
+    Acompanha o texto de uma geração e indica quando ela deve ser abortada.
+    
+    - Repetição: o fim do texto virou um loop (ver `periodic_start`).
+    - Tamanho: o texto passou do limite esperado para a página.
+    - Travamento: a taxa de chunks (~tokens) caiu abaixo de
+      `guard_min_tokens_per_second` ao longo de `guard_stall_window` segundos.
+    
+    As verificações são baratas: a busca por repetição só olha o fim do
+    texto e roda a cada `REPEAT_CHECK_INTERVAL` caracteres recebidos.
+    """
+    
+    def __init__(self, max_chars: Optional[int] = None):
+        """
+        Args:
+            max_chars: Limite de caracteres da página (padrão: config.guard_max_chars)
+        """
+        self.max_chars = min(max_chars or config.guard_max_chars, config.guard_max_chars)
+        self._next_repeat_check = config.guard_repeat_window
+        self._chunks = 0
+        self._window_start: Optional[float] = None
+        self._window_chunks = 0
+    
+    def check(self, buffer: TextAccumulator) -> Optional[DegenerateOutput]:
+        """
+        Avalia o texto depois de cada chunk recebido.
+        
+        Args:
+            buffer: Texto acumulado da tentativa
+        
+        Returns:
+            DegenerateOutput se a geração deve ser abortada, senão None
+        """
+        self._chunks += 1
+        length = len(buffer)
+        
+        if length > self.max_chars:
+            # Tabelas em HTML têm muito mais caracteres por tinta: só o limite absoluto vale
+            if self.max_chars < config.guard_max_chars and "<table" in buffer.text:
+                self.max_chars = config.guard_max_chars
+            else:
+                return DegenerateOutput("length", self.max_chars)
+        
+        if length >= self._next_repeat_check:
+            self._next_repeat_check = length + REPEAT_CHECK_INTERVAL
+            window = config.guard_repeat_window
+            if periodic_start(buffer.tail(window), window, config.guard_min_repeats) is not None:
+                # Só com o loop confirmado no fim o texto inteiro é montado
+                return DegenerateOutput(
+                    "repetition",
+                    periodic_start(buffer.text, window, config.guard_min_repeats)
+                )
+        
+        now = time.monotonic()
+        if self._window_start is None:
+            self._window_start, self._window_chunks = now, self._chunks
+        elif now - self._window_start >= config.guard_stall_window:
+            rate = (self._chunks - self._window_chunks) / (now - self._window_start)
+            if rate < config.guard_min_tokens_per_second:
+                return DegenerateOutput("stalled", length)
+            self._window_start, self._window_chunks = now, self._chunks
+        return None
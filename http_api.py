@@ -0,0 +1,328 @@
+"""
+API HTTP de jobs de conversão (biblioteca padrão, sem dependências extras).
+
+Rotas:
+    POST   /jobs                          cria um job: JSON {"paths": [...], "recursive", "include",
+                                          "exclude", "dpi"} ou o próprio PDF (Content-Type: application/pdf,
+                                          nome em ?filename=)
+    GET    /jobs                          jobs mais recentes
+    GET    /jobs/<id>                     estado do job, dos arquivos e métricas
+    DELETE /jobs/<id>                     cancela o job
+    GET    /jobs/<id>/pages?after=<seq>   páginas concluídas (JSON)
+    GET    /jobs/<id>/stream?after=<seq>  páginas à medida que terminam (NDJSON, ou SSE com
+                                          Accept: text/event-stream), até o fim do job
+    GET    /jobs/<id>/files/<n>/markdown  markdown de um arquivo concluído
+    GET    /health                        estado do serviço
+"""
+import hmac
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from config import config
+from job_service import JobService
+from job_store import JobStore
+from metrics import MetricsRecorder, MetricsSummaryCache
+
+
+_JOB_ROUTE = re.compile(r'^/jobs/(?P<job_id>[0-9a-f]+)(?P<rest>/.*)?$')
+_MARKDOWN_ROUTE = re.compile(r'^/files/(?P<file_idx>\d+)/markdown$')
+
+
+class JobAPIServer:
+    """Servidor HTTP em threads que expõe o JobService."""
+    
+    def __init__(self, service: JobService, host: Optional[str] = None, port: Optional[int] = None):
+        """
+        Args:
+            service: Serviço de jobs (submissão e fila)
+            host: Interface de escuta (padrão: config.service_host)
+            port: Porta (padrão: config.service_port; 0 escolhe uma livre)
+        """
+        self.service = service
+        self.store = service.store
+        self._stop = threading.Event()
+        self._httpd = ThreadingHTTPServer(
+            (host or config.service_host, config.service_port if port is None else port),
+            self._make_handler()
+        )
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        # Resumo das métricas de cada job, atualizado só com as páginas novas a cada consulta
+        self._metrics = MetricsSummaryCache()
+    
+    @property
+    def base_url(self) -> str:
+        """URL base da API."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> "JobAPIServer":
+        """Inicia o servidor em segundo plano."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="job-api", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        """Encerra o servidor (streams abertos terminam na próxima verificação)."""
+        self._stop.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+    
+    def run_forever(self) -> None:
+        """Executa até Ctrl+C."""
+        self.start()
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+    
+    def job_details(self, job_id: str) -> Optional[dict]:
+        """Estado de um job com os links de resultado e o resumo das métricas."""
+        job = self.store.get_job(job_id)
+        if job is None:
+            return None
+        
+        for entry in job["files"]:
+            entry["name"] = Path(entry["path"]).name
+            if entry["status"] == JobStore.STATUS_DONE:
+                entry["markdown_url"] = f"/jobs/{job_id}/files/{entry['file_idx']}/markdown"
+        job["links"] = {
+            "self": f"/jobs/{job_id}",
+            "pages": f"/jobs/{job_id}/pages",
+            "stream": f"/jobs/{job_id}/stream"
+        }
+        job["metrics"] = self._metrics.summary(Path(job["output_dir"]) / MetricsRecorder.FILENAME)
+        return job
+    
+    def _make_handler(self) -> type:
+        """Cria a classe de handler ligada a este servidor."""
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def log_message(self, format, *args) -> None:
+                pass
+            
+            # --- Roteamento ---
+            
+            def do_GET(self) -> None:
+                if not self._authorized():
+                    return
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                
+                if url.path == "/health":
+                    self._send_json(200, {"status": "ok", "workers": server.service.workers, "jobs": server.store.counts()})
+                    return
+                if url.path == "/jobs":
+                    self._send_json(200, {"jobs": server.store.list_jobs(self._int(query, "limit", 100))})
+                    return
+                
+                match = _JOB_ROUTE.match(url.path)
+                if not match:
+                    self._send_error(404, "Rota não encontrada")
+                    return
+                job_id, rest = match.group("job_id"), match.group("rest") or ""
+                
+                if rest == "":
+                    job = server.job_details(job_id)
+                    if job is None:
+                        self._send_error(404, "Job não encontrado")
+                    else:
+                        self._send_json(200, job)
+                elif rest == "/pages":
+                    if server.store.get_job(job_id) is None:
+                        self._send_error(404, "Job não encontrado")
+                        return
+                    pages = server.store.pages(job_id, self._int(query, "after", 0), self._int(query, "limit", 100))
+                    self._send_json(200, {"pages": pages})
+                elif rest == "/stream":
+                    self._stream(job_id, self._int(query, "after", 0))
+                elif _MARKDOWN_ROUTE.match(rest):
+                    self._send_markdown(job_id, int(_MARKDOWN_ROUTE.match(rest).group("file_idx")))
+                else:
+                    self._send_error(404, "Rota não encontrada")
+            
+            def do_POST(self) -> None:
+                if not self._authorized():
+                    return
+                url = urlparse(self.path)
+                if url.path != "/jobs":
+                    self._send_error(404, "Rota não encontrada")
+                    return
+                
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > config.service_max_upload_mb * 1024 * 1024:
+                    self._send_error(413, f"Limite de {config.service_max_upload_mb} MB por requisição")
+                    self.close_connection = True
+                    return
+                body = self.rfile.read(length)
+                content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+                query = parse_qs(url.query)
+                
+                try:
+                    if content_type in ("application/pdf", "application/octet-stream"):
+                        settings = self._settings({"dpi": query.get("dpi", [None])[0]})
+                        filename = query.get("filename", [None])[0] or self.headers.get("X-Filename", "")
+                        job_id = server.service.submit_upload(filename, body, settings)
+                    else:
+                        request = json.loads(body or b"{}")
+                        paths = request.get("paths")
+                        if not isinstance(paths, list) or not paths:
+                            raise ValueError('Informe "paths" (lista de PDFs ou pastas) ou envie um PDF')
+                        job_id = server.service.submit_paths(
+                            paths,
+                            recursive=bool(request.get("recursive", False)),
+                            include=request.get("include"),
+                            exclude=request.get("exclude"),
+                            settings=self._settings(request)
+                        )
+                except PermissionError as e:
+                    self._send_error(403, str(e))
+                    return
+                except ValueError as e:
+                    self._send_error(400, str(e))
+                    return
+                
+                self._send_json(202, server.job_details(job_id), {"Location": f"/jobs/{job_id}"})
+            
+            def do_DELETE(self) -> None:
+                if not self._authorized():
+                    return
+                match = _JOB_ROUTE.match(urlparse(self.path).path)
+                if not match or match.group("rest"):
+                    self._send_error(404, "Rota não encontrada")
+                    return
+                job_id = match.group("job_id")
+                if server.store.get_job(job_id) is None:
+                    self._send_error(404, "Job não encontrado")
+                    return
+                server.service.cancel(job_id)
+                self._send_json(200, server.job_details(job_id))
+            
+            # --- Auxiliares ---
+            
+            def _authorized(self) -> bool:
+                """Confere o token (se configurado); responde 401 se não bater."""
+                if not config.service_token:
+                    return True
+                expected = f"Bearer {config.service_token}"
+                if hmac.compare_digest(self.headers.get("Authorization", ""), expected):
+                    return True
+                self._send_error(401, "Token inválido")
+                return False
+            
+            @staticmethod
+            def _int(query: dict, name: str, default: int) -> int:
+                try:
+                    return int(query[name][0])
+                except (KeyError, IndexError, ValueError):
+                    return default
+            
+            @staticmethod
+            def _settings(request: dict) -> dict:
+                """Opções aceitas por job (valida o DPI)."""
+                settings = {}
+                if request.get("dpi") not in (None, ""):
+                    try:
+                        dpi = int(request["dpi"])
+                    except (TypeError, ValueError):
+                        raise ValueError("dpi deve ser um número inteiro")
+                    if not config.min_dpi <= dpi <= config.max_dpi:
+                        raise ValueError(f"dpi deve estar entre {config.min_dpi} e {config.max_dpi}")
+                    settings["dpi"] = dpi
+                return settings
+            
+            def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def _send_error(self, status: int, message: str) -> None:
+                self._send_json(status, {"error": message})
+            
+            def _send_markdown(self, job_id: str, file_idx: int) -> None:
+                job = server.store.get_job(job_id)
+                entry = next((f for f in job["files"] if f["file_idx"] == file_idx), None) if job else None
+                if entry is None:
+                    self._send_error(404, "Arquivo não encontrado")
+                    return
+                if entry["status"] != JobStore.STATUS_DONE or not entry["markdown_path"]:
+                    self._send_error(409, f"Arquivo ainda não concluído ({entry['status']})")
+                    return
+                
+                data = Path(entry["markdown_path"]).read_bytes()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/markdown; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header(
+                    "Content-Disposition", f'attachment; filename="{Path(entry["markdown_path"]).name}"'
+                )
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def _stream(self, job_id: str, after: int) -> None:
+                """Envia as páginas à medida que terminam, até o job acabar (ou o cliente desconectar)."""
+                job = server.store.get_job(job_id)
+                if job is None:
+                    self._send_error(404, "Job não encontrado")
+                    return
+                names = {f["file_idx"]: Path(f["path"]).name for f in job["files"]}
+                sse = "text/event-stream" in (self.headers.get("Accept") or "")
+                
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream" if sse else "application/x-ndjson")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                
+                def emit(event: str, payload: dict) -> None:
+                    data = json.dumps(payload, ensure_ascii=False)
+                    if sse:
+                        seq = f"id: {payload['seq']}\n" if "seq" in payload else ""
+                        message = f"{seq}event: {event}\ndata: {data}\n\n"
+                    else:
+                        message = json.dumps({"event": event, **payload}, ensure_ascii=False) + "\n"
+                    self.wfile.write(message.encode("utf-8"))
+                    self.wfile.flush()
+                
+                try:
+                    while not server._stop.is_set():
+                        # A versão é lida antes da consulta: nenhuma mudança se perde na espera
+                        version = server.store.version
+                        for page in server.store.pages(job_id, after):
+                            after = page["seq"]
+                            emit("page", {**page, "file": names.get(page["file_idx"])})
+                        
+                        job = server.store.get_job(job_id)
+                        if job["status"] in JobStore.FINAL_STATUSES and not server.store.pages(job_id, after, 1):
+                            emit("job", {"id": job_id, "status": job["status"], "error": job["error"]})
+                            return
+                        
+                        if server.store.wait_for_change(version, config.service_heartbeat_seconds) == version:
+                            # Mantém a conexão viva (proxies) e detecta clientes desconectados
+                            if sse:
+                                self.wfile.write(b": keep-alive\n\n")
+                                self.wfile.flush()
+                            else:
+                                emit("heartbeat", {})
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+        
+        return Handler
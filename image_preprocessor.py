@@ -0,0 +1,161 @@
+"""Pré-processamento das páginas antes do envio ao modelo de OCR."""
+import base64
+import io
+from dataclasses import dataclass
+from PIL import Image, features
+
+from config import config
+
+
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+}
+
+
+@dataclass
+class EncodedImage:
+    """Imagem já codificada e pronta para envio."""
+    
+    data: bytes
+    format: str
+    width: int
+    height: int
+    
+    @property
+    def mime_type(self) -> str:
+        """Tipo MIME correspondente ao formato."""
+        return MIME_TYPES[self.format]
+    
+    def to_base64(self) -> str:
+        """Retorna os bytes da imagem em base64."""
+        return base64.b64encode(self.data).decode("utf-8")
+    
+    def to_data_url(self) -> str:
+        """Retorna a imagem como data URL para a API."""
+        return f"data:{self.mime_type};base64,{self.to_base64()}"
+
+
+def model_input_size(size: tuple[int, int], longest_edge: int) -> tuple[int, int]:
+    """
+    Tamanho da imagem depois de limitar o maior lado a `longest_edge` pixels.
+    
+    Args:
+        size: Tamanho original (largura, altura)
+        longest_edge: Tamanho máximo do maior lado (0 desativa o redimensionamento)
+    
+    Returns:
+        Tamanho (largura, altura) da imagem enviada ao modelo
+    """
+    if not longest_edge or max(size) <= longest_edge:
+        return size
+    
+    scale = longest_edge / max(size)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def resize_for_model(image: Image.Image, longest_edge: int) -> Image.Image:
+    """
+    Reduz a imagem para que o maior lado tenha no máximo `longest_edge` pixels.
+    
+    Args:
+        image: Imagem PIL
+        longest_edge: Tamanho máximo do maior lado (0 desativa o redimensionamento)
+    
+    Returns:
+        Imagem redimensionada (ou a original, se já for pequena o suficiente)
+    """
+    new_size = model_input_size(image.size, longest_edge)
+    if new_size == image.size:
+        return image
+    return image.resize(new_size, Image.Resampling.LANCZOS)
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    """Codifica a imagem no formato informado."""
+    buffered = io.BytesIO()
+    if fmt == "PNG":
+        image.save(buffered, format="PNG", optimize=True)
+    elif fmt == "WEBP":
+        image.save(buffered, format="WEBP", quality=config.image_quality, method=4)
+    else:
+        image.save(buffered, format="JPEG", quality=config.image_quality, optimize=True)
+    return buffered.getvalue()
+
+
+def candidate_formats() -> list[str]:
+    """Formatos experimentados no modo "AUTO", conforme o suporte do Pillow."""
+    formats = ["JPEG", "PNG"]
+    if features.check("webp"):
+        formats.append("WEBP")
+    return formats
+
+
+def resolve_image_format() -> str:
+    """
+    Formato efetivo de `config.image_format`.
+    
+    Sem suporte a WEBP no Pillow, "WEBP" recai em "JPEG" (em vez de falhar na
+    codificação de cada página).
+    
+    Returns:
+        "JPEG", "PNG", "WEBP" ou "AUTO"
+    
+    Raises:
+        ValueError: Formato desconhecido (ex: "JPG")
+    """
+    fmt = config.image_format.strip().upper()
+    if fmt != "AUTO" and fmt not in MIME_TYPES:
+        raise ValueError(
+            f"image_format inválido: {config.image_format!r} (use JPEG, PNG, WEBP ou AUTO)"
+        )
+    if fmt == "WEBP" and not features.check("webp"):
+        return "JPEG"
+    return fmt
+
+
+def prepare_image(image: Image.Image) -> EncodedImage:
+    """
+    Prepara uma página para o modelo: redimensiona, converte e codifica.
+    
+    O maior lado é limitado a `config.target_longest_edge` (a resolução em que o
+    modelo trabalha), a imagem pode ser convertida para tons de cinza e é
+    codificada em `config.image_format` (ver `resolve_image_format`). No modo
+    "AUTO" todos os formatos disponíveis são testados e o menor resultado é enviado.
+    
+    Args:
+        image: Imagem PIL da página renderizada
+    
+    Returns:
+        Imagem codificada
+    
+    Raises:
+        ValueError: `config.image_format` inválido
+    """
+    image = resize_for_model(image, config.target_longest_edge)
+    
+    target_mode = "L" if config.image_grayscale else "RGB"
+    if image.mode != target_mode:
+        image = image.convert(target_mode)
+    
+    fmt = resolve_image_format()
+    formats = candidate_formats() if fmt == "AUTO" else [fmt]
+    
+    best = None
+    for candidate in formats:
+        data = _encode(image, candidate)
+        if best is None or len(data) < len(best[1]):
+            best = (candidate, data)
+    
+    return EncodedImage(data=best[1], format=best[0], width=image.width, height=image.height)
+
+
+def preprocessing_signature() -> tuple:
+    """Parâmetros do pré-processamento que afetam o resultado do OCR (usado no cache)."""
+    return (
+        config.target_longest_edge,
+        config.image_grayscale,
+        resolve_image_format(),
+        config.image_quality,
+    )
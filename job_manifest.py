@@ -0,0 +1,220 @@
+"""Manifesto em disco do progresso de um lote, usado para retomar processamentos."""
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from config import config
+
+
+class JobManifest:
+    """
+    Registra, ao lado da pasta de saída, o estado de cada arquivo de um lote.
+    
+    Como as páginas de um arquivo são gravadas em ordem, o progresso de cada
+    arquivo é o número de páginas concluídas mais o tamanho do markdown parcial
+    naquele ponto (`md_offset`). Ao retomar, o parcial é truncado nesse tamanho
+    e o processamento continua na página seguinte.
+    """
+    
+    FILENAME = "job_manifest.json"
+    
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_COMPLETED = "completed"
+    
+    def __init__(self, path: Path, data: dict):
+        """
+        Inicializa o manifesto a partir de dados já carregados.
+        
+        Args:
+            path: Caminho do arquivo JSON do manifesto
+            data: Conteúdo do manifesto
+        """
+        self.path = Path(path)
+        self.data = data
+    
+    @classmethod
+    def create(cls, output_dir: Path, files: list[Path], settings: Optional[dict] = None) -> "JobManifest":
+        """
+        Cria e salva o manifesto de um novo lote.
+        
+        Args:
+            output_dir: Pasta de saída do lote (onde o manifesto é salvo)
+            files: Arquivos PDF do lote, na ordem de processamento
+            settings: Configurações usadas no lote (DPI, URL da API...)
+        
+        Returns:
+            Manifesto criado
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        now = datetime.now().isoformat(timespec="seconds")
+        
+        data = {
+            "version": 1,
+            "status": cls.STATUS_RUNNING,
+            "output_folder_name": output_dir.name,
+            "created_at": now,
+            "updated_at": now,
+            "settings": settings or {},
+            "files": [
+                {
+                    "path": str(Path(f).resolve()),
+                    "status": cls.STATUS_PENDING,
+                    "total_pages": 0,
+                    "completed_pages": 0,
+                    "md_offset": 0,
+                    "failed_pages": [],
+                    "error": None
+                }
+                for f in files
+            ]
+        }
+        manifest = cls(output_dir / cls.FILENAME, data)
+        manifest.save()
+        return manifest
+    
+    @classmethod
+    def load(cls, output_dir: Path) -> Optional["JobManifest"]:
+        """
+        Carrega o manifesto de uma pasta de saída.
+        
+        Args:
+            output_dir: Pasta de saída do lote
+        
+        Returns:
+            Manifesto ou None se não existir/estiver ilegível
+        """
+        path = Path(output_dir) / cls.FILENAME
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return cls(path, data)
+    
+    @classmethod
+    def find_resumable(cls, folder_path: str) -> Optional["JobManifest"]:
+        """
+        Procura o lote inacabado mais recente de uma pasta de PDFs.
+        
+        Args:
+            folder_path: Pasta com os PDFs de origem
+        
+        Returns:
+            Manifesto do lote mais recente que não foi concluído, ou None
+        """
+        folder = Path(folder_path)
+        if not folder.is_dir():
+            return None
+        
+        candidates = sorted(
+            (d for d in folder.glob(f"{config.output_folder_name}_*") if d.is_dir()),
+            key=lambda d: d.name,
+            reverse=True
+        )
+        for output_dir in candidates:
+            manifest = cls.load(output_dir)
+            if manifest and not manifest.is_completed:
+                return manifest
+        return None
+    
+    @property
+    def output_dir(self) -> Path:
+        """Pasta de saída do lote."""
+        return self.path.parent
+    
+    @property
+    def source_root(self) -> Optional[Path]:
+        """Pasta de origem do lote (as subpastas são espelhadas na saída)."""
+        root = self.data.get("settings", {}).get("source_root")
+        return Path(root) if root else None
+    
+    @property
+    def files(self) -> list[dict]:
+        """Entradas de arquivo do manifesto."""
+        return self.data["files"]
+    
+    @property
+    def is_completed(self) -> bool:
+        """Indica se o lote inteiro foi concluído."""
+        return self.data.get("status") == self.STATUS_COMPLETED
+    
+    def file_paths(self) -> list[Path]:
+        """Retorna os caminhos dos PDFs do lote."""
+        return [Path(entry["path"]) for entry in self.files]
+    
+    def completed_page_count(self) -> int:
+        """Total de páginas já concluídas no lote."""
+        return sum(entry["completed_pages"] for entry in self.files)
+    
+    def next_position(self) -> tuple[int, int]:
+        """
+        Retorna onde o lote deve continuar.
+        
+        Returns:
+            Tupla (índice do arquivo, página 1-based)
+        """
+        for file_idx, entry in enumerate(self.files):
+            if entry["status"] != self.STATUS_DONE:
+                return file_idx, entry["completed_pages"] + 1
+        return len(self.files), 1
+    
+    def record_file_start(self, file_idx: int, total_pages: int) -> None:
+        """Marca o início (ou a retomada) de um arquivo."""
+        entry = self.files[file_idx]
+        entry["status"] = self.STATUS_RUNNING
+        entry["total_pages"] = total_pages
+        entry["error"] = None
+        self.save()
+    
+    def record_page(self, file_idx: int, page_num: int, md_offset: int, failed: Optional[str] = None) -> None:
+        """
+        Registra uma página concluída (já gravada no markdown parcial).
+        
+        Args:
+            file_idx: Índice do arquivo no lote
+            page_num: Página concluída (1-based)
+            md_offset: Tamanho do markdown parcial após a página
+            failed: Motivo de a página ter ficado sem texto (ex: "repetition"), se for o caso
+        """
+        entry = self.files[file_idx]
+        entry["completed_pages"] = page_num
+        entry["md_offset"] = md_offset
+        # Manifestos de versões anteriores não têm a lista; uma página refeita
+        # na retomada substitui o registro anterior (ou o remove, se deu certo)
+        failed_pages = [item for item in entry.get("failed_pages", []) if item["page"] != page_num]
+        if failed:
+            failed_pages.append({"page": page_num, "reason": failed})
+        entry["failed_pages"] = failed_pages
+        self.save()
+    
+    def record_file_done(self, file_idx: int) -> None:
+        """Marca um arquivo como concluído."""
+        self.files[file_idx]["status"] = self.STATUS_DONE
+        self.save()
+    
+    def record_error(self, file_idx: int, error: str) -> None:
+        """Registra a falha de um arquivo, mantendo o progresso para retomada."""
+        entry = self.files[file_idx]
+        entry["status"] = self.STATUS_FAILED
+        entry["error"] = error
+        self.save()
+    
+    def mark_completed(self) -> None:
+        """Marca o lote inteiro como concluído."""
+        self.data["status"] = self.STATUS_COMPLETED
+        self.save()
+    
+    def save(self) -> None:
+        """Grava o manifesto de forma atômica (arquivo temporário + rename)."""
+        self.data["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,258 @@
+"""Execução dos jobs do serviço HTTP: submissão (pastas ou uploads) e pool de threads de conversão."""
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from config import config
+from document_processor import DocumentProcessor
+from file_utils import mirrored_output_directories
+from folder_scanner import scan_pdf_files
+from job_store import JobStore
+from metrics import MetricsRecorder
+from page_analysis import DuplicateIndex
+from service_registry import ServiceRegistry
+
+
+class JobCancelled(Exception):
+    """O job foi cancelado durante a conversão de um arquivo."""
+
+
+class JobService:
+    """
+    Converte os arquivos dos jobs em um pool compartilhado de threads.
+    
+    Cada thread retira um arquivo da fila persistente (JobStore) e o converte
+    com `convert_document`; cada página concluída é registrada no banco e fica
+    disponível para consulta e streaming. Arquivos de jobs diferentes são
+    processados ao mesmo tempo, até `workers` arquivos, cada um com até
+    `max_concurrent_requests` páginas no servidor de OCR.
+    """
+    
+    UPLOADS_FOLDER = "uploads"
+    OUTPUTS_FOLDER = "outputs"
+    
+    def __init__(
+        self,
+        store: JobStore,
+        data_dir: Path,
+        workers: Optional[int] = None,
+        processor_factory: Optional[Callable[[dict], DocumentProcessor]] = None
+    ):
+        """
+        Args:
+            store: Banco de jobs
+            data_dir: Pasta dos uploads e das saídas dos jobs
+            workers: Arquivos convertidos ao mesmo tempo (padrão: config.service_workers)
+            processor_factory: Cria (ou reutiliza) o processador para as opções
+                de um job (padrão: ServiceRegistry.get_processor com o DPI do job)
+        """
+        self.store = store
+        self.data_dir = Path(data_dir)
+        self.workers = max(1, workers or config.service_workers)
+        self.processor_factory = processor_factory or (
+            lambda settings: ServiceRegistry.get_processor(dpi=settings.get("dpi"))
+        )
+        self._work = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        # Páginas repetidas de cada job em andamento (compartilhadas entre os seus arquivos)
+        self._duplicates: dict[str, DuplicateIndex] = {}
+        self._duplicates_lock = threading.Lock()
+    
+    def submit_paths(
+        self,
+        paths: Iterable[str],
+        recursive: bool = False,
+        include: Optional[Iterable[str]] = None,
+        exclude: Optional[Iterable[str]] = None,
+        settings: Optional[dict] = None
+    ) -> str:
+        """
+        Cria um job com PDFs e pastas do sistema de arquivos do servidor.
+        
+        Pastas são varridas como no `cli.py run`; com mais de uma origem, a
+        saída espelha as subpastas a partir da pasta comum a todas.
+        
+        Args:
+            paths: Arquivos PDF e/ou pastas
+            recursive: Inclui as subpastas das pastas informadas
+            include: Padrões dos arquivos aceitos
+            exclude: Padrões ignorados
+            settings: Opções do job (ex: {"dpi": 150})
+        
+        Returns:
+            Identificador do job
+        
+        Raises:
+            PermissionError: Nenhuma pasta permitida configurada, ou caminho fora delas
+            ValueError: Caminho inexistente ou sem PDFs
+        """
+        if not config.service_allowed_roots:
+            raise PermissionError("Envio por caminho desativado: configure service_allowed_roots (--allowed-root)")
+        
+        files: list[Path] = []
+        roots: list[Path] = []
+        for raw_path in paths:
+            path = Path(raw_path).expanduser().resolve()
+            if not self._is_allowed(path):
+                raise PermissionError(f"Caminho fora das pastas permitidas: {raw_path}")
+            if path.is_dir():
+                files.extend(scan_pdf_files(path, recursive, include, exclude))
+                roots.append(path)
+            elif path.is_file() and path.suffix.lower() == ".pdf":
+                files.append(path)
+                roots.append(path.parent)
+            else:
+                raise ValueError(f"PDF ou pasta não encontrado: {raw_path}")
+        
+        files = list(dict.fromkeys(files))
+        if not files:
+            raise ValueError("Nenhum PDF encontrado")
+        
+        source_root = Path(os.path.commonpath([str(root) for root in roots]))
+        return self._create(files, settings, source_root)
+    
+    def submit_upload(self, filename: str, data: bytes, settings: Optional[dict] = None) -> str:
+        """
+        Cria um job com um PDF enviado na requisição.
+        
+        Args:
+            filename: Nome original do arquivo
+            data: Conteúdo do PDF
+            settings: Opções do job (ex: {"dpi": 150})
+        
+        Returns:
+            Identificador do job
+        
+        Raises:
+            ValueError: O conteúdo não é um PDF
+        """
+        if not data.startswith(b"%PDF"):
+            raise ValueError("O conteúdo enviado não é um PDF")
+        
+        job_id = uuid.uuid4().hex[:12]
+        name = DocumentProcessor.sanitize_filename(Path(filename or "documento.pdf").name) or "documento.pdf"
+        if not name.lower().endswith(".pdf"):
+            name += ".pdf"
+        upload_dir = self.data_dir / self.UPLOADS_FOLDER / job_id
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        pdf_path = upload_dir / name
+        pdf_path.write_bytes(data)
+        return self._create([pdf_path], settings, upload_dir, job_id)
+    
+    def _create(
+        self,
+        files: list[Path],
+        settings: Optional[dict],
+        source_root: Path,
+        job_id: Optional[str] = None
+    ) -> str:
+        job_id = job_id or uuid.uuid4().hex[:12]
+        output_dir = self.data_dir / self.OUTPUTS_FOLDER / job_id
+        self.store.create_job(files, output_dir, settings, source_root, job_id)
+        with self._work:
+            self._work.notify_all()
+        return job_id
+    
+    @staticmethod
+    def _is_allowed(path: Path) -> bool:
+        """Indica se o caminho está dentro de uma das `service_allowed_roots`."""
+        for root in config.service_allowed_roots:
+            try:
+                path.relative_to(Path(root).expanduser().resolve())
+                return True
+            except ValueError:
+                continue
+        return False
+    
+    def cancel(self, job_id: str) -> bool:
+        """Cancela um job (ver JobStore.cancel)."""
+        return self.store.cancel(job_id)
+    
+    def start(self) -> None:
+        """Inicia as threads de conversão."""
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def stop(self) -> None:
+        """Para de retirar arquivos da fila e espera os que estão em processamento."""
+        self._stop.set()
+        with self._work:
+            self._work.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+    
+    def _worker(self) -> None:
+        """Consome a fila de arquivos até o serviço ser parado."""
+        while not self._stop.is_set():
+            claim = self.store.claim_file()
+            if claim is None:
+                with self._work:
+                    self._work.wait(timeout=1.0)
+                continue
+            
+            try:
+                markdown_path = self._process(claim)
+            except Exception as e:
+                error = "Cancelado" if isinstance(e, JobCancelled) else str(e)
+                self.store.finish_file(claim["job_id"], claim["file_idx"], error=error)
+            else:
+                self.store.finish_file(claim["job_id"], claim["file_idx"], markdown_path)
+            self._release_duplicates(claim["job_id"])
+    
+    def _job_duplicates(self, job_id: str) -> Optional[DuplicateIndex]:
+        """Índice de páginas repetidas do job (None se a detecção está desativada)."""
+        with self._duplicates_lock:
+            if job_id not in self._duplicates:
+                index = DocumentProcessor.new_duplicate_index()
+                if index is None:
+                    return None
+                self._duplicates[job_id] = index
+            return self._duplicates[job_id]
+    
+    def _release_duplicates(self, job_id: str) -> None:
+        """Descarta o índice de páginas repetidas quando o job termina."""
+        job = self.store.get_job(job_id)
+        if job is not None and job["status"] not in JobStore.FINAL_STATUSES:
+            return
+        with self._duplicates_lock:
+            index = self._duplicates.pop(job_id, None)
+        if index is not None:
+            index.clear()
+    
+    def _process(self, claim: dict) -> Path:
+        """Converte um arquivo de um job, registrando cada página concluída."""
+        job_id, file_idx = claim["job_id"], claim["file_idx"]
+        pdf_path = Path(claim["path"])
+        output_dir = Path(claim["output_dir"])
+        processor = self.processor_factory(claim["settings"])
+        
+        markdown_dir, images_dir = mirrored_output_directories(
+            pdf_path,
+            Path(claim["source_root"]) if claim["source_root"] else None,
+            output_dir,
+            config.images_folder_name
+        )
+        self.store.record_file_start(job_id, file_idx, processor.get_pdf_page_count(pdf_path))
+        
+        def on_page_complete(page_num: int, page_image, page_text: str) -> None:
+            if self.store.is_cancelled(job_id):
+                raise JobCancelled(job_id)
+            self.store.record_page(job_id, file_idx, page_num, page_text)
+        
+        return processor.convert_document(
+            pdf_path,
+            markdown_dir / f"{pdf_path.stem}.md",
+            images_dir,
+            on_page_complete=on_page_complete,
+            metrics_recorder=MetricsRecorder(output_dir / MetricsRecorder.FILENAME),
+            duplicates=self._job_duplicates(job_id)
+        )
@@ -0,0 +1,388 @@
+"""Armazenamento persistente (SQLite) dos jobs do serviço HTTP: arquivos, progresso e páginas concluídas."""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+
+class JobStore:
+    """
+    Jobs de conversão, seus arquivos e o texto de cada página concluída.
+    
+    Cada arquivo de um job é uma unidade de trabalho independente, retirada
+    da fila por `claim_file` (jobs mais antigos primeiro). Arquivos que
+    estavam em processamento quando o serviço parou voltam para a fila ao
+    reabrir o banco. As páginas recebem um número de sequência crescente,
+    usado pelos clientes para acompanhar os resultados sem repetições: a
+    sequência de uma página nunca muda, nem quando o arquivo é convertido
+    de novo após um reinício.
+    """
+    
+    FILENAME = "jobs.sqlite3"
+    
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CANCELLED = "cancelled"
+    
+    FINAL_STATUSES = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+    
+    def __init__(self, db_path: Path):
+        """
+        Abre (ou cria) o banco de jobs.
+        
+        Args:
+            db_path: Caminho do arquivo SQLite
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._version = 0
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " output_dir TEXT NOT NULL,"
+            " source_root TEXT,"
+            " settings TEXT NOT NULL,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS job_files ("
+            " job_id TEXT NOT NULL,"
+            " file_idx INTEGER NOT NULL,"
+            " path TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " total_pages INTEGER NOT NULL DEFAULT 0,"
+            " completed_pages INTEGER NOT NULL DEFAULT 0,"
+            " markdown_path TEXT,"
+            " error TEXT,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (job_id, file_idx));"
+            "CREATE INDEX IF NOT EXISTS idx_files_status ON job_files(status);"
+            "CREATE TABLE IF NOT EXISTS job_pages ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " job_id TEXT NOT NULL,"
+            " file_idx INTEGER NOT NULL,"
+            " page INTEGER NOT NULL,"
+            " text TEXT NOT NULL,"
+            " finished_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_pages_job ON job_pages(job_id, seq);"
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_pages_page ON job_pages(job_id, file_idx, page);"
+        )
+        # Processamentos interrompidos recomeçam do início do arquivo; as páginas já
+        # entregues ficam (e mantêm a sequência) para os clientes não as receberem de novo
+        self._conn.execute(
+            "UPDATE job_files SET status = ? WHERE status = ?",
+            (self.STATUS_PENDING, self.STATUS_RUNNING)
+        )
+        self._conn.commit()
+    
+    def _commit(self) -> None:
+        """Confirma a transação e acorda quem espera por mudanças (chamar com o lock)."""
+        self._conn.commit()
+        self._version += 1
+        self._changed.notify_all()
+    
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        """
+        Espera até o banco mudar depois de `version` (ou o tempo acabar).
+        
+        Args:
+            version: Versão conhecida pelo chamador (0 = qualquer mudança)
+            timeout: Espera máxima em segundos
+        
+        Returns:
+            Versão atual
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._version != version, timeout)
+            return self._version
+    
+    @property
+    def version(self) -> int:
+        """Contador de mudanças (para `wait_for_change`)."""
+        with self._lock:
+            return self._version
+    
+    def create_job(
+        self,
+        files: list[Path],
+        output_dir: Path,
+        settings: Optional[dict] = None,
+        source_root: Optional[Path] = None,
+        job_id: Optional[str] = None
+    ) -> str:
+        """
+        Registra um novo job com seus arquivos pendentes.
+        
+        Args:
+            files: PDFs do job, na ordem de processamento
+            output_dir: Pasta de saída do job
+            settings: Opções do job (ex: DPI)
+            source_root: Pasta de origem (as subpastas são espelhadas na saída)
+            job_id: Identificador (padrão: gerado)
+        
+        Returns:
+            Identificador do job
+        """
+        job_id = job_id or uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, output_dir, source_root, settings, error, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, NULL, ?, ?)",
+                (
+                    job_id,
+                    self.STATUS_PENDING,
+                    str(output_dir),
+                    str(source_root) if source_root else None,
+                    json.dumps(settings or {}),
+                    now,
+                    now
+                )
+            )
+            self._conn.executemany(
+                "INSERT INTO job_files (job_id, file_idx, path, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, idx, str(path), self.STATUS_PENDING, now) for idx, path in enumerate(files)]
+            )
+            self._commit()
+        return job_id
+    
+    def claim_file(self) -> Optional[dict]:
+        """
+        Retira da fila o próximo arquivo (do job mais antigo) e o marca como em processamento.
+        
+        Returns:
+            Dicionário com job_id, file_idx, path, output_dir, source_root e
+            settings, ou None se não houver arquivos pendentes
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT f.job_id, f.file_idx, f.path, j.output_dir, j.source_root, j.settings"
+                " FROM job_files f JOIN jobs j ON j.id = f.job_id"
+                " WHERE f.status = ? AND j.status IN (?, ?)"
+                " ORDER BY j.created_at, f.file_idx LIMIT 1",
+                (self.STATUS_PENDING, self.STATUS_PENDING, self.STATUS_RUNNING)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            now = time.time()
+            self._conn.execute(
+                "UPDATE job_files SET status = ?, updated_at = ? WHERE job_id = ? AND file_idx = ?",
+                (self.STATUS_RUNNING, now, row["job_id"], row["file_idx"])
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                (self.STATUS_RUNNING, now, row["job_id"])
+            )
+            self._commit()
+        
+        claim = dict(row)
+        claim["settings"] = json.loads(claim["settings"])
+        return claim
+    
+    def record_file_start(self, job_id: str, file_idx: int, total_pages: int) -> None:
+        """Registra o número de páginas de um arquivo ao iniciar sua conversão."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE job_files SET total_pages = ?, updated_at = ? WHERE job_id = ? AND file_idx = ?",
+                (total_pages, time.time(), job_id, file_idx)
+            )
+            self._commit()
+    
+    def record_page(self, job_id: str, file_idx: int, page: int, text: str) -> None:
+        """
+        Registra uma página concluída.
+        
+        Uma página já registrada (arquivo convertido de novo após um reinício)
+        tem o texto atualizado e mantém a sequência.
+        
+        Args:
+            job_id: Identificador do job
+            file_idx: Índice do arquivo no job
+            page: Número da página (1-based)
+            text: Markdown da página
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO job_pages (job_id, file_idx, page, text, finished_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (job_id, file_idx, page) DO UPDATE SET text = excluded.text, finished_at = excluded.finished_at",
+                (job_id, file_idx, page, text, now)
+            )
+            self._conn.execute(
+                "UPDATE job_files SET completed_pages ="
+                " (SELECT COUNT(*) FROM job_pages WHERE job_id = ? AND file_idx = ?), updated_at = ?"
+                " WHERE job_id = ? AND file_idx = ?",
+                (job_id, file_idx, now, job_id, file_idx)
+            )
+            self._commit()
+    
+    def finish_file(
+        self,
+        job_id: str,
+        file_idx: int,
+        markdown_path: Optional[Path] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        Encerra um arquivo e, se era o último do job, o próprio job.
+        
+        O job termina como "done" se todos os arquivos foram convertidos e como
+        "failed" se algum falhou (os demais continuam disponíveis).
+        
+        Args:
+            job_id: Identificador do job
+            file_idx: Índice do arquivo no job
+            markdown_path: Markdown publicado (sucesso)
+            error: Mensagem de erro (falha)
+        """
+        now = time.time()
+        with self._lock:
+            job_status = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job_status is not None and job_status["status"] == self.STATUS_CANCELLED:
+                status = self.STATUS_CANCELLED
+            else:
+                status = self.STATUS_FAILED if error else self.STATUS_DONE
+            self._conn.execute(
+                "UPDATE job_files SET status = ?, markdown_path = ?, error = ?, updated_at = ?"
+                " WHERE job_id = ? AND file_idx = ?",
+                (status, str(markdown_path) if markdown_path else None, error, now, job_id, file_idx)
+            )
+            
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM job_files WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+            unfinished = counts.get(self.STATUS_PENDING, 0) + counts.get(self.STATUS_RUNNING, 0)
+            if unfinished == 0 and job_status is not None and job_status["status"] != self.STATUS_CANCELLED:
+                failed = counts.get(self.STATUS_FAILED, 0)
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                    (
+                        self.STATUS_FAILED if failed else self.STATUS_DONE,
+                        f"{failed} arquivo(s) com falha" if failed else None,
+                        now,
+                        job_id
+                    )
+                )
+            self._commit()
+    
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancela um job: os arquivos pendentes saem da fila e os em andamento
+        são interrompidos na próxima página (ver `is_cancelled`).
+        
+        Args:
+            job_id: Identificador do job
+        
+        Returns:
+            True se o job existia e ainda não tinha terminado
+        """
+        now = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                (self.STATUS_CANCELLED, now, job_id, self.STATUS_PENDING, self.STATUS_RUNNING)
+            ).rowcount
+            if updated:
+                self._conn.execute(
+                    "UPDATE job_files SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                    (self.STATUS_CANCELLED, now, job_id, self.STATUS_PENDING)
+                )
+            self._commit()
+        return bool(updated)
+    
+    def is_cancelled(self, job_id: str) -> bool:
+        """Indica se o job foi cancelado."""
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is not None and row["status"] == self.STATUS_CANCELLED
+    
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """
+        Estado de um job e de seus arquivos.
+        
+        Args:
+            job_id: Identificador do job
+        
+        Returns:
+            Dicionário do job com a lista "files", ou None se não existir
+        """
+        with self._lock:
+            job = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            files = self._conn.execute(
+                "SELECT file_idx, path, status, total_pages, completed_pages, markdown_path, error"
+                " FROM job_files WHERE job_id = ? ORDER BY file_idx",
+                (job_id,)
+            ).fetchall()
+        
+        data = dict(job)
+        data["settings"] = json.loads(data["settings"])
+        data["files"] = [dict(row) for row in files]
+        return data
+    
+    def list_jobs(self, limit: int = 100) -> list[dict]:
+        """
+        Jobs mais recentes, com o progresso resumido.
+        
+        Args:
+            limit: Número máximo de jobs
+        
+        Returns:
+            Lista de dicionários (id, status, criação, arquivos e páginas concluídas)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT j.id, j.status, j.error, j.created_at, j.updated_at,"
+                " COUNT(f.file_idx) AS files,"
+                " SUM(f.status = 'done') AS files_done,"
+                " SUM(f.completed_pages) AS completed_pages,"
+                " SUM(f.total_pages) AS total_pages"
+                " FROM jobs j LEFT JOIN job_files f ON f.job_id = j.id"
+                " GROUP BY j.id ORDER BY j.created_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def pages(self, job_id: str, after: int = 0, limit: int = 100) -> list[dict]:
+        """
+        Páginas concluídas de um job, na ordem em que terminaram.
+        
+        Args:
+            job_id: Identificador do job
+            after: Sequência da última página já recebida pelo cliente
+            limit: Número máximo de páginas
+        
+        Returns:
+            Lista de dicionários (seq, file_idx, page, text, finished_at)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, file_idx, page, text, finished_at FROM job_pages"
+                " WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (job_id, after, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def counts(self) -> dict[str, int]:
+        """Número de jobs em cada estado."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+    
+    def close(self) -> None:
+        """Fecha a conexão com o banco."""
+        with self._lock:
+            self._conn.close()
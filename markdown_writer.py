@@ -0,0 +1,98 @@
+"""Escrita incremental (append-only) do markdown de saída."""
+import os
+from pathlib import Path
+from typing import Optional
+
+
+class MarkdownWriter:
+    """
+    Escreve o markdown de um documento página a página.
+    
+    As páginas são acrescentadas a um arquivo parcial (`<nome>.md.part`) com
+    flush + fsync após cada página; ao final, `finalize` renomeia o parcial para
+    o nome definitivo de forma atômica. Assim o `.md` final nunca fica pela
+    metade, e um processo interrompido deixa apenas páginas completas no parcial.
+    """
+    
+    PARTIAL_SUFFIX = ".part"
+    PAGE_FOOTER = "\n\n---\n\n"
+    
+    def __init__(self, output_path: Path, resume: bool = False, resume_offset: Optional[int] = None):
+        """
+        Abre o arquivo parcial para escrita.
+        
+        Args:
+            output_path: Caminho final do markdown
+            resume: Se True, continua o parcial existente; se False, começa do zero
+            resume_offset: Ao retomar, descarta o que houver no parcial após este byte
+                (ex: página gravada depois do último checkpoint)
+        """
+        self.output_path = Path(output_path)
+        self.partial_path = self.partial_path_for(self.output_path)
+        self._file = open(self.partial_path, "ab" if resume else "wb")
+        
+        if resume and resume_offset is not None and self._file.tell() > resume_offset:
+            self._file.truncate(resume_offset)
+            self._file.seek(0, os.SEEK_END)
+    
+    @classmethod
+    def partial_path_for(cls, output_path: Path) -> Path:
+        """Retorna o caminho do arquivo parcial correspondente a um markdown."""
+        return output_path.with_name(output_path.name + cls.PARTIAL_SUFFIX)
+    
+    @staticmethod
+    def page_header(page_num: int) -> str:
+        """Retorna o cabeçalho markdown de uma página."""
+        return f"## Página {page_num}\n\n"
+    
+    @classmethod
+    def format_page(cls, page_num: int, text: str) -> str:
+        """Formata o bloco markdown de uma página."""
+        return f"{cls.page_header(page_num)}{text}{cls.PAGE_FOOTER}"
+    
+    def write_page(self, page_num: int, text: str) -> tuple[int, int]:
+        """
+        Acrescenta uma página ao markdown e garante que ela chegou ao disco.
+        
+        Args:
+            page_num: Número da página
+            text: Texto da página
+            
+        Returns:
+            Tupla (offset, tamanho) em bytes do texto da página dentro do arquivo
+        """
+        header = self.page_header(page_num).encode("utf-8")
+        body = text.encode("utf-8")
+        text_offset = self._file.tell() + len(header)
+        
+        self._file.write(header + body + self.PAGE_FOOTER.encode("utf-8"))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return text_offset, len(body)
+    
+    def tell(self) -> int:
+        """Retorna o tamanho atual (em bytes) do markdown escrito."""
+        return self._file.tell()
+    
+    def close(self) -> None:
+        """Fecha o arquivo parcial sem publicá-lo."""
+        if not self._file.closed:
+            self._file.close()
+    
+    def finalize(self) -> Path:
+        """
+        Fecha o parcial e o publica com o nome definitivo (rename atômico).
+        
+        Returns:
+            Caminho do markdown final
+        """
+        self.close()
+        os.replace(self.partial_path, self.output_path)
+        return self.output_path
+    
+    def __enter__(self) -> "MarkdownWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> Optional[bool]:
+        self.close()
+        return None
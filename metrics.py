@@ -0,0 +1,235 @@
+"""Instrumentação por página e por etapa, com exportação em JSONL."""
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+# Etapas medidas em cada página, na ordem do pipeline
+STAGES = ("render", "analyze", "encode", "ttft", "stream", "ocr", "save", "write")
+
+
+@dataclass
+class PageMetrics:
+    """Tempos e contadores de uma página."""
+    
+    file: str = ""
+    page: int = 0
+    stages: dict[str, float] = field(default_factory=dict)
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    attempts: int = 0
+    cache_hit: bool = False
+    skipped: Optional[str] = None      # Motivo de a página dispensar o modelo (ex: "text_layer")
+    degenerate: Optional[str] = None   # Motivo da última geração abortada (ex: "repetition")
+    failed: Optional[str] = None       # Página sem texto: geração degenerada após as novas tentativas
+    dpi: Optional[int] = None          # DPI da imagem que gerou o texto
+    escalated: Optional[str] = None    # Motivo de refazer a página no DPI completo (DPI adaptativo)
+    image_bytes: int = 0               # Bytes de imagem codificados para o modelo
+    endpoint: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    
+    def add(self, stage: str, seconds: float) -> None:
+        """Acumula a duração de uma etapa (várias tentativas somam)."""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Mede a duração do bloco como a etapa `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+    
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Velocidade de geração (tokens de saída por segundo de streaming)."""
+        stream_time = self.stages.get("stream")
+        if not self.completion_tokens or not stream_time:
+            return None
+        return self.completion_tokens / stream_time
+    
+    def to_dict(self) -> dict:
+        """Serializa as métricas para uma linha JSONL."""
+        data = asdict(self)
+        data["stages"] = {k: round(v, 4) for k, v in self.stages.items()}
+        data["tokens_per_second"] = self.tokens_per_second
+        return data
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Percentil pelo método do posto mais próximo (lista não vazia)."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class MetricsRecorder:
+    """Grava as métricas de cada página em um arquivo JSONL ao lado da saída."""
+    
+    FILENAME = "metrics.jsonl"
+    
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Caminho do arquivo JSONL (acrescentado, nunca sobrescrito)
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+    
+    def record(self, metrics: PageMetrics) -> None:
+        """Finaliza e grava as métricas de uma página."""
+        if metrics.finished_at is None:
+            metrics.finished_at = time.time()
+        line = json.dumps(metrics.to_dict(), ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    
+    @staticmethod
+    def load(path: Path) -> list[dict]:
+        """Lê todas as métricas de um arquivo JSONL (linhas inválidas são ignoradas)."""
+        records = []
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return records
+    
+    @staticmethod
+    def summarize(records: list[dict]) -> dict:
+        """
+        Agrega as métricas de várias páginas.
+        
+        Args:
+            records: Métricas carregadas com `load`
+        
+        Returns:
+            Dicionário com total de páginas, páginas/min, p50/p95 por etapa,
+            tokens/s médio, acertos de cache, páginas que dispensaram o modelo,
+            gerações abortadas e páginas refeitas no DPI completo (por motivo)
+        """
+        if not records:
+            return {"pages": 0}
+        
+        started = min(r["started_at"] for r in records)
+        finished = max(r.get("finished_at") or r["started_at"] for r in records)
+        elapsed = max(finished - started, 1e-6)
+        
+        stages = {}
+        for stage in STAGES:
+            values = [r["stages"][stage] for r in records if stage in r.get("stages", {})]
+            if values:
+                stages[stage] = {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+        
+        rates = [r["tokens_per_second"] for r in records if r.get("tokens_per_second")]
+        skipped: dict[str, int] = {}
+        degenerate: dict[str, int] = {}
+        escalated: dict[str, int] = {}
+        failed: dict[str, int] = {}
+        for r in records:
+            if r.get("skipped"):
+                skipped[r["skipped"]] = skipped.get(r["skipped"], 0) + 1
+            if r.get("degenerate"):
+                degenerate[r["degenerate"]] = degenerate.get(r["degenerate"], 0) + 1
+            if r.get("escalated"):
+                escalated[r["escalated"]] = escalated.get(r["escalated"], 0) + 1
+            if r.get("failed"):
+                failed[r["failed"]] = failed.get(r["failed"], 0) + 1
+        return {
+            "pages": len(records),
+            "elapsed": elapsed,
+            "pages_per_minute": len(records) / elapsed * 60,
+            "stages": stages,
+            "tokens_per_second": sum(rates) / len(rates) if rates else None,
+            "completion_tokens": sum(r.get("completion_tokens") or 0 for r in records),
+            "cache_hits": sum(1 for r in records if r.get("cache_hit")),
+            "image_bytes": sum(r.get("image_bytes") or 0 for r in records),
+            "skipped": skipped,
+            "degenerate": degenerate,
+            "escalated": escalated,
+            "failed": failed
+        }
+
+
+class MetricsSummaryCache:
+    """
+    Resumos de arquivos de métricas atualizados só com as linhas novas.
+    
+    Telas que mostram o resumo a cada atualização (reruns do dashboard,
+    consultas à API) releriam e analisariam o arquivo inteiro a cada vez,
+    O(páginas²) ao longo de um lote. Aqui os registros já lidos ficam em
+    memória: cada consulta lê só o que foi acrescentado ao arquivo e só
+    refaz o resumo quando o arquivo cresceu.
+    """
+    
+    def __init__(self, max_files: int = 16):
+        """
+        Args:
+            max_files: Arquivos mantidos em memória (os menos consultados saem primeiro)
+        """
+        self.max_files = max_files
+        # caminho → (bytes lidos, registros, resumo)
+        self._files: OrderedDict[str, tuple[int, list[dict], dict]] = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def summary(self, path: Path) -> dict:
+        """
+        Resumo (ver `MetricsRecorder.summarize`) do arquivo de métricas.
+        
+        Args:
+            path: Arquivo JSONL de métricas
+        
+        Returns:
+            Resumo de todas as páginas registradas até agora
+        """
+        key = str(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        
+        with self._lock:
+            offset, records, summary = self._files.pop(key, (0, [], None))
+            if size < offset:
+                # Arquivo recriado: lê do início
+                offset, records, summary = 0, [], None
+            if size > offset or summary is None:
+                offset = self._read_new(path, offset, records)
+                summary = MetricsRecorder.summarize(records)
+            
+            self._files[key] = (offset, records, summary)
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+            return summary
+    
+    @staticmethod
+    def _read_new(path: Path, offset: int, records: list[dict]) -> int:
+        """Acrescenta a `records` as linhas completas a partir de `offset`; retorna o novo offset."""
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Linha ainda sendo gravada: fica para a próxima leitura
+                    offset += len(line)
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return offset
@@ -0,0 +1,320 @@
+"""
+Servidor de OCR simulado, compatível com a API OpenAI (chat completions em streaming).
+
+Usado para medir o desempenho do pipeline sem GPU: a latência até o primeiro
+token, a velocidade de geração e a taxa de falhas são configuráveis.
+
+Também responde arquivos de batch (formato da API de batch da OpenAI) sem
+subir o servidor, para testar a exportação/importação de lotes offline.
+
+Uso:
+    python mock_ocr_server.py --port 8000 --ttft 0.5 --tokens-per-second 80
+    python mock_ocr_server.py --batch-input requests_0001.jsonl --batch-output results_0001.jsonl
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+
+# Texto usado para gerar as páginas simuladas (um "token" por palavra)
+LOREM_WORDS = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis "
+    "nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat."
+).split()
+
+
+@dataclass
+class MockServerSettings:
+    """Comportamento do servidor simulado."""
+    
+    ttft: float = 0.5                  # Segundos até o primeiro token
+    tokens_per_second: float = 80.0    # Velocidade de geração (0 = sem espera)
+    tokens_per_page: int = 400
+    failure_rate: float = 0.0          # Fração de requisições respondidas com 503
+    truncate_rate: float = 0.0         # Fração de streams encerrados sem finish_reason
+    loop_rate: float = 0.0             # Fração de gerações que entram em loop de repetição
+    loop_factor: int = 20              # Tamanho do loop (em páginas) se não houver max_tokens
+    seed: Optional[int] = None
+    model_name: str = "mock-ocr"
+
+
+class MockOCRServer:
+    """Servidor HTTP em thread própria que simula um servidor de OCR."""
+    
+    def __init__(self, settings: Optional[MockServerSettings] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            settings: Comportamento simulado (latência, velocidade, falhas)
+            host: Interface de escuta
+            port: Porta (0 escolhe uma livre)
+        """
+        self.settings = settings or MockServerSettings()
+        self._random = random.Random(self.settings.seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def base_url(self) -> str:
+        """URL base da API (para OCRService)."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+    
+    def start(self) -> "MockOCRServer":
+        """Inicia o servidor em segundo plano."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-ocr", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        """Encerra o servidor."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+    
+    def __enter__(self) -> "MockOCRServer":
+        return self.start()
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+    
+    def _draw(self) -> tuple[bool, bool, bool]:
+        """Sorteia se a próxima requisição falha, é truncada ou entra em loop."""
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.settings.failure_rate
+            truncate = not fail and self._random.random() < self.settings.truncate_rate
+            loop = not (fail or truncate) and self._random.random() < self.settings.loop_rate
+            if fail or truncate:
+                self.failures += 1
+            return fail, truncate, loop
+    
+    def _make_handler(self) -> type:
+        """Cria a classe de handler ligada a este servidor."""
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def log_message(self, format, *args) -> None:
+                pass
+            
+            def do_GET(self) -> None:
+                if not self.path.rstrip("/").endswith("/models"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                self._send_json(200, {
+                    "object": "list",
+                    "data": [{"id": server.settings.model_name, "object": "model", "owned_by": "mock"}]
+                })
+            
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                
+                fail, truncate, loop = server._draw()
+                if fail:
+                    self._send_json(503, {"error": {"message": "simulated overload"}})
+                    return
+                
+                if body.get("stream"):
+                    self._stream(truncate, loop, body.get("max_tokens"))
+                else:
+                    time.sleep(server.settings.ttft + server._generation_time())
+                    self._send_json(200, server._completion(server._page_text()))
+            
+            def _send_json(self, status: int, payload: dict) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def _event(self, payload: dict) -> None:
+                self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+            
+            def _stream(self, truncate: bool, loop: bool, max_tokens: Optional[int]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                
+                settings = server.settings
+                words = server._page_words()
+                if loop:
+                    # Metade da página e depois a mesma frase até o limite de tokens
+                    size = max_tokens or len(words) * settings.loop_factor
+                    words = words[:len(words) // 2]
+                    words += [LOREM_WORDS[len(words) % 3] for _ in range(size - len(words))]
+                finish_reason = "stop"
+                if max_tokens and len(words) > max_tokens:
+                    words, finish_reason = words[:max_tokens], "length"
+                delay = 1.0 / settings.tokens_per_second if settings.tokens_per_second else 0.0
+                cut = len(words) // 2 if truncate else len(words)
+                
+                time.sleep(settings.ttft)
+                try:
+                    for i, word in enumerate(words[:cut]):
+                        self._event(server._chunk({"content": word + " "}, None))
+                        if delay and i < cut - 1:
+                            time.sleep(delay)
+                    if truncate:
+                        return
+                    self._event(server._chunk({}, finish_reason))
+                    self._event(server._chunk(None, None, usage=len(words)))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    self.close_connection = True
+        
+        return Handler
+    
+    def _page_words(self) -> list[str]:
+        """Palavras de uma página simulada."""
+        # Sequência fixa, mas sem período: texto cíclico seria tomado por um loop pela proteção de gerações
+        count = self.settings.tokens_per_page
+        return random.Random(count).choices(LOREM_WORDS, k=count)
+    
+    def _page_text(self) -> str:
+        """Texto completo de uma página simulada."""
+        return " ".join(self._page_words())
+    
+    def _generation_time(self) -> float:
+        """Tempo de geração de uma página na velocidade configurada."""
+        if not self.settings.tokens_per_second:
+            return 0.0
+        return self.settings.tokens_per_page / self.settings.tokens_per_second
+    
+    def _chunk(self, delta: Optional[dict], finish_reason: Optional[str], usage: Optional[int] = None) -> dict:
+        """Monta um chunk de streaming no formato da API OpenAI."""
+        chunk = {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": self.settings.model_name,
+            "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        if usage is not None:
+            chunk["usage"] = {"prompt_tokens": 1000, "completion_tokens": usage, "total_tokens": 1000 + usage}
+        return chunk
+    
+    def _completion(self, text: str, finish_reason: str = "stop") -> dict:
+        """Monta uma resposta completa (sem streaming) no formato da API OpenAI."""
+        tokens = len(text.split())
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": self.settings.model_name,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": 1000, "completion_tokens": tokens, "total_tokens": 1000 + tokens}
+        }
+    
+    def complete_batch(self, input_path: Path, output_path: Path) -> int:
+        """
+        Responde um arquivo de requisições de batch, sem esperas nem HTTP.
+        
+        Falhas sorteadas viram linhas com `error`; loops repetem uma palavra até
+        o `max_tokens` da requisição (finish_reason "length").
+        
+        Args:
+            input_path: JSONL de requisições (custom_id, method, url, body)
+            output_path: JSONL de resultados a gravar
+        
+        Returns:
+            Número de requisições respondidas
+        """
+        count = 0
+        with open(input_path, encoding="utf-8") as src, open(output_path, "w", encoding="utf-8") as dst:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                fail, _, loop = self._draw()
+                record = {"id": f"batch_req_{count}", "custom_id": request["custom_id"], "response": None, "error": None}
+                
+                if fail:
+                    record["error"] = {"code": "server_error", "message": "simulated overload"}
+                else:
+                    words = self._page_words()
+                    finish_reason = "stop"
+                    if loop:
+                        size = request["body"].get("max_tokens") or len(words) * self.settings.loop_factor
+                        words = words[:len(words) // 2]
+                        words += [LOREM_WORDS[len(words) % 3] for _ in range(size - len(words))]
+                        finish_reason = "length"
+                    record["response"] = {
+                        "status_code": 200,
+                        "request_id": f"req_{count}",
+                        "body": self._completion(" ".join(words), finish_reason)
+                    }
+                dst.write(json.dumps(record) + "\n")
+                count += 1
+        return count
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Monta o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(description="Servidor de OCR simulado (API OpenAI).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--ttft", type=float, default=0.5, help="Segundos até o primeiro token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Velocidade de geração")
+    parser.add_argument("--tokens-per-page", type=int, default=400)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fração de respostas 503")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Fração de streams truncados")
+    parser.add_argument("--loop-rate", type=float, default=0.0, help="Fração de gerações em loop de repetição")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--batch-input", help="Responde este arquivo de batch em vez de subir o servidor")
+    parser.add_argument("--batch-output", help="Arquivo de resultados do batch (padrão: results_<entrada>)")
+    return parser
+
+
+def main() -> None:
+    """Executa o servidor simulado até Ctrl+C."""
+    args = build_parser().parse_args()
+    settings = MockServerSettings(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        tokens_per_page=args.tokens_per_page,
+        failure_rate=args.failure_rate,
+        truncate_rate=args.truncate_rate,
+        loop_rate=args.loop_rate,
+        seed=args.seed
+    )
+    if args.batch_input:
+        input_path = Path(args.batch_input)
+        output_path = Path(args.batch_output or input_path.with_name(f"results_{input_path.name}"))
+        count = MockOCRServer(settings, args.host, 0).complete_batch(input_path, output_path)
+        print(f"{count} requisições respondidas em {output_path}")
+        return
+    
+    server = MockOCRServer(settings, args.host, args.port).start()
+    print(f"Servidor simulado em {server.base_url} (Ctrl+C para encerrar)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
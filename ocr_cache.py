@@ -0,0 +1,140 @@
+"""Cache persistente de resultados de OCR endereçado pelo conteúdo da página."""
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from PIL import Image
+
+
+class OCRCache:
+    """
+    Cache em SQLite de textos de OCR, com despejo LRU por tamanho.
+    
+    A chave é o hash dos pixels da página renderizada combinado com tudo que
+    altera o resultado do modelo (nome do modelo, prompt, DPI etc.), então
+    reprocessar um corpus inalterado não chama a API novamente.
+    """
+    
+    def __init__(self, db_path: Path, max_size_bytes: int):
+        """
+        Abre (ou cria) o banco do cache.
+        
+        Args:
+            db_path: Caminho do arquivo SQLite
+            max_size_bytes: Tamanho máximo dos textos armazenados antes do despejo
+        """
+        self.db_path = Path(db_path)
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries(last_access)")
+        self._conn.commit()
+        
+        self._total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    
+    @staticmethod
+    def make_key(image: Image.Image, *parts: object) -> str:
+        """
+        Gera a chave de cache de uma página.
+        
+        Args:
+            image: Imagem renderizada da página
+            *parts: Parâmetros que influenciam o resultado (modelo, prompt, DPI...)
+        
+        Returns:
+            Hash SHA-256 em hexadecimal
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(repr(part).encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(f"{image.mode}:{image.width}x{image.height}".encode("ascii"))
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Busca um texto no cache, atualizando seu último acesso.
+        
+        Args:
+            key: Chave gerada por `make_key`
+        
+        Returns:
+            Texto armazenado ou None se ausente
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            
+            self.hits += 1
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+    
+    def put(self, key: str, text: str) -> None:
+        """
+        Armazena um texto e despeja as entradas menos usadas se o limite foi excedido.
+        
+        Args:
+            key: Chave gerada por `make_key`
+            text: Texto de OCR da página
+        """
+        size = len(text.encode("utf-8"))
+        
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, size, time.time())
+            )
+            self._total_size += size - (previous[0] if previous else 0)
+            self._evict()
+            self._conn.commit()
+    
+    def _evict(self) -> None:
+        """Remove as entradas mais antigas até o cache caber no limite."""
+        while self._total_size > self.max_size_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total_size = 0
+                return
+            
+            for key, size in rows:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total_size -= size
+                if self._total_size <= self.max_size_bytes:
+                    return
+    
+    def stats(self) -> dict:
+        """Retorna contadores de acertos/falhas e o uso atual do cache."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": entries,
+                "size_bytes": self._total_size
+            }
+    
+    def close(self) -> None:
+        """Fecha a conexão com o banco."""
+        with self._lock:
+            self._conn.close()
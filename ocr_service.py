@@ -1,12 +1,73 @@
 """Serviço de OCR usando OpenAI API."""
-import base64
-import io
-from typing import Iterator, Optional
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+import httpx
+import openai
 from PIL import Image
 from openai import OpenAI
 from openai.types.chat import ChatCompletionChunk
 
 from config import config
+from endpoint_pool import EndpointPool
+from generation_guard import DegenerateOutput, GenerationGuard, retry_options
+from image_preprocessor import EncodedImage, prepare_image
+from metrics import PageMetrics
+from text_stream import TextAccumulator, ThrottledTextCallback
+
+
+class OCRError(Exception):
+    """Falha no OCR de uma página após esgotar as tentativas."""
+
+
+class TruncatedStreamError(OCRError):
+    """O stream terminou sem `finish_reason` (conexão caiu no meio da resposta)."""
+
+
+class OCRTimeoutError(OCRError):
+    """A resposta excedeu o tempo total permitido para uma página."""
+
+
+class OCRCancelledError(OCRError):
+    """O OCR foi cancelado por quem o pediu (ex: o pipeline foi encerrado antes do fim)."""
+
+
+class DegenerateOutputError(OCRError):
+    """A geração foi abortada por sair dos trilhos (loop, texto longo demais ou travada)."""
+    
+    def __init__(self, verdict: DegenerateOutput, text: str):
+        super().__init__(f"Geração abortada ({verdict.reason}) após {len(text)} caracteres")
+        self.reason = verdict.reason
+        self.text = text
+        self.keep = verdict.keep
+
+
+# Falhas transitórias que justificam uma nova tentativa
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,   # inclui APITimeoutError (conexão/primeiro token)
+    openai.InternalServerError,  # 5xx (ex: 503 de servidor sobrecarregado)
+    openai.RateLimitError,
+    httpx.TransportError,        # conexão interrompida durante o stream
+    TruncatedStreamError,
+    OCRTimeoutError,
+)
+
+# Intervalo (s) em que a vigia do stream confere o pedido de cancelamento
+CANCEL_CHECK_INTERVAL = 0.1
+
+
+@dataclass
+class OCRResult:
+    """Resultado do OCR de uma página."""
+    
+    text: str
+    finish_reason: Optional[str]
+    attempts: int
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    degenerate: Optional[str] = None   # Motivo, se o texto foi truncado pela proteção contra loops
 
 
 class OCRService:
@@ -17,22 +78,25 @@ class OCRService:
         Inicializa o serviço de OCR.
         
         Args:
-            base_url: URL base da API (usa config se não especificado)
+            base_url: URL base da API (usa config se não especificado). Aceita várias
+                URLs separadas por vírgula, com peso opcional (ex: "http://a/v1*2, http://b/v1")
             api_key: Chave da API (usa config se não especificado)
         """
         self.base_url = base_url or config.default_api_url
         self.api_key = api_key or config.api_key
         
-        self.client = OpenAI(
-            base_url=self.base_url,
-            api_key=self.api_key,
-            timeout=config.api_timeout
-        )
+        # Um cliente (com pool de conexões keep-alive) por servidor de OCR
+        self.pool = EndpointPool(EndpointPool.parse_urls(self.base_url), self.api_key)
+        self.client: OpenAI = self.pool.endpoints[0].client
+    
+    def close(self) -> None:
+        """Fecha os clientes HTTP e suas conexões abertas."""
+        self.pool.close()
     
     @staticmethod
     def encode_image(image: Image.Image) -> str:
         """
-        Codifica uma imagem PIL em base64.
+        Codifica uma imagem PIL em base64 (já redimensionada e convertida).
         
         Args:
             image: Imagem PIL a ser codificada
@@ -40,14 +104,7 @@ class OCRService:
         Returns:
             String base64 da imagem
         """
-        buffered = io.BytesIO()
-        
-        # Converte para RGB se necessário
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        
-        image.save(buffered, format="JPEG", quality=config.image_quality)
-        return base64.b64encode(buffered.getvalue()).decode("utf-8")
+        return prepare_image(image).to_base64()
     
     def process_image(self, image: Image.Image, prompt: Optional[str] = None) -> Iterator[ChatCompletionChunk]:
         """
@@ -60,21 +117,307 @@ class OCRService:
         Returns:
             Iterator de chunks de resposta da API
         """
-        image_base64 = self.encode_image(image)
-        ocr_prompt = prompt or config.ocr_prompt
+        # Redimensiona para a resolução do modelo e codifica no formato mais compacto
+        return self.create_stream(prepare_image(image), prompt)
+    
+    @staticmethod
+    def build_messages(encoded: EncodedImage, prompt: Optional[str] = None) -> list[dict]:
+        """
+        Monta as mensagens da requisição de OCR de uma página.
+        
+        Args:
+            encoded: Imagem codificada por `prepare_image`
+            prompt: Prompt customizado (usa config se não especificado)
+            
+        Returns:
+            Lista de mensagens no formato da API de chat completions
+        """
+        return [{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt or config.ocr_prompt},
+                {
+                    "type": "image_url",
+                    "image_url": {"url": encoded.to_data_url()}
+                }
+            ],
+        }]
+    
+    def create_stream(
+        self,
+        encoded: EncodedImage,
+        prompt: Optional[str] = None,
+        client: Optional[OpenAI] = None,
+        options: Optional[dict] = None
+    ):
+        """
+        Envia uma imagem já codificada e abre o stream de resposta.
+        
+        Args:
+            encoded: Imagem codificada por `prepare_image`
+            prompt: Prompt customizado (usa config se não especificado)
+            client: Cliente do endpoint a usar (usa o menos carregado se não especificado)
+            options: Parâmetros extras da geração (ex: temperature, max_tokens)
+            
+        Returns:
+            Stream de chunks de resposta da API
+        """
+        client = client or self.pool.select().client
         
-        return self.client.chat.completions.create(
+        return client.chat.completions.create(
             model=config.model_name,
-            messages=[{
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": ocr_prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}
-                    }
-                ],
-            }],
+            messages=self.build_messages(encoded, prompt),
             stream=True,
-            stream_options={"include_usage": True}
+            stream_options={"include_usage": True},
+            **(options or {})
         )
+    
+    def ocr_image(
+        self,
+        image: Image.Image,
+        on_text: Optional[Callable[[str], None]] = None,
+        prompt: Optional[str] = None,
+        metrics: Optional[PageMetrics] = None,
+        max_chars: Optional[int] = None
+    ) -> OCRResult:
+        """
+        Executa o OCR de uma imagem com novas tentativas em falhas transitórias.
+        
+        Erros de conexão, 5xx/429, streams interrompidos (sem `finish_reason`) e
+        estouro do tempo total são repetidos com backoff exponencial e jitter.
+        Gerações degeneradas (loops de repetição, texto além de `max_chars` ou
+        taxa de tokens travada) são abortadas assim que detectadas e repetidas
+        até `guard_max_retries` vezes com temperatura e max_tokens ajustados.
+        A cada nova tentativa o texto recomeça do zero.
+        
+        Args:
+            image: Imagem PIL a ser processada
+            on_text: Callback com o texto acumulado da tentativa atual, chamado no
+                máximo `stream_updates_per_second` vezes por segundo
+            prompt: Prompt customizado (usa config se não especificado)
+            metrics: Métricas da página (codificação, primeiro token, streaming, tokens)
+            max_chars: Tamanho máximo esperado do texto (padrão: config.guard_max_chars)
+            
+        Returns:
+            Resultado com o texto completo da página
+            
+        Raises:
+            OCRError: Se todas as tentativas falharem por erros transitórios
+            DegenerateOutputError: Se a geração continuar degenerada após as novas
+                tentativas (com `guard_on_failure = "fail"`)
+        """
+        metrics = metrics or PageMetrics()
+        with metrics.stage("encode"):
+            encoded = prepare_image(image)
+        return self.ocr_encoded(encoded, on_text, prompt, metrics, max_chars)
+    
+    def ocr_encoded(
+        self,
+        encoded: EncodedImage,
+        on_text: Optional[Callable[[str], None]] = None,
+        prompt: Optional[str] = None,
+        metrics: Optional[PageMetrics] = None,
+        max_chars: Optional[int] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> OCRResult:
+        """
+        Executa o OCR de uma imagem já codificada (ver `ocr_image`).
+        
+        Permite que a codificação rode em outra etapa do pipeline, sem ocupar
+        uma das requisições simultâneas ao servidor.
+        
+        Args:
+            encoded: Imagem codificada por `prepare_image`
+            on_text: Callback com o texto acumulado da tentativa atual
+            prompt: Prompt customizado (usa config se não especificado)
+            metrics: Métricas da página (primeiro token, streaming, tokens)
+            max_chars: Tamanho máximo esperado do texto (padrão: config.guard_max_chars)
+            cancel: Quando sinalizado, fecha o stream em andamento e desiste da página
+            
+        Returns:
+            Resultado com o texto completo da página
+            
+        Raises:
+            OCRError: Se todas as tentativas falharem por erros transitórios
+            DegenerateOutputError: Se a geração continuar degenerada após as novas tentativas
+            OCRCancelledError: Se `cancel` foi sinalizado
+        """
+        metrics = metrics or PageMetrics()
+        attempts = config.api_max_retries + 1
+        failures = 0
+        degenerate_retries = 0
+        options = None
+        failed_endpoint = None
+        
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise OCRCancelledError("OCR cancelado")
+            attempt = failures + degenerate_retries + 1
+            # Nova tentativa vai preferencialmente para outro servidor
+            endpoint = self.pool.acquire(exclude=failed_endpoint)
+            metrics.attempts = attempt
+            metrics.endpoint = endpoint.url
+            guard = GenerationGuard(max_chars) if config.guard_enabled else None
+            start = time.monotonic()
+            try:
+                result = self._consume_stream(
+                    encoded, prompt, on_text, endpoint.client, metrics, guard, options, cancel
+                )
+            except DegenerateOutputError as e:
+                # O servidor respondeu normalmente: o problema é a saída do modelo
+                self.pool.release(endpoint, True, time.monotonic() - start)
+                metrics.degenerate = e.reason
+                if degenerate_retries < config.guard_max_retries:
+                    degenerate_retries += 1
+                    options = retry_options(guard.max_chars if guard else max_chars or config.guard_max_chars)
+                    continue
+                if config.guard_on_failure != "truncate":
+                    raise
+                
+                # Mantém o texto anterior ao problema (não vai para o cache)
+                text = e.text[:e.keep].rstrip()
+                if on_text:
+                    on_text(text)
+                return OCRResult(text=text, finish_reason=e.reason, attempts=attempt, degenerate=e.reason)
+            except RETRYABLE_ERRORS as e:
+                self.pool.release(endpoint, False, time.monotonic() - start, str(e))
+                failed_endpoint = endpoint
+                failures += 1
+                if failures == attempts:
+                    raise OCRError(f"OCR falhou após {attempts} tentativas: {e}") from e
+                if cancel is not None:
+                    cancel.wait(self._backoff_delay(failures))
+                else:
+                    time.sleep(self._backoff_delay(failures))
+                continue
+            except Exception:
+                # Erros não transitórios (ex: 400) não indicam problema no servidor
+                self.pool.release(endpoint, True, time.monotonic() - start)
+                raise
+            
+            self.pool.release(endpoint, True, time.monotonic() - start)
+            result.attempts = attempt
+            return result
+    
+    def _consume_stream(
+        self,
+        encoded: EncodedImage,
+        prompt: Optional[str],
+        on_text: Optional[Callable[[str], None]],
+        client: OpenAI,
+        metrics: PageMetrics,
+        guard: Optional[GenerationGuard] = None,
+        options: Optional[dict] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> OCRResult:
+        """
+        Executa uma tentativa: abre o stream e o consome até o fim.
+        
+        Uma thread de vigia fecha o stream se o tempo total (`api_timeout`) for
+        excedido ou se `cancel` for sinalizado, o que interrompe a leitura
+        bloqueada na thread atual (e o servidor cancela a geração). O tempo até o
+        primeiro token, o tempo de streaming e o uso de tokens (último chunk,
+        pedido via `include_usage`) são registrados em `metrics`. Se `guard`
+        detectar uma geração degenerada, o stream é fechado na hora (o
+        servidor cancela a requisição e libera a vaga).
+        
+        Returns:
+            Resultado da tentativa
+            
+        Raises:
+            DegenerateOutputError: Se a geração foi abortada por `guard` ou
+                cortada pelo limite de tokens (finish_reason "length")
+            OCRCancelledError: Se `cancel` foi sinalizado durante o stream
+        """
+        request_start = time.perf_counter()
+        first_token_at = None
+        stream = self.create_stream(encoded, prompt, client, options)
+        timed_out = threading.Event()
+        cancelled = threading.Event()
+        finished = threading.Event()
+        
+        def watch() -> None:
+            deadline = time.monotonic() + config.api_timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out.set()
+                    break
+                # Sem `cancel`, basta esperar o prazo; com ele, confere o sinal periodicamente
+                wait = min(remaining, CANCEL_CHECK_INTERVAL) if cancel is not None else remaining
+                if finished.wait(wait):
+                    return
+                if cancel is not None and cancel.is_set():
+                    cancelled.set()
+                    break
+            stream.close()
+        
+        watchdog = threading.Thread(target=watch, name="ocr-watchdog", daemon=True)
+        watchdog.start()
+        
+        # O texto é repassado a `on_text` com frequência limitada, não a cada token
+        buffer = TextAccumulator()
+        updates = ThrottledTextCallback(on_text, config.stream_updates_per_second)
+        finish_reason = None
+        usage = None
+        verdict = None
+        try:
+            for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.delta and choice.delta.content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    buffer.append(choice.delta.content)
+                    updates.update(buffer)
+                    verdict = guard.check(buffer) if guard else None
+                    if verdict:
+                        break
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+        except Exception as e:
+            if cancelled.is_set():
+                raise OCRCancelledError("OCR cancelado") from e
+            if timed_out.is_set():
+                raise OCRTimeoutError(f"Tempo total de {config.api_timeout:.0f}s excedido") from e
+            raise
+        finally:
+            finished.set()
+            stream.close()
+            
+            end = time.perf_counter()
+            if first_token_at is not None:
+                metrics.add("ttft", first_token_at - request_start)
+                metrics.add("stream", end - first_token_at)
+            else:
+                metrics.add("ttft", end - request_start)
+        
+        if cancelled.is_set():
+            raise OCRCancelledError("OCR cancelado")
+        if timed_out.is_set():
+            raise OCRTimeoutError(f"Tempo total de {config.api_timeout:.0f}s excedido")
+        if verdict:
+            raise DegenerateOutputError(verdict, buffer.text)
+        if finish_reason is None:
+            raise TruncatedStreamError("Stream encerrado sem finish_reason")
+        if finish_reason == "length":
+            # Cortado pelo limite de tokens do servidor: texto incompleto, tratado como o limite do guard
+            raise DegenerateOutputError(DegenerateOutput("length", len(buffer)), buffer.text)
+        
+        updates.flush(buffer)
+        result = OCRResult(text=buffer.text, finish_reason=finish_reason, attempts=1)
+        if usage is not None:
+            result.prompt_tokens = usage.prompt_tokens
+            result.completion_tokens = usage.completion_tokens
+            metrics.prompt_tokens = usage.prompt_tokens
+            metrics.completion_tokens = usage.completion_tokens
+        return result
+    
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """Atraso antes da próxima tentativa: exponencial com jitter."""
+        delay = min(config.retry_backoff_max, config.retry_backoff_base * (2 ** (attempt - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,277 @@
+"""Estatísticas baratas de imagem para detectar páginas em branco e repetidas antes do OCR."""
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Optional
+from PIL import Image, ImageChops, ImageFilter
+
+from config import config
+
+
+# Largura da versão reduzida usada no hash perceptual
+SIGNATURE_WIDTH = 320
+# Pixels mais escuros que isso (0-255) contam como tinta
+INK_THRESHOLD = 160
+
+# Comparação de páginas repetidas: máscara de tinta com ~100 DPI em A4. Na
+# redução os traços finos ficam cinza, por isso o limiar de tinta é mais alto
+COMPARE_WIDTH = 800
+COMPARE_INK_THRESHOLD = 176
+# Deslocamento máximo entre duas digitalizações da mesma folha (~5 mm em A4)
+MAX_SHIFT = 20
+# A inclinação do papel é absorvida alinhando cada bloco separadamente, até
+# ALIGN_REFINE pixels além do deslocamento previsto para ele
+ALIGN_BLOCK = 96
+ALIGN_REFINE = 2
+# Tinta a até 1 pixel de distância na outra página conta como correspondente
+STROKE_TOLERANCE = 1
+# Raio da janela (~um caractere) em que a tinta sem correspondência é medida
+MISMATCH_RADIUS = 4
+
+
+@dataclass
+class PageSignature:
+    """Resumo visual de uma página."""
+    
+    dhash: int                  # Hash perceptual (dHash 16x16) para a busca rápida
+    digest: str                 # Hash exato da máscara de tinta
+    size: tuple[int, int]       # Dimensões da máscara de tinta
+    ink: bytes                  # Máscara de tinta com COMPARE_WIDTH de largura (1 bit por pixel)
+    rows: tuple[bytes, bytes]   # Tinta por linha nas metades esquerda e direita
+    cols: tuple[bytes, bytes]   # Tinta por coluna nas metades superior e inferior
+    ink_ratio: float            # Fração da página coberta por tinta
+
+
+def dhash(gray: Image.Image, size: int = 16) -> int:
+    """
+    Calcula o dHash (diferença entre pixels vizinhos) de uma imagem em tons de cinza.
+    
+    Args:
+        gray: Imagem em modo "L"
+        size: Lado da grade (o hash tem size² bits)
+    
+    Returns:
+        Hash como inteiro
+    """
+    pixels = list(gray.resize((size + 1, size), Image.Resampling.BILINEAR).getdata())
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def page_signature(image: Image.Image) -> PageSignature:
+    """
+    Calcula o resumo visual de uma página.
+    
+    Args:
+        image: Imagem da página renderizada
+    
+    Returns:
+        PageSignature da página
+    """
+    gray = image.convert("L")
+    height = max(1, round(gray.height * SIGNATURE_WIDTH / gray.width))
+    ink_mask = gray.point(lambda v: 255 if v < INK_THRESHOLD else 0, "1")
+    
+    compare_height = max(1, round(gray.height * COMPARE_WIDTH / gray.width))
+    mask = gray.resize((COMPARE_WIDTH, compare_height), Image.Resampling.BOX).point(
+        lambda v: 255 if v < COMPARE_INK_THRESHOLD else 0
+    )
+    half_width, half_height = COMPARE_WIDTH // 2, compare_height // 2
+    ink = mask.convert("1").tobytes()
+    return PageSignature(
+        dhash=dhash(gray.resize((SIGNATURE_WIDTH, height), Image.Resampling.BOX)),
+        digest=hashlib.sha256(ink).hexdigest(),
+        size=mask.size,
+        ink=ink,
+        rows=(
+            _profile(mask.crop((0, 0, half_width, compare_height)), rows=True),
+            _profile(mask.crop((half_width, 0, COMPARE_WIDTH, compare_height)), rows=True)
+        ),
+        cols=(
+            _profile(mask.crop((0, 0, COMPARE_WIDTH, half_height)), rows=False),
+            _profile(mask.crop((0, half_height, COMPARE_WIDTH, compare_height)), rows=False)
+        ),
+        ink_ratio=ink_mask.histogram()[255] / (gray.width * gray.height)
+    )
+
+
+def _profile(mask: Image.Image, rows: bool) -> bytes:
+    """Quantidade média de tinta em cada linha (ou coluna) de uma máscara."""
+    size = (1, mask.height) if rows else (mask.width, 1)
+    return mask.resize(size, Image.Resampling.BOX).tobytes()
+
+
+def is_blank(signature: PageSignature) -> bool:
+    """Indica se a página não tem conteúdo (só fundo e ruído)."""
+    return signature.ink_ratio <= config.blank_max_ink_ratio
+
+
+def profile_shift(a: bytes, b: bytes, max_shift: int) -> int:
+    """
+    Deslocamento que melhor alinha dois perfis de tinta (correlação cruzada).
+    
+    Returns:
+        Deslocamento `s` em que `b[i]` corresponde a `a[i + s]`
+    """
+    mean_a, mean_b = sum(a) / len(a), sum(b) / len(b)
+    a = [v - mean_a for v in a]
+    b = [v - mean_b for v in b]
+    best_shift, best_score = 0, None
+    for shift in range(-max_shift, max_shift + 1):
+        start, end = max(0, -shift), min(len(b), len(a) - shift)
+        score = sum(a[i + shift] * b[i] for i in range(start, end))
+        if best_score is None or score > best_score:
+            best_shift, best_score = shift, score
+    return best_shift
+
+
+def _dilate(mask: Image.Image) -> Image.Image:
+    """Engrossa os traços da máscara em STROKE_TOLERANCE pixels."""
+    return mask.filter(ImageFilter.BoxBlur(STROKE_TOLERANCE)).point(lambda v: 255 if v else 0)
+
+
+def _best_overlap(region: Image.Image, block: Image.Image) -> Image.Image:
+    """Recorte de `region` (bloco com ALIGN_REFINE pixels de folga) que menos difere de `block`."""
+    target = block.convert("1")
+    source = region.convert("1")
+    best, best_box = None, None
+    for top in range(2 * ALIGN_REFINE + 1):
+        for left in range(2 * ALIGN_REFINE + 1):
+            box = (left, top, left + block.width, top + block.height)
+            different = ImageChops.logical_xor(source.crop(box), target).histogram()[255]
+            if best is None or different < best:
+                best, best_box = different, box
+    return region.crop(best_box)
+
+
+def ink_mismatch(a: PageSignature, b: PageSignature, limit: Optional[float] = None) -> float:
+    """
+    Mede quanto duas páginas diferem, tolerando as variações de uma nova digitalização.
+    
+    As páginas são alinhadas pelos perfis de tinta (deslocamento de até
+    MAX_SHIFT pixels, estimado em cada metade para acompanhar a inclinação) e
+    cada bloco de ALIGN_BLOCK pixels é ajustado separadamente. Traços que
+    coincidem a até STROKE_TOLERANCE pixels contam como iguais; o resultado é
+    a maior densidade de tinta sem correspondência em uma janela do tamanho
+    de um caractere. Ruído e poeira ficam espalhados e dão valores baixos;
+    uma marca, palavra ou bloco de texto diferente se concentra na janela.
+    
+    Args:
+        a, b: Resumos das páginas
+        limit: Para a comparação assim que a diferença passar desse valor
+    
+    Returns:
+        0.0 para páginas idênticas, até 1.0 para páginas diferentes;
+        1.0 para páginas de proporções diferentes ou que passaram de `limit`
+    """
+    if abs(a.size[0] - b.size[0]) > MAX_SHIFT or abs(a.size[1] - b.size[1]) > MAX_SHIFT:
+        return 1.0
+    if a.digest == b.digest:
+        return 0.0
+    
+    ink_a = Image.frombytes("1", a.size, a.ink).convert("L")
+    ink_b = Image.frombytes("1", b.size, b.ink).convert("L")
+    width, height = b.size
+    dy_left, dy_right = (profile_shift(pa, pb, MAX_SHIFT) for pa, pb in zip(a.rows, b.rows))
+    dx_top, dx_bottom = (profile_shift(pa, pb, MAX_SHIFT) for pa, pb in zip(a.cols, b.cols))
+    
+    unmatched = Image.new("L", b.size)
+    window = ImageFilter.BoxBlur(MISMATCH_RADIUS)
+    tolerance, margin = STROKE_TOLERANCE, STROKE_TOLERANCE + ALIGN_REFINE
+    for top in range(0, height, ALIGN_BLOCK):
+        for left in range(0, width, ALIGN_BLOCK):
+            right, bottom = min(left + ALIGN_BLOCK, width), min(top + ALIGN_BLOCK, height)
+            
+            # Deslocamento previsto no centro do bloco, interpolado entre as metades da página
+            center_x, center_y = (left + right) / 2, (top + bottom) / 2
+            dx = round(dx_top + (dx_bottom - dx_top) * (center_y - height / 4) / (height / 2))
+            dy = round(dy_left + (dy_right - dy_left) * (center_x - width / 4) / (width / 2))
+            
+            block_b = ink_b.crop((left - tolerance, top - tolerance, right + tolerance, bottom + tolerance))
+            region_a = ink_a.crop((left + dx - margin, top + dy - margin, right + dx + margin, bottom + dy + margin))
+            if block_b.getbbox() is None and region_a.getbbox() is None:
+                continue
+            
+            block_a = _best_overlap(region_a, block_b)
+            difference = ImageChops.lighter(
+                ImageChops.subtract(block_a, _dilate(block_b)),
+                ImageChops.subtract(block_b, _dilate(block_a))
+            )
+            unmatched.paste(
+                difference.crop((tolerance, tolerance, tolerance + right - left, tolerance + bottom - top)),
+                (left, top)
+            )
+            
+            # Páginas claramente diferentes: não precisa alinhar o resto
+            if limit is not None:
+                reach = 2 * MISMATCH_RADIUS
+                around = unmatched.crop((left - reach, top - reach, right + reach, bottom + reach)).filter(window)
+                inner = (MISMATCH_RADIUS, MISMATCH_RADIUS, around.width - MISMATCH_RADIUS, around.height - MISMATCH_RADIUS)
+                if around.crop(inner).getextrema()[1] / 255 > limit:
+                    return 1.0
+    
+    return unmatched.filter(window).getextrema()[1] / 255
+
+
+def hamming(a: int, b: int) -> int:
+    """Número de bits diferentes entre dois hashes."""
+    return bin(a ^ b).count("1")
+
+
+class DuplicateIndex:
+    """
+    Páginas já vistas em um lote, para reaproveitar o texto de páginas repetidas.
+    
+    Cada entrada guarda um Future com o texto da página original, registrado
+    antes do OCR terminar: uma cópia que chega enquanto a original ainda está
+    no servidor espera o mesmo resultado em vez de gerar outra chamada.
+    """
+    
+    def __init__(self, max_entries: int):
+        """
+        Args:
+            max_entries: Páginas guardadas (as menos usadas saem primeiro)
+        """
+        self.max_entries = max_entries
+        self._entries: OrderedDict[int, tuple[PageSignature, Future]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+    
+    def find_or_add(self, signature: PageSignature, pending: Future) -> Optional[Future]:
+        """
+        Procura uma página equivalente; se não houver, registra esta.
+        
+        Args:
+            signature: Resumo visual da página
+            pending: Future que receberá o texto desta página
+        
+        Returns:
+            Future com o texto da página equivalente, ou None se a página é nova
+        """
+        with self._lock:
+            for entry_id, (other, result) in self._entries.items():
+                if result.done() and result.exception() is not None:
+                    continue
+                if other.digest != signature.digest and hamming(signature.dhash, other.dhash) > config.duplicate_max_hash_distance:
+                    continue
+                if ink_mismatch(signature, other, config.duplicate_max_ink_mismatch) > config.duplicate_max_ink_mismatch:
+                    continue
+                self._entries.move_to_end(entry_id)
+                return result
+            
+            self._entries[self._next_id] = (signature, pending)
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return None
+    
+    def clear(self) -> None:
+        """Esquece as páginas vistas (início de um novo lote)."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,202 @@
+"""Pipeline em etapas (renderização → codificação → OCR) com filas limitadas."""
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional
+from PIL import Image
+
+from metrics import PageMetrics
+
+
+# Marcador de fim da fila de páginas
+_END = object()
+
+
+def copy_result(source: Future, target: Future) -> None:
+    """Repassa o resultado (ou a exceção) de um Future concluído para outro."""
+    error = source.exception()
+    if error is not None:
+        target.set_exception(error)
+    else:
+        target.set_result(source.result())
+
+
+def page_callback(
+    on_chunk: Optional[Callable[[int, str], None]],
+    page_num: int
+) -> Optional[Callable[[str], None]]:
+    """Liga o callback de chunks do documento (page_num, texto) a uma página."""
+    return (lambda text: on_chunk(page_num, text)) if on_chunk is not None else None
+
+
+class PagePipeline:
+    """
+    Sobrepõe renderização, codificação e OCR de páginas.
+    
+    - Renderização: uma thread consome o iterável de páginas (o pdftoppm já
+      rasteriza em um processo próprio) e entrega cada página à codificação.
+    - Codificação: um pool de threads prepara as imagens (hash do cache,
+      redimensionamento e compressão, que liberam o GIL no Pillow).
+    - OCR: um pool de `ocr_workers` threads mantém as requisições ao servidor
+      ocupadas; só imagens já codificadas ocupam essas vagas.
+    
+    No máximo `ocr_workers + prefetch` páginas ficam em memória entre a
+    renderização e a entrega ao consumidor: a renderização espera uma vaga
+    (backpressure) quando o OCR ou o consumidor ficam para trás.
+    """
+    
+    def __init__(
+        self,
+        encode: Callable[[Image.Image, PageMetrics], Any],
+        ocr: Callable[[Any, Optional[Callable[[str], None]], PageMetrics], str],
+        ocr_workers: int,
+        encode_workers: int,
+        prefetch: int,
+        abandon: Optional[Callable[[Any, BaseException], None]] = None,
+        cancel: Optional[threading.Event] = None
+    ):
+        """
+        Args:
+            encode: Prepara uma página; retorna o texto (str) se já houver resultado
+                    (ex: cache), um Future com o texto de outra página ou o
+                    objeto a enviar para `ocr`
+            ocr: Executa o OCR do objeto retornado por `encode`
+            ocr_workers: Requisições de OCR simultâneas
+            encode_workers: Threads de codificação
+            prefetch: Páginas renderizadas/codificadas à frente do OCR
+            abandon: Chamado com o objeto de `encode` que não chegou ao `ocr`
+                (pipeline encerrado antes), para liberar quem espera por ele
+            cancel: Sinalizado no encerramento do pipeline; o `ocr` deve desistir
+                das páginas em andamento ao vê-lo (o encerramento espera por elas)
+        """
+        self.encode = encode
+        self.ocr = ocr
+        self.ocr_workers = max(1, ocr_workers)
+        self.encode_workers = max(1, encode_workers)
+        self.prefetch = max(0, prefetch)
+        self.abandon = abandon
+        self.cancel = cancel
+    
+    def run(
+        self,
+        pages: Iterable[tuple[int, Image.Image]],
+        on_chunk: Optional[Callable[[int, str], None]] = None,
+        file_label: str = ""
+    ) -> Iterator[tuple[int, Image.Image, str, PageMetrics]]:
+        """
+        Processa as páginas e entrega os resultados na ordem de entrada.
+        
+        Args:
+            pages: Iterável de tuplas (page_num, imagem), consumido em uma thread própria
+            on_chunk: Callback de chunks (page_num, texto acumulado da página),
+                chamado das threads de OCR: páginas diferentes chegam intercaladas
+                e ao mesmo tempo
+            file_label: Nome do arquivo registrado nas métricas
+        
+        Returns:
+            Iterator de tuplas (page_num, imagem, texto, métricas)
+        """
+        slots = threading.Semaphore(self.ocr_workers + self.prefetch)
+        ordered: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        
+        encode_pool = ThreadPoolExecutor(self.encode_workers, thread_name_prefix="encode")
+        ocr_pool = ThreadPoolExecutor(self.ocr_workers, thread_name_prefix="ocr")
+        
+        def submit(image: Image.Image, metrics: PageMetrics) -> Future:
+            """Encadeia codificação e OCR de uma página, sem bloquear threads à espera."""
+            result = Future()
+            page_chunk = page_callback(on_chunk, metrics.page)
+            
+            def run_ocr(prepared: Any) -> None:
+                try:
+                    result.set_result(self.ocr(prepared, page_chunk, metrics))
+                except BaseException as e:
+                    result.set_exception(e)
+            
+            def drop(prepared: Any, error: BaseException) -> None:
+                """A página não será processada: avisa `abandon` e encerra o resultado."""
+                if self.abandon is not None:
+                    self.abandon(prepared, error)
+                result.set_exception(error)
+            
+            def after_ocr(task: Future, prepared: Any) -> None:
+                # OCR cancelado na fila pelo encerramento do pipeline (consumidor parou antes)
+                if task.cancelled():
+                    drop(prepared, CancelledError())
+            
+            def after_encode(encoded: Future) -> None:
+                try:
+                    prepared = encoded.result()
+                except BaseException as e:
+                    result.set_exception(e)
+                    return
+                
+                if isinstance(prepared, str):
+                    result.set_result(prepared)
+                elif isinstance(prepared, Future):
+                    # Aguarda o resultado de outra página sem ocupar uma thread
+                    prepared.add_done_callback(lambda original: copy_result(original, result))
+                else:
+                    try:
+                        task = ocr_pool.submit(run_ocr, prepared)
+                    except BaseException as e:
+                        drop(prepared, e)
+                    else:
+                        task.add_done_callback(lambda task: after_ocr(task, prepared))
+            
+            encode_pool.submit(self.encode, image, metrics).add_done_callback(after_encode)
+            return result
+        
+        def render() -> None:
+            """Etapa de renderização: alimenta o pipeline respeitando as vagas."""
+            iterator = iter(pages)
+            try:
+                while not stop.is_set():
+                    # Espera uma vaga antes de renderizar a próxima página
+                    while not slots.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    
+                    render_start = time.perf_counter()
+                    item = next(iterator, _END)
+                    if item is _END:
+                        return
+                    
+                    page_num, page_image = item
+                    metrics = PageMetrics(file=file_label, page=page_num)
+                    metrics.add("render", time.perf_counter() - render_start)
+                    ordered.put((page_num, page_image, metrics, submit(page_image, metrics)))
+            except BaseException as e:
+                ordered.put(e)
+            finally:
+                # Encerra a renderização (ex: mata o pdftoppm se o consumidor parou antes)
+                close = getattr(iterator, "close", None)
+                if close:
+                    close()
+                ordered.put(_END)
+        
+        render_thread = threading.Thread(target=render, name="render", daemon=True)
+        render_thread.start()
+        
+        try:
+            while True:
+                item = ordered.get()
+                if item is _END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                
+                page_num, page_image, metrics, result = item
+                text = result.result()
+                slots.release()
+                yield page_num, page_image, text, metrics
+        finally:
+            stop.set()
+            # Interrompe os streams em andamento: o encerramento não espera o fim da geração
+            if self.cancel is not None:
+                self.cancel.set()
+            render_thread.join()
+            encode_pool.shutdown(wait=True, cancel_futures=True)
+            ocr_pool.shutdown(wait=True, cancel_futures=True)
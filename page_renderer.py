@@ -0,0 +1,202 @@
+"""Renderização de páginas de PDF em imagens com um único processo do Poppler."""
+import os
+import platform
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+from PIL import Image
+from pdf2image import pdfinfo_from_path
+from pdf2image.exceptions import PDFInfoNotInstalledError
+
+
+def poppler_command(command: str, poppler_path: Optional[str] = None) -> str:
+    """
+    Retorna o caminho do executável do Poppler a ser chamado.
+    
+    Args:
+        command: Nome do utilitário (ex: "pdftoppm")
+        poppler_path: Pasta do Poppler (usa o PATH se não especificado)
+    
+    Returns:
+        Caminho ou nome do executável
+    """
+    if poppler_path:
+        return os.path.join(poppler_path, command)
+    return command
+
+
+def popen_kwargs() -> dict:
+    """Argumentos extras de `subprocess` para não abrir janelas de console no Windows."""
+    if platform.system() != "Windows":
+        return {}
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return {"startupinfo": startupinfo}
+
+
+def _read_token(stream: BinaryIO) -> bytes:
+    """Lê um token do cabeçalho PPM/PGM, ignorando espaços e comentários."""
+    token = b""
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            return token
+        if byte == b"#" and not token:
+            stream.readline()
+            continue
+        if byte.isspace():
+            if token:
+                return token
+            continue
+        token += byte
+
+
+def read_ppm(stream: BinaryIO) -> Optional[Image.Image]:
+    """
+    Lê uma imagem PPM (P6) ou PGM (P5) de um fluxo com várias imagens concatenadas.
+    
+    Args:
+        stream: Fluxo binário (ex: stdout do pdftoppm)
+    
+    Returns:
+        Imagem PIL ou None se o fluxo terminou
+    """
+    magic = _read_token(stream)
+    if not magic:
+        return None
+    if magic not in (b"P5", b"P6"):
+        raise ValueError(f"Formato de imagem inesperado do pdftoppm: {magic!r}")
+    
+    width = int(_read_token(stream))
+    height = int(_read_token(stream))
+    int(_read_token(stream))  # maxval (sempre 255 no pdftoppm)
+    
+    mode = "RGB" if magic == b"P6" else "L"
+    size = width * height * (3 if mode == "RGB" else 1)
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError("Saída do pdftoppm truncada")
+    
+    return Image.frombytes(mode, (width, height), data)
+
+
+class PageRenderer:
+    """Renderiza páginas de um PDF como um fluxo, abrindo o documento uma única vez."""
+    
+    def __init__(
+        self,
+        pdf_path: Path,
+        dpi: int,
+        poppler_path: Optional[str] = None,
+        page_count: Optional[int] = None
+    ):
+        """
+        Inicializa o renderizador.
+        
+        Args:
+            pdf_path: Caminho do PDF
+            dpi: Resolução da renderização
+            poppler_path: Caminho do Poppler (usa o PATH se não especificado)
+            page_count: Número de páginas, se já conhecido (evita chamar o pdfinfo)
+        """
+        self.pdf_path = Path(pdf_path)
+        self.dpi = dpi
+        self.poppler_path = poppler_path
+        self._page_count = page_count
+        self._info: Optional[dict] = None
+    
+    @property
+    def info(self) -> dict:
+        """Resultado do pdfinfo (consultado uma única vez por documento)."""
+        if self._info is None:
+            self._info = pdfinfo_from_path(str(self.pdf_path), poppler_path=self.poppler_path)
+        return self._info
+    
+    @property
+    def page_count(self) -> int:
+        """Número total de páginas do PDF."""
+        if self._page_count is None:
+            self._page_count = int(self.info["Pages"])
+        return self._page_count
+    
+    def iter_pages(self, first_page: int = 1, last_page: Optional[int] = None) -> Iterator[tuple[int, Image.Image]]:
+        """
+        Renderiza um intervalo de páginas, produzindo-as à medida que ficam prontas.
+        
+        Um único pdftoppm renderiza todo o intervalo e escreve as imagens no
+        stdout; cada página é lida do pipe assim que sai. Como o pipe tem
+        capacidade limitada, o pdftoppm fica bloqueado enquanto o consumidor
+        não pede a próxima página, o que mantém o uso de memória constante.
+        
+        Args:
+            first_page: Primeira página (1-based)
+            last_page: Última página, inclusiva (usa a última do PDF se não especificado)
+        
+        Returns:
+            Iterator de tuplas (page_num, imagem)
+        """
+        if last_page is None:
+            last_page = self.page_count
+        if last_page < first_page:
+            return
+        
+        command = [
+            poppler_command("pdftoppm", self.poppler_path),
+            "-r", str(self.dpi),
+            "-f", str(first_page),
+            "-l", str(last_page),
+            str(self.pdf_path),
+        ]
+        
+        with tempfile.TemporaryFile() as stderr:
+            try:
+                process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr, **popen_kwargs())
+            except OSError as e:
+                raise PDFInfoNotInstalledError(
+                    "Não foi possível executar o pdftoppm. O Poppler está instalado e no PATH?"
+                ) from e
+            finished = False
+            try:
+                page_num = first_page
+                while page_num <= last_page:
+                    image = read_ppm(process.stdout)
+                    if image is None:
+                        break
+                    yield page_num, image
+                    page_num += 1
+                finished = True
+            finally:
+                # Consumidor desistiu no meio do fluxo: encerra o pdftoppm
+                if not finished and process.poll() is None:
+                    process.kill()
+                process.stdout.close()
+                returncode = process.wait()
+            
+            if returncode != 0 or page_num == first_page:
+                stderr.seek(0)
+                message = stderr.read().decode("utf-8", "ignore").strip()
+                raise ValueError(
+                    f"Não foi possível renderizar {self.pdf_path.name} "
+                    f"(pdftoppm retornou {returncode}): {message}"
+                )
+            if page_num <= last_page:
+                # Saída com sucesso, mas faltaram páginas: o documento ficaria incompleto sem aviso
+                raise ValueError(
+                    f"pdftoppm entregou {page_num - first_page} de {last_page - first_page + 1} "
+                    f"páginas de {self.pdf_path.name} (páginas {first_page}-{last_page})"
+                )
+    
+    def render_page(self, page_num: int) -> Image.Image:
+        """
+        Renderiza uma única página.
+        
+        Args:
+            page_num: Número da página (1-based)
+        
+        Returns:
+            Imagem PIL da página
+        """
+        for _, image in self.iter_pages(page_num, page_num):
+            return image
+        raise ValueError(f"Não foi possível converter a página {page_num}")
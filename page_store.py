@@ -0,0 +1,138 @@
+"""Armazenamento em disco das páginas do histórico (miniaturas e texto sob demanda)."""
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from PIL import Image
+
+from config import config
+from markdown_writer import MarkdownWriter
+
+
+def create_preview_dir() -> Path:
+    """Cria uma pasta temporária exclusiva para as miniaturas de uma sessão."""
+    preview_dir = Path(tempfile.gettempdir()) / "olmocr_previews" / uuid.uuid4().hex
+    preview_dir.mkdir(parents=True, exist_ok=True)
+    return preview_dir
+
+
+def remove_preview_dir(preview_dir: Optional[str]) -> None:
+    """Remove a pasta de miniaturas de uma sessão (e as suas imagens decodificadas em cache)."""
+    if preview_dir:
+        _previews.evict_dir(preview_dir)
+        shutil.rmtree(preview_dir, ignore_errors=True)
+
+
+def save_preview(image: Image.Image, preview_dir: Path, name: str) -> str:
+    """
+    Salva uma miniatura JPEG da página para exibição no histórico.
+    
+    Args:
+        image: Imagem da página em resolução total
+        preview_dir: Pasta de miniaturas da sessão
+        name: Nome base do arquivo (sem extensão)
+    
+    Returns:
+        Caminho da miniatura salva
+    """
+    preview = image.convert("RGB") if image.mode != "RGB" else image.copy()
+    preview.thumbnail((config.preview_max_edge, config.preview_max_edge))
+    
+    preview_path = Path(preview_dir) / f"{name}.jpg"
+    preview.save(str(preview_path), format="JPEG", quality=config.preview_quality)
+    return str(preview_path)
+
+
+class PreviewCache:
+    """
+    Miniaturas decodificadas mais recentes, compartilhadas entre as sessões.
+    
+    Cada sessão tem a sua pasta de miniaturas: ao encerrar uma sessão, só as
+    imagens dessa pasta saem do cache (as das outras sessões continuam).
+    """
+    
+    def __init__(self, max_size: int):
+        """
+        Args:
+            max_size: Miniaturas mantidas em memória (as menos usadas saem primeiro)
+        """
+        self.max_size = max_size
+        self._images: OrderedDict[str, Image.Image] = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def load(self, preview_path: str) -> Image.Image:
+        """
+        Carrega uma miniatura do disco, ou do cache se já foi decodificada.
+        
+        Args:
+            preview_path: Caminho da miniatura
+        
+        Returns:
+            Imagem PIL já carregada
+        """
+        with self._lock:
+            if preview_path in self._images:
+                self._images.move_to_end(preview_path)
+                return self._images[preview_path]
+        
+        with Image.open(preview_path) as image:
+            image.load()
+        
+        with self._lock:
+            self._images[preview_path] = image
+            while len(self._images) > self.max_size:
+                self._images.popitem(last=False)
+        return image
+    
+    def evict_dir(self, preview_dir: str) -> None:
+        """Remove do cache as miniaturas de uma pasta de sessão."""
+        with self._lock:
+            for path in [path for path in self._images if Path(path).parent == Path(preview_dir)]:
+                del self._images[path]
+
+
+_previews = PreviewCache(config.preview_cache_size)
+
+
+def load_preview(preview_path: str) -> Image.Image:
+    """
+    Carrega uma miniatura do disco, mantendo as mais recentes decodificadas em memória.
+    
+    Args:
+        preview_path: Caminho da miniatura
+    
+    Returns:
+        Imagem PIL já carregada
+    """
+    return _previews.load(preview_path)
+
+
+def read_page_text(md_path: str, offset: int, length: int) -> str:
+    """
+    Lê o texto de uma página diretamente do markdown de saída.
+    
+    Enquanto o documento está em processamento o texto está no arquivo
+    parcial; depois de publicado, no `.md` final (com os mesmos offsets).
+    O parcial tem precedência: se ele existe, o `.md` final que estiver ao
+    lado é de uma execução anterior e seus offsets não valem mais.
+    
+    Args:
+        md_path: Caminho final do markdown
+        offset: Posição (em bytes) do início do texto da página
+        length: Tamanho (em bytes) do texto da página
+    
+    Returns:
+        Texto da página, ou string vazia se o arquivo não existir mais
+    """
+    final_path = Path(md_path)
+    for path in (MarkdownWriter.partial_path_for(final_path), final_path):
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                return f.read(length).decode("utf-8", "replace")
+        except OSError:
+            continue
+    return ""
@@ -0,0 +1,155 @@
+"""Registro de serviços de longa duração compartilhados pelo processo."""
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from config import config
+from document_processor import DocumentProcessor
+from folder_scanner import FileIndex
+from metrics import MetricsSummaryCache
+from ocr_cache import OCRCache
+from ocr_service import OCRService
+
+
+class ServiceRegistry:
+    """
+    Mantém instâncias de OCRService e DocumentProcessor reutilizadas entre páginas,
+    arquivos e reruns do Streamlit.
+    
+    Os objetos vivem no nível do módulo (que o Streamlit não recarrega entre
+    reruns), então o cliente OpenAI e seu pool de conexões keep-alive são criados
+    uma única vez para cada combinação de configurações.
+    
+    Só as `config.ocr_service_cache_size` URLs/chaves usadas mais recentemente
+    ficam abertas: ao passar do limite, o serviço menos usado é fechado (pool
+    HTTP e health check) e descartado junto com os seus processadores.
+    """
+    
+    _lock = threading.Lock()
+    _ocr_services: OrderedDict[tuple, OCRService] = OrderedDict()
+    _processors: dict[tuple, DocumentProcessor] = {}
+    _cache: Optional[OCRCache] = None
+    _file_index: Optional[FileIndex] = None
+    _metrics_summaries = MetricsSummaryCache()
+    
+    @classmethod
+    def get_cache(cls) -> Optional[OCRCache]:
+        """
+        Retorna o cache de OCR compartilhado (ou None se desabilitado no config).
+        
+        Returns:
+            Instância única de OCRCache
+        """
+        if not config.cache_enabled:
+            return None
+        
+        with cls._lock:
+            if cls._cache is None:
+                cls._cache = OCRCache(config.cache_path, config.cache_max_size_mb * 1024 * 1024)
+            return cls._cache
+    
+    @classmethod
+    def get_file_index(cls) -> FileIndex:
+        """
+        Retorna o índice compartilhado de PDFs já convertidos.
+        
+        Returns:
+            Instância única de FileIndex
+        """
+        with cls._lock:
+            if cls._file_index is None:
+                cls._file_index = FileIndex(config.scan_index_path)
+            return cls._file_index
+    
+    @classmethod
+    def get_metrics_summaries(cls) -> MetricsSummaryCache:
+        """Retorna o cache compartilhado de resumos dos arquivos de métricas."""
+        return cls._metrics_summaries
+    
+    @classmethod
+    def get_ocr_service(cls, api_url: Optional[str] = None, api_key: Optional[str] = None) -> OCRService:
+        """
+        Retorna o serviço de OCR compartilhado para a URL/chave informadas.
+        
+        Args:
+            api_url: URL base da API (usa config se não especificado)
+            api_key: Chave da API (usa config se não especificado)
+        
+        Returns:
+            Instância reutilizável de OCRService
+        """
+        with cls._lock:
+            return cls._ocr_service(api_url, api_key)
+    
+    @classmethod
+    def _ocr_service(cls, api_url: Optional[str], api_key: Optional[str]) -> OCRService:
+        """Serviço de OCR da URL/chave, fechando o menos usado além do limite (chamar com o lock)."""
+        key = (api_url or config.default_api_url, api_key or config.api_key)
+        service = cls._ocr_services.get(key)
+        if service is None:
+            service = OCRService(base_url=key[0], api_key=key[1])
+            cls._ocr_services[key] = service
+        cls._ocr_services.move_to_end(key)
+        
+        while len(cls._ocr_services) > max(1, config.ocr_service_cache_size):
+            _, evicted = cls._ocr_services.popitem(last=False)
+            cls._evict(evicted)
+        return service
+    
+    @classmethod
+    def _evict(cls, service: OCRService) -> None:
+        """Fecha um serviço e descarta os processadores que o usam (chamar com o lock)."""
+        for key in [key for key, processor in cls._processors.items() if processor.ocr_service is service]:
+            del cls._processors[key]
+        service.close()
+    
+    @classmethod
+    def get_processor(
+        cls,
+        api_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        dpi: Optional[int] = None,
+        poppler_path: Optional[str] = None
+    ) -> DocumentProcessor:
+        """
+        Retorna o processador de documentos compartilhado para as configurações informadas.
+        
+        Args:
+            api_url: URL base da API (usa config se não especificado)
+            api_key: Chave da API (usa config se não especificado)
+            dpi: DPI para conversão de PDF (usa config se não especificado)
+            poppler_path: Caminho do Poppler (usa config se não especificado)
+        
+        Returns:
+            Instância reutilizável de DocumentProcessor
+        """
+        cache = cls.get_cache()
+        
+        with cls._lock:
+            ocr_service = cls._ocr_service(api_url, api_key)
+            key = (
+                ocr_service.base_url,
+                ocr_service.api_key,
+                dpi or config.default_dpi,
+                poppler_path or config.poppler_default_path
+            )
+            processor = cls._processors.get(key)
+            if processor is None:
+                processor = DocumentProcessor(ocr_service, dpi=key[2], poppler_path=key[3], cache=cache)
+                cls._processors[key] = processor
+            return processor
+    
+    @classmethod
+    def clear(cls) -> None:
+        """Descarta todas as instâncias e fecha os clientes HTTP."""
+        with cls._lock:
+            for service in cls._ocr_services.values():
+                service.close()
+            cls._ocr_services.clear()
+            cls._processors.clear()
+            if cls._cache is not None:
+                cls._cache.close()
+                cls._cache = None
+            if cls._file_index is not None:
+                cls._file_index.close()
+                cls._file_index = None
@@ -3,6 +3,12 @@ from typing import Optional
 from PIL import Image
 import streamlit as st
 
+from config import config
+from document_processor import DocumentProcessor
+from job_manifest import JobManifest
+from page_analysis import DuplicateIndex
+from page_store import create_preview_dir, load_preview, read_page_text, remove_preview_dir, save_preview
+
 
 class SessionState:
     """Gerencia o estado da sessão Streamlit."""
@@ -14,6 +20,13 @@ class SessionState:
     PAGES_HISTORY = 'pages_history'
     CURRENT_PAGE_INDEX = 'current_page_index'
     OUTPUT_FOLDER_NAME = 'output_folder_name'
+    JOB_MANIFEST = 'job_manifest'
+    PREVIEW_DIR = 'preview_dir'
+    ADAPTIVE_DPI = 'adaptive_dpi'
+    SCAN_RECURSIVE = 'scan_recursive'
+    SCAN_INCREMENTAL = 'scan_incremental'
+    DUPLICATE_INDEX = 'duplicate_index'
+    FILE_SNAPSHOT = 'file_snapshot'
     
     @classmethod
     def initialize(cls) -> None:
@@ -35,6 +48,19 @@ class SessionState:
         
         if cls.CURRENT_PAGE_INDEX not in st.session_state:
             st.session_state[cls.CURRENT_PAGE_INDEX] = 0
+        
+        if cls.PREVIEW_DIR not in st.session_state:
+            st.session_state[cls.PREVIEW_DIR] = None
+        
+        # Opções da barra lateral (por sessão: o config é compartilhado por todos os usuários)
+        if cls.ADAPTIVE_DPI not in st.session_state:
+            st.session_state[cls.ADAPTIVE_DPI] = config.adaptive_dpi
+        
+        if cls.SCAN_RECURSIVE not in st.session_state:
+            st.session_state[cls.SCAN_RECURSIVE] = config.scan_recursive
+        
+        if cls.SCAN_INCREMENTAL not in st.session_state:
+            st.session_state[cls.SCAN_INCREMENTAL] = config.scan_incremental
             
         # Variáveis de controle de processamento
         if 'is_processing' not in st.session_state:
@@ -51,12 +77,31 @@ class SessionState:
             
         if 'total_pages_current_file' not in st.session_state:
             st.session_state['total_pages_current_file'] = 0
+        
+        if cls.JOB_MANIFEST not in st.session_state:
+            st.session_state[cls.JOB_MANIFEST] = None
+        
+        if cls.DUPLICATE_INDEX not in st.session_state:
+            st.session_state[cls.DUPLICATE_INDEX] = None
     
     @classmethod
     def get_output_folder_name(cls) -> str:
         """Retorna o nome da pasta de saída atual."""
         return st.session_state.get(cls.OUTPUT_FOLDER_NAME, "")
 
+    @classmethod
+    def get_adaptive_dpi(cls) -> bool:
+        """Retorna se o DPI adaptativo está ligado nesta sessão."""
+        return st.session_state.get(cls.ADAPTIVE_DPI, config.adaptive_dpi)
+
+    @classmethod
+    def get_scan_options(cls) -> tuple[bool, bool]:
+        """Retorna as opções de varredura da sessão: (incluir subpastas, só novos ou alterados)."""
+        return (
+            st.session_state.get(cls.SCAN_RECURSIVE, config.scan_recursive),
+            st.session_state.get(cls.SCAN_INCREMENTAL, config.scan_incremental)
+        )
+
     @classmethod
     def get_folder_path(cls) -> str:
         """Retorna o caminho da pasta selecionada."""
@@ -95,29 +140,60 @@ class SessionState:
     
     # Page history methods
     @classmethod
-    def add_page(cls, image: Image.Image, text: str, page_num: int, filename: str) -> None:
+    def add_page(
+        cls,
+        image: Image.Image,
+        text: str,
+        page_num: int,
+        filename: str,
+        text_ref: Optional[tuple[str, int, int]] = None
+    ) -> None:
         """
         Adiciona uma página ao histórico.
         
+        A imagem é guardada como miniatura em disco e o texto é lido sob demanda
+        do markdown de saída (quando `text_ref` é informado), de modo que a
+        memória usada não cresce com o número de páginas processadas.
+        
         Args:
             image: Imagem da página
             text: Texto extraído
             page_num: Número da página
             filename: Nome do arquivo PDF
+            text_ref: Localização do texto no markdown (md_path, offset, tamanho)
         """
+        preview_dir = st.session_state.get(cls.PREVIEW_DIR)
+        if not preview_dir:
+            preview_dir = str(create_preview_dir())
+            st.session_state[cls.PREVIEW_DIR] = preview_dir
+        
+        history = st.session_state[cls.PAGES_HISTORY]
         page_data = {
-            "image": image,
-            "text": text,
+            "image_path": save_preview(image, preview_dir, f"{len(history):06d}"),
+            "text": None if text_ref else text,
+            "text_ref": text_ref,
             "page_num": page_num,
             "filename": filename
         }
-        st.session_state[cls.PAGES_HISTORY].append(page_data)
+        history.append(page_data)
         
         # SÓ atualiza o índice se for a PRIMEIRA página adicionada
         # Isso evita que a visualização mude enquanto o usuário lê páginas anteriores
-        if len(st.session_state[cls.PAGES_HISTORY]) == 1:
+        if len(history) == 1:
             st.session_state[cls.CURRENT_PAGE_INDEX] = 0
     
+    @staticmethod
+    def get_page_image(page: dict) -> Image.Image:
+        """Retorna a imagem (miniatura) de uma página do histórico."""
+        return load_preview(page["image_path"])
+    
+    @staticmethod
+    def get_page_text(page: dict) -> str:
+        """Retorna o texto de uma página do histórico, lendo do markdown se necessário."""
+        if page["text_ref"] is None:
+            return page["text"]
+        return read_page_text(*page["text_ref"])
+    
     @classmethod
     def get_pages(cls) -> list:
         """Retorna todas as páginas armazenadas."""
@@ -138,6 +214,8 @@ class SessionState:
     @classmethod
     def clear_pages(cls) -> None:
         """Limpa todas as páginas armazenadas."""
+        remove_preview_dir(st.session_state.get(cls.PREVIEW_DIR))
+        st.session_state[cls.PREVIEW_DIR] = None
         st.session_state[cls.PAGES_HISTORY] = []
         st.session_state[cls.CURRENT_PAGE_INDEX] = 0
     
@@ -172,6 +250,56 @@ class SessionState:
         st.session_state[cls.OUTPUT_FOLDER_NAME] = f"Markdown_Outputs_{timestamp}"
         
         cls.clear_pages()  # Limpa histórico anterior
+        cls.reset_duplicate_index()
+    
+    @classmethod
+    def resume_processing(cls, manifest: JobManifest) -> None:
+        """Retoma um lote inacabado a partir do seu manifesto em disco."""
+        file_idx, page_idx = manifest.next_position()
+        
+        st.session_state['is_processing'] = True
+        st.session_state['processing_queue'] = manifest.file_paths()
+        st.session_state['proc_file_index'] = file_idx
+        st.session_state['proc_page_index'] = page_idx
+        st.session_state['total_pages_current_file'] = 0  # Recalculado no próximo passo
+        st.session_state[cls.OUTPUT_FOLDER_NAME] = manifest.output_dir.name
+        st.session_state[cls.JOB_MANIFEST] = manifest
+        
+        cls.clear_pages()
+        cls.reset_duplicate_index()
+    
+    @classmethod
+    def get_job_manifest(cls) -> Optional[JobManifest]:
+        """Retorna o manifesto do lote em andamento."""
+        return st.session_state.get(cls.JOB_MANIFEST)
+    
+    @classmethod
+    def set_job_manifest(cls, manifest: Optional[JobManifest]) -> None:
+        """Define o manifesto do lote em andamento."""
+        st.session_state[cls.JOB_MANIFEST] = manifest
+    
+    @classmethod
+    def get_duplicate_index(cls) -> Optional[DuplicateIndex]:
+        """Retorna o índice de páginas repetidas do lote em andamento (compartilhado entre os arquivos)."""
+        return st.session_state.get(cls.DUPLICATE_INDEX)
+    
+    @classmethod
+    def reset_duplicate_index(cls) -> None:
+        """Esquece as páginas do lote anterior e cria o índice do novo lote."""
+        previous = st.session_state.get(cls.DUPLICATE_INDEX)
+        if previous is not None:
+            previous.clear()
+        st.session_state[cls.DUPLICATE_INDEX] = DocumentProcessor.new_duplicate_index()
+    
+    @classmethod
+    def get_file_snapshot(cls) -> Optional[tuple[int, int, str]]:
+        """Retorna o estado do arquivo atual antes da conversão (só no modo incremental)."""
+        return st.session_state.get(cls.FILE_SNAPSHOT)
+    
+    @classmethod
+    def set_file_snapshot(cls, snapshot: Optional[tuple[int, int, str]]) -> None:
+        """Guarda o estado do arquivo atual antes da conversão (ver FileIndex.snapshot)."""
+        st.session_state[cls.FILE_SNAPSHOT] = snapshot
     
     @classmethod
     def stop_processing(cls) -> None:
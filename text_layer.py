@@ -0,0 +1,183 @@
+"""Extração da camada de texto de PDFs digitais (páginas que dispensam o OCR)."""
+import re
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from config import config
+from page_renderer import poppler_command, popen_kwargs
+
+
+def extract_text_layer(
+    pdf_path: Path,
+    first_page: int,
+    last_page: int,
+    poppler_path: Optional[str] = None
+) -> dict[int, str]:
+    """
+    Extrai o texto embutido de um intervalo de páginas com uma única chamada ao pdftotext.
+    
+    Args:
+        pdf_path: Caminho do PDF
+        first_page: Primeira página (1-based)
+        last_page: Última página (inclusiva)
+        poppler_path: Pasta do Poppler (usa o PATH se não especificado)
+    
+    Returns:
+        Dicionário página → texto (vazio se o pdftotext falhar)
+    """
+    command = [
+        poppler_command("pdftotext", poppler_path),
+        "-enc", "UTF-8",
+        "-f", str(first_page),
+        "-l", str(last_page),
+        str(pdf_path),
+        "-",
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, check=True, **popen_kwargs()).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+    
+    # O pdftotext separa as páginas com form feed
+    pages = output.decode("utf-8", "replace").split("\f")
+    return {
+        first_page + i: text
+        for i, text in enumerate(pages[:last_page - first_page + 1])
+    }
+
+
+def image_areas(
+    pdf_path: Path,
+    first_page: int,
+    last_page: int,
+    poppler_path: Optional[str] = None
+) -> Optional[dict[int, float]]:
+    """
+    Soma a área (em polegadas²) das imagens de cada página, via `pdfimages -list`.
+    
+    Args:
+        pdf_path: Caminho do PDF
+        first_page: Primeira página (1-based)
+        last_page: Última página (inclusiva)
+        poppler_path: Pasta do Poppler (usa o PATH se não especificado)
+    
+    Returns:
+        Dicionário página → área das imagens, ou None se o pdfimages falhar
+    """
+    command = [
+        poppler_command("pdfimages", poppler_path),
+        "-list",
+        "-f", str(first_page),
+        "-l", str(last_page),
+        str(pdf_path),
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, check=True, **popen_kwargs()).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    
+    areas: dict[int, float] = {}
+    # Colunas: page num type width height color comp bpc enc interp object ID x-ppi y-ppi size ratio
+    for line in output.decode("utf-8", "replace").splitlines()[2:]:
+        fields = line.split()
+        if len(fields) < 14 or fields[2] != "image":
+            continue
+        try:
+            page = int(fields[0])
+            width, height = int(fields[3]), int(fields[4])
+            x_ppi, y_ppi = float(fields[12]), float(fields[13])
+        except ValueError:
+            continue
+        if x_ppi > 0 and y_ppi > 0:
+            areas[page] = areas.get(page, 0.0) + (width / x_ppi) * (height / y_ppi)
+    return areas
+
+
+def page_area(pdf_info: dict) -> Optional[float]:
+    """
+    Área da página (em polegadas²) a partir do campo "Page size" do pdfinfo.
+    
+    Args:
+        pdf_info: Dicionário retornado por pdfinfo_from_path
+    
+    Returns:
+        Área da página ou None se o tamanho não for informado
+    """
+    match = re.match(r"\s*([\d.]+)\s*x\s*([\d.]+)\s*pts", str(pdf_info.get("Page size", "")))
+    if not match:
+        return None
+    return float(match.group(1)) / 72 * float(match.group(2)) / 72
+
+
+def is_reliable_text(text: str) -> bool:
+    """
+    Indica se o texto embutido parece confiável para dispensar o OCR.
+    
+    Exige um mínimo de caracteres e uma proporção alta de caracteres
+    imprimíveis (fontes sem mapeamento Unicode geram lixo ou U+FFFD).
+    
+    Args:
+        text: Texto extraído da página
+    
+    Returns:
+        True se o texto pode ser usado no lugar do OCR
+    """
+    content = "".join(text.split())
+    if len(content) < config.text_layer_min_chars:
+        return False
+    
+    printable = sum(1 for c in content if c.isprintable() and c != "�")
+    return printable / len(content) >= config.text_layer_min_printable_ratio
+
+
+def format_text_layer(text: str) -> str:
+    """Normaliza o texto embutido: remove espaços no fim das linhas e linhas em branco repetidas."""
+    lines = [line.rstrip() for line in text.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+def reliable_text_pages(
+    pdf_path: Path,
+    first_page: int,
+    last_page: int,
+    pdf_info: dict,
+    poppler_path: Optional[str] = None
+) -> dict[int, str]:
+    """
+    Seleciona as páginas cujo texto embutido pode substituir o OCR.
+    
+    Uma página é aceita se o texto for confiável (ver `is_reliable_text`) e
+    as imagens cobrirem no máximo `text_layer_max_image_coverage` da página;
+    páginas escaneadas com texto invisível (OCR do scanner) continuam indo
+    para o modelo.
+    
+    Args:
+        pdf_path: Caminho do PDF
+        first_page: Primeira página (1-based)
+        last_page: Última página (inclusiva)
+        pdf_info: Resultado do pdfinfo do documento
+        poppler_path: Pasta do Poppler (usa o PATH se não especificado)
+    
+    Returns:
+        Dicionário página → texto formatado, só com as páginas aceitas
+    """
+    if config.text_layer_policy != "auto" or last_page < first_page:
+        return {}
+    
+    texts = extract_text_layer(pdf_path, first_page, last_page, poppler_path)
+    candidates = {page: text for page, text in texts.items() if is_reliable_text(text)}
+    if not candidates:
+        return {}
+    
+    areas = image_areas(pdf_path, first_page, last_page, poppler_path)
+    total_area = page_area(pdf_info)
+    if areas is None or not total_area:
+        # Sem como medir a cobertura de imagens: na dúvida, usa o modelo
+        return {}
+    
+    return {
+        page: format_text_layer(text)
+        for page, text in candidates.items()
+        if areas.get(page, 0.0) / total_area <= config.text_layer_max_image_coverage
+    }
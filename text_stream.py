@@ -0,0 +1,128 @@
+"""Acúmulo do texto recebido em streaming e repasse limitado das atualizações."""
+import threading
+import time
+from typing import Callable, Optional
+
+
+class TextAccumulator:
+    """
+    Acumula os trechos de texto de um stream.
+    
+    Os trechos ficam em uma lista e só são unidos quando o texto é pedido
+    (e o resultado é reaproveitado), evitando recriar a string inteira a cada token.
+    """
+    
+    def __init__(self):
+        self._parts: list[str] = []
+        self._length = 0
+    
+    def append(self, delta: str) -> None:
+        """Acrescenta um trecho recebido."""
+        self._parts.append(delta)
+        self._length += len(delta)
+    
+    @property
+    def text(self) -> str:
+        """Texto acumulado até agora."""
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+    
+    def tail(self, size: int) -> str:
+        """Últimos `size` caracteres, sem montar o texto inteiro."""
+        parts, length = [], 0
+        for part in reversed(self._parts):
+            parts.append(part)
+            length += len(part)
+            if length >= size:
+                break
+        return "".join(reversed(parts))[-size:]
+    
+    def __len__(self) -> int:
+        return self._length
+
+
+class ThrottledTextCallback:
+    """
+    Repassa o texto acumulado a um callback no máximo `max_updates_per_second` vezes por segundo.
+    
+    Atualizações intermediárias são descartadas (o texto seguinte já as inclui);
+    `flush` garante que o callback receba o texto final.
+    """
+    
+    def __init__(self, callback: Optional[Callable[[str], None]], max_updates_per_second: float):
+        """
+        Args:
+            callback: Recebe o texto acumulado (None desativa as atualizações)
+            max_updates_per_second: Limite de chamadas por segundo (0 = sem limite)
+        """
+        self.callback = callback
+        self.interval = 1.0 / max_updates_per_second if max_updates_per_second > 0 else 0.0
+        self._last_update = 0.0
+        self._sent_length = 0
+    
+    def update(self, buffer: TextAccumulator) -> None:
+        """Repassa o texto se o intervalo mínimo desde a última atualização já passou."""
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if now - self._last_update >= self.interval:
+            self._last_update = now
+            self._send(buffer)
+    
+    def flush(self, buffer: TextAccumulator) -> None:
+        """Repassa o texto final, se houver algo ainda não enviado."""
+        if self.callback is not None and len(buffer) != self._sent_length:
+            self._send(buffer)
+    
+    def _send(self, buffer: TextAccumulator) -> None:
+        self._sent_length = len(buffer)
+        self.callback(buffer.text)
+
+
+
+class DocumentTextThrottle:
+    """
+    Limita as atualizações de todas as páginas de um documento a uma taxa comum.
+    
+    As páginas em voo são transcritas ao mesmo tempo, cada uma com o seu
+    ThrottledTextCallback; somadas, chamariam o callback N vezes mais. Aqui o
+    intervalo mínimo vale para o documento inteiro, e cada chamada entrega o
+    texto mais recente da página de menor número ainda em andamento (a próxima
+    na ordem de leitura). O texto final de cada página vem no resultado, não
+    necessariamente por aqui.
+    """
+    
+    def __init__(self, callback: Callable[[int, str], None], max_updates_per_second: float):
+        """
+        Args:
+            callback: Recebe (page_num, texto acumulado); nunca é chamado ao mesmo tempo por duas threads
+            max_updates_per_second: Limite de chamadas por segundo no documento (0 = sem limite)
+        """
+        self.callback = callback
+        self.interval = 1.0 / max_updates_per_second if max_updates_per_second > 0 else 0.0
+        self._last_update = 0.0
+        self._latest: dict[int, str] = {}
+        self._sent: Optional[tuple[int, int]] = None
+        self._lock = threading.Lock()
+    
+    def update(self, page_num: int, text: str) -> None:
+        """Guarda o texto da página e repassa a página mais antiga se o intervalo já passou."""
+        with self._lock:
+            self._latest[page_num] = text
+            now = time.monotonic()
+            if now - self._last_update < self.interval:
+                return
+            
+            page = min(self._latest)
+            text = self._latest[page]
+            if self._sent == (page, len(text)):
+                return
+            self._last_update = now
+            self._sent = (page, len(text))
+            self.callback(page, text)
+    
+    def finish(self, page_num: int) -> None:
+        """A página foi entregue ao consumidor: as próximas atualizações passam para a seguinte."""
+        with self._lock:
+            self._latest.pop(page_num, None)
@@ -4,6 +4,7 @@ from typing import Optional
 from PIL import Image
 
 from config import config
+from job_manifest import JobManifest
 from session_state import SessionState
 from file_utils import select_folder
 
@@ -22,15 +23,98 @@ class UIComponents:
         with st.sidebar:
             st.header("⚙️ Configurações")
             
-            api_url = st.text_input("API URL", config.default_api_url)
+            api_url = st.text_input(
+                "API URL",
+                config.default_api_url,
+                help="Vários servidores: URLs separadas por vírgula, com peso opcional (ex: http://gpu1:8000/v1*2, http://gpu2:8000/v1)"
+            )
             poppler_path = st.text_input("Poppler Path", config.poppler_default_path or "")
             dpi = st.slider("DPI (Qualidade)", config.min_dpi, config.max_dpi, config.default_dpi)
+            st.checkbox(
+                "DPI adaptativo",
+                key=SessionState.ADAPTIVE_DPI,
+                help=f"Renderiza as páginas em {config.adaptive_base_dpi} DPI e usa o DPI escolhido só nas páginas difíceis"
+            )
+            
+            # Varredura da pasta (vale para o próximo lote iniciado)
+            st.checkbox("Incluir subpastas", key=SessionState.SCAN_RECURSIVE)
+            st.checkbox(
+                "Só PDFs novos ou alterados",
+                key=SessionState.SCAN_INCREMENTAL,
+                help="Pula os arquivos já convertidos que não mudaram desde então"
+            )
             
             st.divider()
             st.caption(f"Modelo: {config.model_name}")
             
             return api_url, poppler_path, dpi
     
+    @staticmethod
+    def render_cache_stats(stats: Optional[dict]) -> None:
+        """
+        Exibe os contadores do cache de OCR na barra lateral.
+        
+        Args:
+            stats: Dicionário retornado por OCRCache.stats() ou None se desabilitado
+        """
+        if stats is None:
+            return
+        
+        with st.sidebar:
+            size_mb = stats["size_bytes"] / (1024 * 1024)
+            st.caption(
+                f"Cache: {stats['hits']} acertos / {stats['misses']} falhas "
+                f"· {stats['entries']} páginas ({size_mb:.1f} MB)"
+            )
+    
+    @staticmethod
+    def render_endpoint_stats(stats: list[dict]) -> None:
+        """
+        Exibe o estado e as métricas de cada servidor de OCR na barra lateral.
+        
+        Args:
+            stats: Lista retornada por EndpointPool.stats()
+        """
+        with st.sidebar:
+            with st.expander(f"Servidores ({len(stats)})", expanded=False):
+                for endpoint in stats:
+                    status = "🟢" if endpoint["healthy"] else "🔴"
+                    st.caption(
+                        f"{status} {endpoint['url']} (peso {endpoint['weight']:g})  \n"
+                        f"{endpoint['in_flight']} em andamento · {endpoint['requests']} req · "
+                        f"{endpoint['failures']} falhas · {endpoint['avg_latency']:.1f}s/req"
+                    )
+    
+    @staticmethod
+    def render_metrics_summary(summary: dict) -> None:
+        """
+        Exibe o resumo das métricas de desempenho do lote na barra lateral.
+        
+        Args:
+            summary: Dicionário retornado por MetricsRecorder.summarize()
+        """
+        if not summary.get("pages"):
+            return
+        
+        with st.sidebar:
+            with st.expander("Desempenho", expanded=False):
+                tokens_rate = summary["tokens_per_second"]
+                st.caption(
+                    f"{summary['pages']} páginas · {summary['pages_per_minute']:.1f} págs/min"
+                    + (f" · {tokens_rate:.0f} tokens/s" if tokens_rate else "")
+                    + f" · {summary['cache_hits']} do cache"
+                )
+                for stage, values in summary["stages"].items():
+                    st.caption(f"{stage}: p50 {values['p50']:.2f}s · p95 {values['p95']:.2f}s")
+                for reason, count in summary["skipped"].items():
+                    st.caption(f"{count} páginas sem chamar o modelo ({reason})")
+                for reason, count in summary.get("degenerate", {}).items():
+                    st.caption(f"{count} gerações abortadas ({reason})")
+                for reason, count in summary.get("escalated", {}).items():
+                    st.caption(f"{count} páginas refeitas no DPI completo ({reason})")
+                for reason, count in summary.get("failed", {}).items():
+                    st.caption(f"⚠️ {count} páginas sem texto ({reason})")
+    
     @staticmethod
     def render_folder_selector() -> Optional[str]:
         """
@@ -67,6 +151,30 @@ class UIComponents:
         
         return folder_path if start_process else None
     
+    @staticmethod
+    def render_resume_option(manifest: JobManifest) -> bool:
+        """
+        Oferece a retomada de um lote inacabado encontrado na pasta.
+        
+        Args:
+            manifest: Manifesto do lote inacabado
+            
+        Returns:
+            True se o usuário pediu para retomar
+        """
+        done_files = sum(1 for entry in manifest.files if entry["status"] == JobManifest.STATUS_DONE)
+        col_info, col_btn = st.columns([4, 1])
+        
+        with col_info:
+            st.info(
+                f"Lote inacabado em **{manifest.output_dir.name}**: "
+                f"{done_files}/{len(manifest.files)} arquivos, "
+                f"{manifest.completed_page_count()} páginas concluídas."
+            )
+        
+        with col_btn:
+            return st.button("♻️ Retomar", key="resume_job")
+    
     @staticmethod
     def create_display_placeholders() -> tuple:
         """
@@ -103,8 +211,8 @@ class UIComponents:
         if SessionState.has_pages():
             current_page = SessionState.get_current_page()
             if current_page:
-                img_placeholder.image(current_page["image"], width="stretch")
-                UIComponents.render_text_box(txt_placeholder, current_page["text"])
+                img_placeholder.image(SessionState.get_page_image(current_page), width="stretch")
+                UIComponents.render_text_box(txt_placeholder, SessionState.get_page_text(current_page))
         # Caso contrário, usa o comportamento antigo
         elif should_display:
             last_image = SessionState.get_last_image()